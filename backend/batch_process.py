@@ -44,6 +44,11 @@ async def main():
         default='*.pdf',
         help='File pattern to match (default: *.pdf)'
     )
+    parser.add_argument(
+        '--pipeline',
+        action='store_true',
+        help='Use the process-pool pipeline (extract in processes, batched embedding, single writer)'
+    )
     parser.add_argument(
         '--config',
         type=str,
@@ -72,13 +77,17 @@ async def main():
     print(f"Workers: {args.workers}")
     print(f"Batch Size: {args.batch_size}")
     print(f"Force Reprocess: {args.force}")
+    print(f"Mode: {'pipeline (process pool)' if args.pipeline else 'threads'}")
     print(f"Vector DB: {config.vector_db.provider}")
     print(f"Embedding Model: {config.embedding.model_name}")
     print("="*60 + "\n")
     
     # Initialize RAG engine
     print("[INFO] Initializing RAG engine...")
-    engine = RAGEngine()
+    engine = RAGEngine(
+        embedding_batch_size=config.embedding.batch_size,
+        embedding_device=config.embedding.device
+    )
     
     # Create batch processor
     processor = BatchProcessor(
@@ -113,7 +122,8 @@ async def main():
         directory_path=args.directory,
         file_pattern=args.pattern,
         force_reprocess=args.force,
-        progress_callback=progress_callback
+        progress_callback=progress_callback,
+        pipeline=args.pipeline
     )
     
     print("\n\n" + "="*60)
@@ -4,17 +4,71 @@ Supports concurrent processing and progress tracking.
 """
 
 import asyncio
+import multiprocessing
 import os
+import queue
+import threading
 from pathlib import Path
 from typing import List, Dict, Any, Callable
-from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
-import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 from utils.pdf_loader import extract_text_by_pages, compute_file_hash
-from utils.splitter import split_text_by_pages
+from utils.splitter import split_text_by_pages, build_chunk_documents
+from utils.embedding_stage import EmbeddingStage, EmbeddingBatchError
+from utils.file_registry import FileRegistry
+from utils.metrics import count_failure
 from rag_engine import RAGEngine
 
 
+def ingested_at(file_path: str) -> int:
+    """
+    Ingestion time of an uploaded file, stored as 'ingested_at' chunk metadata.
+    The upload's modification time is used, so reindexing does not change it.
+    
+    Args:
+        file_path: Path to the uploaded file
+        
+    Returns:
+        Unix timestamp in seconds
+    """
+    return int(os.path.getmtime(file_path))
+
+
+def extract_and_split(file_path: str, chunk_size: int = 800, overlap: int = 100) -> Dict[str, Any]:
+    """
+    Extract and split one PDF. Runs in a worker process of the ingestion pipeline.
+    
+    Args:
+        file_path: Path to the PDF file
+        chunk_size: Size of each chunk in characters
+        overlap: Number of overlapping characters between chunks
+        
+    Returns:
+        Dict with 'filename', 'page_count' and 'documents' keys
+    """
+    filename = os.path.basename(file_path)
+    pages_text, page_count = extract_text_by_pages(file_path)
+    
+    base_metadata = {
+        'filename': filename,
+        'total_pages': page_count,
+        'file_path': file_path,
+        'ingested_at': ingested_at(file_path)
+    }
+    chunks = split_text_by_pages(
+        pages_text,
+        chunk_size=chunk_size,
+        overlap=overlap,
+        base_metadata=base_metadata
+    )
+    
+    return {
+        'filename': filename,
+        'page_count': page_count,
+        'documents': build_chunk_documents(chunks, filename)
+    }
+
+
 class BatchProcessor:
     """
     Handles batch processing of documents with parallelization and progress tracking.
@@ -25,7 +79,7 @@ class BatchProcessor:
         rag_engine: RAGEngine,
         max_workers: int = 4,
         batch_size: int = 100,
-        processed_file_path: str = "processed_files.json"
+        processed_file_path: str = "processed_files.db"
     ):
         """
         Initialize the batch processor.
@@ -40,6 +94,7 @@ class BatchProcessor:
         self.max_workers = max_workers
         self.batch_size = batch_size
         self.processed_file_path = processed_file_path
+        self.registry = FileRegistry.from_path(processed_file_path)
         self.stats = {
             'total_files': 0,
             'processed_files': 0,
@@ -50,55 +105,63 @@ class BatchProcessor:
             'end_time': None
         }
     
-    def load_processed_registry(self) -> Dict:
-        """Load the registry of previously processed files."""
-        if os.path.exists(self.processed_file_path):
-            with open(self.processed_file_path, 'r') as f:
-                return json.load(f)
-        return {}
-    
-    def save_processed_registry(self, registry: Dict):
-        """Save the processed files registry."""
-        with open(self.processed_file_path, 'w') as f:
-            json.dump(registry, f, indent=2)
-    
-    def process_single_file(self, file_path: str, force_reprocess: bool = False) -> Dict[str, Any]:
+    def process_single_file(
+        self,
+        file_path: str,
+        force_reprocess: bool = False,
+        on_progress: Callable[..., None] = None,
+        source_path: str = None
+    ) -> Dict[str, Any]:
         """
         Process a single PDF file.
         
         Args:
             file_path: Path to the PDF file
             force_reprocess: If True, reprocess even if already indexed
+            on_progress: Optional callback receiving progress fields as keyword arguments
+                (stage, pages_extracted, total_pages, chunks_total, chunks_embedded)
+            source_path: Read the content from this copy of the file instead (e.g. an
+                ingestion job's private copy of its upload)
             
         Returns:
             Dict with processing results
         """
         filename = os.path.basename(file_path)
+        source_path = source_path or file_path
+        
+        def report(**progress):
+            if on_progress:
+                on_progress(**progress)
         
         try:
             # Compute file hash
-            file_hash = compute_file_hash(file_path)
+            file_hash = compute_file_hash(source_path)
             
             # Check if already processed
-            registry = self.load_processed_registry()
-            if not force_reprocess and filename in registry:
-                stored_hash = registry[filename].get('hash')
+            entry = self.registry.get(filename)
+            if not force_reprocess and entry is not None:
+                stored_hash = entry['hash']
                 if stored_hash == file_hash:
                     return {
                         'filename': filename,
                         'status': 'skipped',
                         'reason': 'already_processed',
-                        'chunks': registry[filename].get('chunk_count', 0)
+                        'chunks': entry['chunk_count']
                     }
             
             # Extract text by pages
-            pages_text, page_count = extract_text_by_pages(file_path)
+            report(stage='extracting')
+            pages_text, page_count = extract_text_by_pages(
+                source_path,
+                progress_callback=lambda done, total: report(pages_extracted=done, total_pages=total)
+            )
             
             # Split into chunks with metadata
             base_metadata = {
                 'filename': filename,
                 'total_pages': page_count,
-                'file_path': file_path
+                'file_path': file_path,
+                'ingested_at': ingested_at(source_path)
             }
             chunks = split_text_by_pages(
                 pages_text, 
@@ -108,49 +171,272 @@ class BatchProcessor:
             )
             
             # Prepare documents for indexing
-            documents_to_add = []
-            for i, chunk_data in enumerate(chunks):
-                doc_id = f"{filename}::{chunk_data['metadata'].get('page_number', 0)}::{i}"
-                documents_to_add.append({
-                    'text': chunk_data['text'],
-                    'doc_id': doc_id,
-                    'metadata': chunk_data['metadata']
-                })
+            documents_to_add = build_chunk_documents(chunks, filename)
             
-            # Add to vector database in batches
-            for i in range(0, len(documents_to_add), self.batch_size):
-                batch = documents_to_add[i:i + self.batch_size]
-                self.rag_engine.add_documents_batch(batch)
+            # Diff against the indexed version: embed only new chunks, delete removed ones
+            report(stage='embedding', chunks_total=len(documents_to_add), chunks_embedded=0)
+            changes = self.rag_engine.sync_document(
+                filename,
+                documents_to_add,
+                progress_callback=lambda done, total: report(chunks_embedded=done)
+            )
             
             # Update registry
-            registry[filename] = {
-                'hash': file_hash,
-                'chunk_count': len(chunks),
-                'page_count': page_count,
-                'processed_at': datetime.now().isoformat()
-            }
-            self.save_processed_registry(registry)
+            self.registry.upsert(filename, file_hash, len(chunks), page_count)
             
             return {
                 'filename': filename,
                 'status': 'success',
                 'chunks': len(chunks),
-                'pages': page_count
+                'pages': page_count,
+                'changes': changes
             }
             
         except Exception as e:
+            count_failure("ingest")
             return {
                 'filename': filename,
                 'status': 'failed',
                 'error': str(e)
             }
     
+    def iter_pipeline_results(self, file_paths: List[str], force_reprocess: bool = False, queue_size: int = 4):
+        """
+        Pipelined ingestion of many files.
+        
+        A process pool extracts and splits files (PDF parsing and OCR are CPU-bound and
+        would serialize on the GIL in threads), a single embedding stage batches chunks
+        across files, and a single writer indexes them into the vector database. Stages
+        are connected by bounded queues, so memory stays flat on large corpora.
+        
+        Args:
+            file_paths: Paths of the files to process
+            force_reprocess: If True, reprocess even if already indexed
+            queue_size: Capacity of the queues between stages
+            
+        Yields:
+            Per-file result dicts (same shape as process_single_file), in completion order
+        """
+        embed_queue = queue.Queue(maxsize=queue_size)
+        write_queue = queue.Queue(maxsize=queue_size)
+        results = queue.Queue()
+        done_marker = object()
+
+        def failed(filename, error):
+            count_failure("ingest")
+            results.put({'filename': filename, 'status': 'failed', 'error': str(error)})
+
+        def extract_stage():
+            # Submits files to the process pool, keeping a bounded number in flight
+            try:
+                # Spawned, not forked: the embedding and writer threads (and torch/OpenMP
+                # thread pools) are already running, and forking them can deadlock the children
+                with ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                ) as pool:
+                    pending = {}
+                    remaining_files = iter(file_paths)
+                    exhausted = False
+                    while True:
+                        while not exhausted and len(pending) < self.max_workers * 2:
+                            file_path = next(remaining_files, None)
+                            if file_path is None:
+                                exhausted = True
+                                break
+                            filename = os.path.basename(file_path)
+                            try:
+                                file_hash = compute_file_hash(file_path)
+                            except Exception as e:
+                                failed(filename, e)
+                                continue
+                            entry = self.registry.get(filename)
+                            if not force_reprocess and entry is not None and entry['hash'] == file_hash:
+                                results.put({
+                                    'filename': filename,
+                                    'status': 'skipped',
+                                    'reason': 'already_processed',
+                                    'chunks': entry['chunk_count']
+                                })
+                                continue
+                            future = pool.submit(extract_and_split, file_path)
+                            pending[future] = (filename, file_hash)
+
+                        if not pending:
+                            break
+
+                        completed, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in completed:
+                            filename, file_hash = pending.pop(future)
+                            try:
+                                extracted = future.result()
+                            except Exception as e:
+                                failed(filename, e)
+                                continue
+                            embed_queue.put({**extracted, 'hash': file_hash})
+            finally:
+                embed_queue.put(done_marker)
+
+        embedding_stage = EmbeddingStage(
+            self.rag_engine.embed_documents_counted,
+            flush_size=max(self.batch_size, self.rag_engine.embedding_batch_size)
+        )
+
+        def embed_stage():
+            # Accumulates chunks across files into full, length-sorted embedding batches
+            new_files = []
+
+            def forward(batches):
+                # Files are registered with the writer together with the first batch after them
+                nonlocal new_files
+                for documents, embeddings in batches:
+                    write_queue.put((documents, embeddings, new_files, None))
+                    new_files = []
+
+            try:
+                while True:
+                    item = embed_queue.get()
+                    if item is done_marker:
+                        break
+                    documents = item.pop('documents')
+                    try:
+                        diff = self.rag_engine.diff_document(item['filename'], documents)
+                    except Exception as e:
+                        failed(item['filename'], e)
+                        continue
+                    reuse_docs, reuse_embeddings = diff['reuse']
+                    new_files.append({
+                        **item,
+                        'chunks': len(documents),
+                        'to_write': len(diff['embed']) + len(reuse_docs),
+                        'stale': diff['stale']
+                    })
+                    if reuse_docs:
+                        # Chunks whose content is already indexed skip the embedding stage
+                        write_queue.put((reuse_docs, reuse_embeddings, new_files, None))
+                        new_files = []
+                    try:
+                        forward(embedding_stage.add(diff['embed']))
+                    except EmbeddingBatchError as e:
+                        forward(e.completed)
+                        write_queue.put((e.documents, None, new_files, e))
+                        new_files = []
+                try:
+                    forward(embedding_stage.flush())
+                except EmbeddingBatchError as e:
+                    write_queue.put((e.documents, None, new_files, e))
+                    new_files = []
+                if new_files:
+                    write_queue.put(([], [], new_files, None))
+            finally:
+                write_queue.put(done_marker)
+
+        def write_stage():
+            # Single writer: indexes batches and finalizes files once all their chunks are stored
+            remaining, infos, failed_files = {}, {}, set()
+
+            def finalize_completed():
+                for filename in [name for name, count in remaining.items() if count == 0]:
+                    info = infos.pop(filename)
+                    del remaining[filename]
+                    try:
+                        self.rag_engine.delete_documents(info['stale'])
+                    except Exception as e:
+                        failed(filename, e)
+                        continue
+                    self.registry.upsert(filename, info['hash'], info['chunks'], info['page_count'])
+                    results.put({
+                        'filename': filename,
+                        'status': 'success',
+                        'chunks': info['chunks'],
+                        'pages': info['page_count']
+                    })
+
+            while True:
+                item = write_queue.get()
+                if item is done_marker:
+                    break
+                batch, embeddings, new_files, error = item
+
+                for info in new_files:
+                    infos[info['filename']] = info
+                    remaining[info['filename']] = info['to_write']
+
+                keep = [i for i, doc in enumerate(batch) if doc['metadata']['filename'] not in failed_files]
+                batch = [batch[i] for i in keep]
+                try:
+                    if error is not None:
+                        raise error
+                    if batch:
+                        self.rag_engine.write_documents(batch, [embeddings[i] for i in keep])
+                    for doc in batch:
+                        remaining[doc['metadata']['filename']] -= 1
+                except Exception as e:
+                    for filename in {doc['metadata']['filename'] for doc in batch}:
+                        failed_files.add(filename)
+                        infos.pop(filename, None)
+                        remaining.pop(filename, None)
+                        failed(filename, e)
+
+                finalize_completed()
+
+        threads = [
+            threading.Thread(target=extract_stage, name="ingest-extract", daemon=True),
+            threading.Thread(target=embed_stage, name="ingest-embed", daemon=True),
+            threading.Thread(target=write_stage, name="ingest-write", daemon=True)
+        ]
+        for thread in threads:
+            thread.start()
+
+        for _ in range(len(file_paths)):
+            yield results.get()
+
+        for thread in threads:
+            thread.join()
+
+        embedding_stats = embedding_stage.stats()
+        self.stats['chunks_per_sec'] = embedding_stats['chunks_per_sec']
+        self.stats['embedding_store_hits'] = embedding_stats['store_hits']
+        print(f"[INFO] Embedded {embedding_stats['chunks_embedded']} chunks at {embedding_stats['chunks_per_sec']:.1f} chunks/sec")
+        print(f"[INFO] Reused {embedding_stats['store_hits']} chunk embeddings from the embedding store")
+
+    def _record_result(self, current: int, total: int, result: Dict[str, Any], progress_callback: Callable[[Dict], None] = None):
+        """Update statistics, invoke the progress callback and log one file result."""
+        # Update statistics
+        if result['status'] == 'success':
+            self.stats['processed_files'] += 1
+            self.stats['total_chunks'] += result.get('chunks', 0)
+        elif result['status'] == 'skipped':
+            self.stats['skipped_files'] += 1
+        elif result['status'] == 'failed':
+            self.stats['failed_files'] += 1
+        
+        # Progress callback
+        if progress_callback:
+            progress = {
+                'current': current,
+                'total': total,
+                'result': result,
+                'stats': self.stats.copy()
+            }
+            progress_callback(progress)
+        
+        # Console output with status indicator
+        status_prefix = {
+            'success': '[OK]',
+            'skipped': '[SKIP]',
+            'failed': '[ERROR]'
+        }
+        prefix = status_prefix.get(result['status'], '[?]')
+        print(f"{prefix} [{current}/{total}] {result['filename']} - {result['status']}")
+
     async def process_directory(
         self, 
         directory_path: str,
         file_pattern: str = "*.pdf",
         force_reprocess: bool = False,
-        progress_callback: Callable[[Dict], None] = None
+        progress_callback: Callable[[Dict], None] = None,
+        pipeline: bool = False
     ) -> Dict[str, Any]:
         """
         Process all files in a directory with parallel processing.
@@ -160,6 +446,7 @@ class BatchProcessor:
             file_pattern: Glob pattern for files to process
             force_reprocess: If True, reprocess all files
             progress_callback: Optional callback function for progress updates
+            pipeline: If True, use the process-pool ingestion pipeline instead of threads
             
         Returns:
             Dict with overall processing statistics
@@ -173,48 +460,26 @@ class BatchProcessor:
         
         print(f"[INFO] Found {len(files)} files to process")
         
-        # Process files with thread pool
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            futures = []
-            for file_path in files:
-                future = executor.submit(
-                    self.process_single_file, 
-                    str(file_path), 
-                    force_reprocess
-                )
-                futures.append(future)
-            
-            # Collect results and update stats
-            for i, future in enumerate(futures, 1):
-                result = future.result()
-                
-                # Update statistics
-                if result['status'] == 'success':
-                    self.stats['processed_files'] += 1
-                    self.stats['total_chunks'] += result.get('chunks', 0)
-                elif result['status'] == 'skipped':
-                    self.stats['skipped_files'] += 1
-                elif result['status'] == 'failed':
-                    self.stats['failed_files'] += 1
-                
-                # Progress callback
-                if progress_callback:
-                    progress = {
-                        'current': i,
-                        'total': len(files),
-                        'result': result,
-                        'stats': self.stats.copy()
-                    }
-                    progress_callback(progress)
+        if pipeline:
+            # Process files with the extract -> embed -> write pipeline
+            file_paths = [str(file_path) for file_path in files]
+            for i, result in enumerate(self.iter_pipeline_results(file_paths, force_reprocess), 1):
+                self._record_result(i, len(files), result, progress_callback)
+        else:
+            # Process files with thread pool
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = []
+                for file_path in files:
+                    future = executor.submit(
+                        self.process_single_file, 
+                        str(file_path), 
+                        force_reprocess
+                    )
+                    futures.append(future)
                 
-                # Console output with status indicator
-                status_prefix = {
-                    'success': '[OK]',
-                    'skipped': '[SKIP]',
-                    'failed': '[ERROR]'
-                }
-                prefix = status_prefix.get(result['status'], '[?]')
-                print(f"{prefix} [{i}/{len(files)}] {result['filename']} - {result['status']}")
+                # Collect results and update stats
+                for i, future in enumerate(futures, 1):
+                    self._record_result(i, len(files), future.result(), progress_callback)
         
         self.stats['end_time'] = datetime.now().isoformat()
         
@@ -0,0 +1,108 @@
+"""
+Startup benchmark for the RAG API.
+Measures how long `import main` takes in a fresh interpreter and checks that no
+heavy dependency (torch, sentence-transformers, ChromaDB, docTR) is imported
+eagerly. Exits with a non-zero status on regression, so it can run in CI.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+# Modules that must only be imported lazily (on first use or during warm-up)
+HEAVY_MODULES = ["torch", "sentence_transformers", "chromadb", "doctr", "transformers"]
+
+
+def run_import_benchmark(module: str = "main"):
+    """
+    Import a module in a fresh interpreter with -X importtime.
+
+    Args:
+        module: Module to import
+
+    Returns:
+        Tuple of (total import seconds, {direct dependency: cumulative seconds}, set of all imported modules)
+    """
+    env = {
+        **os.environ,
+        "OLLAMA_API_KEY": os.getenv("OLLAMA_API_KEY", "benchmark"),
+        "WARMUP_ON_STARTUP": "false",
+    }
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    if proc.returncode != 0:
+        print(proc.stderr)
+        raise RuntimeError(f"Importing {module} failed")
+
+    # Lines look like: "import time: self [us] | cumulative | imported package".
+    # Nested imports are indented and listed before their parent.
+    total = 0.0
+    dependencies = {}
+    pending = {}
+    imported = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        seconds = int(cumulative_us) / 1e6
+        imported.add(name.strip())
+        if depth == 0:
+            if name.strip() == module:
+                total, dependencies = seconds, pending
+            pending = {}
+        elif depth == 1:
+            pending[name.strip()] = seconds
+
+    return total, dependencies, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark API import time')
+    parser.add_argument(
+        '--max-seconds',
+        type=float,
+        default=float(os.getenv("STARTUP_BUDGET_SECONDS", "3.0")),
+        help='Fail if importing main takes longer than this (default: 3.0)'
+    )
+    parser.add_argument(
+        '--top',
+        type=int,
+        default=10,
+        help='Number of slowest dependencies to show (default: 10)'
+    )
+    args = parser.parse_args()
+
+    total, dependencies, imported = run_import_benchmark("main")
+    eager_heavy = sorted({name.split(".")[0] for name in imported} & set(HEAVY_MODULES))
+
+    print("="*60)
+    print("API STARTUP BENCHMARK")
+    print("="*60)
+    print(f"import main: {total:.3f}s (budget {args.max_seconds:.3f}s)")
+    print("\nSlowest dependencies of main:")
+    for name, seconds in sorted(dependencies.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {seconds:8.3f}s  {name}")
+    print("="*60)
+
+    failed = False
+    if eager_heavy:
+        print(f"[ERROR] Heavy modules imported eagerly: {', '.join(eager_heavy)}")
+        failed = True
+    if total > args.max_seconds:
+        print(f"[ERROR] Startup regression: {total:.3f}s > {args.max_seconds:.3f}s")
+        failed = True
+
+    if failed:
+        sys.exit(1)
+    print("[OK] Startup within budget")
+
+
+if __name__ == "__main__":
+    main()
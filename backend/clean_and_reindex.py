@@ -1,35 +1,206 @@
 """
-Clean ChromaDB and reindex all documents.
-This will delete the old database and create a fresh one with proper metadata.
+Rebuild the vector database without downtime (blue/green reindex).
+All documents are indexed into a new versioned collection while the API keeps
+serving the live one. Files ingested into the live collection meanwhile are
+caught up, then the collection alias is switched atomically once the new
+collection validates; the replaced collection is kept for rollback.
 """
 
+import argparse
+import asyncio
 import os
-import shutil
-from reindex_all import reindex_all_documents
-
-def clean_and_reindex():
-    """Delete existing ChromaDB and reindex all documents with fresh metadata."""
-    
-    chroma_dir = "../chroma_store"
-    
+import sys
+from datetime import datetime
+from batch_processor import BatchProcessor
+from rag_engine import RAGEngine
+from utils.collection_alias import DEFAULT_COLLECTION, versioned_collection_name
+from utils.file_registry import FileRegistry
+from utils.sharded_collection import base_collection_name
+
+# Catch-up passes before the switch; each pass only covers files ingested during the previous one
+MAX_CATCH_UP_PASSES = 5
+
+
+def prune_collections(engine: RAGEngine, keep):
+    """
+    Delete document collections that are neither live nor kept for rollback.
+
+    Args:
+        engine: Engine whose ChromaDB client is used
+        keep: Names of the collections to keep
+    """
+    names = set()
+    for collection in engine.client.list_collections():
+        # Older ChromaDB versions return names, newer ones return collection objects
+        names.add(base_collection_name(getattr(collection, "name", collection)))
+
+    # Shards are dropped together with their logical collection
+    for name in sorted(names):
+        if name.startswith(DEFAULT_COLLECTION) and name not in keep:
+            engine.drop_collection(name)
+            print(f"[INFO] Deleted old collection '{name}'")
+
+
+def catch_up(processor: BatchProcessor, live_registry: FileRegistry, since: str, upload_dir: str) -> int:
+    """
+    Re-ingest into the new collection the files that live ingestion jobs indexed
+    since the rebuild started, and that the rebuild indexed in another version (or not at all).
+    Repeats until a pass finds nothing, so the window before the switch stays short.
+
+    Args:
+        processor: Processor writing to the new collection (with its own registry)
+        live_registry: Registry of the live collection
+        since: ISO timestamp the rebuild started at
+        upload_dir: Directory containing the PDF files
+
+    Returns:
+        Number of files that failed to catch up
+    """
+    failed = 0
+    for _ in range(MAX_CATCH_UP_PASSES):
+        pass_started = datetime.now().isoformat()
+        behind = [
+            filename for filename, entry in live_registry.all().items()
+            if (entry['processed_at'] or '') >= since
+            and (processor.registry.get(filename) or {}).get('hash') != entry['hash']
+        ]
+        if not behind:
+            return failed
+
+        print(f"[INFO] Catching up {len(behind)} files ingested during the rebuild")
+        for filename in behind:
+            file_path = os.path.join(upload_dir, filename)
+            if not os.path.exists(file_path):
+                print(f"[WARNING] {filename} is no longer in {upload_dir}, not caught up")
+                continue
+            result = processor.process_single_file(file_path, force_reprocess=True)
+            if result['status'] == 'failed':
+                failed += 1
+                print(f"[ERROR] Catch-up of {filename} failed: {result['error']}")
+        since = pass_started
+
+    print(f"[WARNING] Files were still being ingested after {MAX_CATCH_UP_PASSES} catch-up passes")
+    return failed
+
+
+def remove_registry(registry: FileRegistry):
+    """Delete a registry database and its WAL files."""
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(registry.db_path + suffix)
+        except OSError:
+            pass
+
+
+def clean_and_reindex(
+    upload_dir: str = "uploads",
+    persist_directory: str = "../chroma_store",
+    max_workers: int = None,
+    max_failed_files: int = 0
+) -> bool:
+    """
+    Reindex all documents into a shadow collection and switch to it once validated.
+
+    Args:
+        upload_dir: Directory containing the PDF files
+        persist_directory: ChromaDB storage shared with the API
+        max_workers: Extraction processes (default: CPU count)
+        max_failed_files: Number of files allowed to fail before the switch is refused
+
+    Returns:
+        True if the new collection went live
+    """
+    live_engine = RAGEngine(persist_directory=persist_directory)
+    live_registry = FileRegistry.from_path(os.getenv("PROCESSED_FILES_PATH", "processed_files.db"))
+    shadow_name = versioned_collection_name()
+    shadow_engine = RAGEngine(persist_directory=persist_directory, collection_name=shadow_name)
+
     print("\n" + "="*60)
-    print("CLEANING AND REINDEXING")
+    print("BLUE/GREEN REINDEX")
+    print("="*60)
+    print(f"Live collection: {live_engine.collection_alias.active()}")
+    print(f"New collection:  {shadow_name}")
     print("="*60 + "\n")
-    
-    # Remove old vector database
-    if os.path.exists(chroma_dir):
-        print(f"[INFO] Deleting old ChromaDB at {chroma_dir}...")
-        shutil.rmtree(chroma_dir)
-        print("[OK] Old database deleted\n")
-    else:
-        print("[INFO] No existing database found\n")
-    
-    # Reindex all documents with proper metadata
-    print("[INFO] Starting reindexing process...\n")
-    reindex_all_documents()
-    
-    print("\n[SUCCESS] All documents have been properly indexed with metadata")
+
+    # Build the new collection in parallel; the API keeps serving the live one.
+    # The rebuild records its files in its own registry, so it can tell them apart
+    # from files that live ingestion jobs index into the live collection meanwhile.
+    processor = BatchProcessor(
+        rag_engine=shadow_engine,
+        max_workers=max_workers or os.cpu_count() or 4,
+        processed_file_path=os.path.join(persist_directory, f"{shadow_name}.files.db")
+    )
+    rebuild_started = datetime.now().isoformat()
+    stats = asyncio.run(processor.process_directory(upload_dir, force_reprocess=True, pipeline=True))
+    failed_files = stats['failed_files'] + catch_up(processor, live_registry, rebuild_started, upload_dir)
+    shadow_files = processor.registry.all()
+
+    # Validate before switching
+    indexed = shadow_engine.collection.count()
+    expected = sum(entry['chunk_count'] for entry in shadow_files.values())
+    live_count = live_engine.collection.count()
+    problems = []
+    if indexed != expected:
+        problems.append(f"collection has {indexed} chunks, expected {expected}")
+    if failed_files > max_failed_files:
+        problems.append(f"{failed_files} files failed (allowed: {max_failed_files})")
+    if indexed == 0 and live_count > 0:
+        problems.append("new collection is empty")
+
+    if problems:
+        print(f"[ERROR] Validation failed: {'; '.join(problems)}")
+        print(f"[INFO] Keeping live collection, deleting '{shadow_name}'")
+        shadow_engine.drop_collection(shadow_name)
+        remove_registry(processor.registry)
+        return False
+
+    # Atomic switch; running API workers pick it up on their next query
+    state = live_engine.switch_collection(shadow_name)
+    print(f"[OK] '{shadow_name}' is live ({indexed} chunks, previously {live_count})")
+
+    # Chunk and page counts of the rebuilt files now describe the live collection
+    for filename, entry in shadow_files.items():
+        live_entry = live_registry.get(filename)
+        if live_entry is None or live_entry['hash'] == entry['hash']:
+            live_registry.upsert(filename, entry['hash'], entry['chunk_count'], entry['page_count'], entry['processed_at'])
+    remove_registry(processor.registry)
+    print(f"[INFO] Previous collection '{state['previous']}' kept for rollback")
+
+    prune_collections(live_engine, keep={state['active'], state['previous']})
+    return True
+
+
+def rollback(persist_directory: str = "../chroma_store"):
+    """Switch the alias back to the previous collection."""
+    engine = RAGEngine(persist_directory=persist_directory)
+    state = engine.rollback_collection()
+    print(f"[OK] Rolled back to '{state['active']}'")
 
 
 if __name__ == "__main__":
-    clean_and_reindex()
+    parser = argparse.ArgumentParser(description='Rebuild the vector database without downtime')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Number of extraction processes (default: CPU count)'
+    )
+    parser.add_argument(
+        '--max-failed',
+        type=int,
+        default=0,
+        help='Number of files allowed to fail before the switch is refused (default: 0)'
+    )
+    parser.add_argument(
+        '--rollback',
+        action='store_true',
+        help='Switch back to the previous collection instead of reindexing'
+    )
+    args = parser.parse_args()
+
+    if args.rollback:
+        rollback()
+    elif clean_and_reindex(max_workers=args.workers, max_failed_files=args.max_failed):
+        print("\n[SUCCESS] All documents have been reindexed with zero downtime")
+    else:
+        sys.exit(1)
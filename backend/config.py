@@ -15,9 +15,9 @@ load_dotenv()
 class VectorDBConfig(BaseModel):
     """Configuration for vector database."""
     
-    provider: Literal["chromadb", "pinecone", "weaviate", "qdrant"] = Field(
+    provider: Literal["chromadb", "pinecone", "weaviate", "qdrant", "local"] = Field(
         default="chromadb",
-        description="Vector database provider"
+        description="Vector database provider ('local': in-process memory-mapped index)"
     )
     
     # ChromaDB specific
@@ -46,6 +46,32 @@ class VectorDBConfig(BaseModel):
         default=384,
         description="Embedding dimension (384 for all-MiniLM-L6-v2)"
     )
+    
+    # Local index specific
+    local_dtype: Literal["float16", "int8"] = Field(
+        default="float16",
+        description="Storage type of the local index embeddings (int8 halves memory again)"
+    )
+    
+    local_ann: Optional[Literal["hnsw"]] = Field(
+        default=None,
+        description="Approximate search for the local index (requires hnswlib); exact if unset"
+    )
+    
+    local_ann_min_rows: int = Field(
+        default=20000,
+        description="Minimum chunks before the local index uses approximate search"
+    )
+    
+    shard_count: int = Field(
+        default=1,
+        description="Number of collection shards queried concurrently (changing it requires a reindex)"
+    )
+    
+    shard_key: str = Field(
+        default="filename",
+        description="Chunk metadata field deciding the shard (e.g. filename or a tenant id)"
+    )
 
 
 class EmbeddingConfig(BaseModel):
@@ -65,6 +91,91 @@ class EmbeddingConfig(BaseModel):
         default="cpu",
         description="Device for embedding computation"
     )
+    
+    store_dir: Optional[str] = Field(
+        default="embedding_store",
+        description="Directory of the content-addressed chunk embedding store (empty disables it)"
+    )
+    
+    query_cache_size: int = Field(
+        default=1024,
+        description="Maximum number of cached query embeddings (0 disables the cache)"
+    )
+    
+    query_cache_ttl: float = Field(
+        default=0,
+        description="Query embedding cache entry lifetime in seconds (0 for no expiry)"
+    )
+    
+    query_cache_dir: Optional[str] = Field(
+        default=None,
+        description="Optional directory for the on-disk query embedding cache tier"
+    )
+    
+    query_cache_disk_size: int = Field(
+        default=10000,
+        description="Maximum number of on-disk query embeddings; least recently used are evicted first (0 disables the disk tier)"
+    )
+    
+    hybrid_search: bool = Field(
+        default=True,
+        description="Fuse BM25 keyword search with vector search (reciprocal-rank fusion)"
+    )
+    
+    rrf_k: int = Field(
+        default=60,
+        description="Reciprocal-rank fusion constant (higher flattens rank differences)"
+    )
+    
+    hybrid_candidates: int = Field(
+        default=4,
+        description="Candidates fetched from each retriever per requested result"
+    )
+    
+    rerank: bool = Field(
+        default=False,
+        description="Rerank retrieved candidates with a cross-encoder before answering"
+    )
+    
+    rerank_model: str = Field(
+        default="cross-encoder/mmarco-mMiniLMv2-L12-H384-v1",
+        description="Cross-encoder model used for reranking"
+    )
+    
+    rerank_device: str = Field(
+        default="cpu",
+        description="Device for the cross-encoder"
+    )
+    
+    rerank_batch_size: int = Field(
+        default=32,
+        description="(question, chunk) pairs scored per cross-encoder forward pass"
+    )
+    
+    rerank_candidates: int = Field(
+        default=20,
+        description="Candidates retrieved for the reranker to choose the top results from"
+    )
+    
+    rerank_min_score: Optional[float] = Field(
+        default=None,
+        description="Drop reranked chunks scoring below this threshold"
+    )
+    
+    query_batching: bool = Field(
+        default=False,
+        description="Coalesce concurrent query embeddings into batched encode calls"
+    )
+    
+    query_batch_max_size: int = Field(
+        default=32,
+        description="Maximum number of queries per micro-batch"
+    )
+    
+    query_batch_max_wait_ms: float = Field(
+        default=5.0,
+        description="Maximum time to wait for more queries before encoding a micro-batch"
+    )
 
 
 class LLMConfig(BaseModel):
@@ -99,6 +210,31 @@ class LLMConfig(BaseModel):
         default=1000,
         description="Maximum tokens in response"
     )
+    
+    context_max_tokens: int = Field(
+        default=2000,
+        description="Token budget for retrieved context in the prompt (0 for no limit)"
+    )
+    
+    context_chars_per_token: float = Field(
+        default=3.5,
+        description="Average characters per token, used to estimate context size"
+    )
+    
+    answer_cache_size: int = Field(
+        default=512,
+        description="Maximum number of cached answers (0 disables the cache)"
+    )
+    
+    answer_cache_similarity: float = Field(
+        default=0.95,
+        description="Minimum cosine similarity for two questions to share a cached answer"
+    )
+    
+    answer_cache_ttl: float = Field(
+        default=3600,
+        description="Answer cache entry lifetime in seconds (0 for no expiry)"
+    )
 
 
 class ProcessingConfig(BaseModel):
@@ -128,6 +264,46 @@ class ProcessingConfig(BaseModel):
         default=True,
         description="Enable OCR for scanned documents"
     )
+    
+    cpu_executor_workers: int = Field(
+        default=4,
+        description="Threads per API worker for blocking work (extraction, embedding, ChromaDB)"
+    )
+    
+    ocr_pool_size: int = Field(
+        default=1,
+        description="docTR OCR predictors per process, shared across files and threads"
+    )
+    
+    ocr_min_page_chars: int = Field(
+        default=20,
+        description="Pages with fewer native text characters are OCRed individually"
+    )
+    
+    ocr_batch_pages: int = Field(
+        default=8,
+        description="Number of pages per docTR predictor call"
+    )
+    
+    max_upload_size_mb: float = Field(
+        default=500,
+        description="Maximum upload size in MB (larger uploads are rejected with 413)"
+    )
+    
+    job_workers: int = Field(
+        default=2,
+        description="Background ingestion jobs processed concurrently per API worker"
+    )
+    
+    jobs_db_path: str = Field(
+        default="ingestion_jobs.db",
+        description="Path to the persistent ingestion job queue"
+    )
+    
+    job_lease_seconds: float = Field(
+        default=60,
+        description="Seconds a running ingestion job stays reserved without a heartbeat before it is requeued"
+    )
 
 
 class RAGConfig(BaseModel):
@@ -149,7 +325,7 @@ class RAGConfig(BaseModel):
     )
     
     processed_files_path: str = Field(
-        default="processed_files.json",
+        default="processed_files.db",
         description="Path to processed files registry"
     )
     
@@ -170,11 +346,33 @@ class RAGConfig(BaseModel):
                 api_key=os.getenv("VECTOR_DB_API_KEY"),
                 host=os.getenv("VECTOR_DB_HOST"),
                 index_name=os.getenv("VECTOR_DB_INDEX", "documents"),
+                local_dtype=os.getenv("LOCAL_INDEX_DTYPE", "float16"),
+                local_ann=os.getenv("LOCAL_INDEX_ANN") or None,
+                local_ann_min_rows=int(os.getenv("LOCAL_INDEX_ANN_MIN_ROWS", "20000")),
+                shard_count=int(os.getenv("SHARD_COUNT", "1")),
+                shard_key=os.getenv("SHARD_KEY", "filename"),
             ),
             embedding=EmbeddingConfig(
                 model_name=os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"),
                 batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "32")),
                 device=os.getenv("EMBEDDING_DEVICE", "cpu"),
+                store_dir=os.getenv("EMBEDDING_STORE_DIR", "embedding_store") or None,
+                query_cache_size=int(os.getenv("QUERY_CACHE_SIZE", "1024")),
+                query_cache_ttl=float(os.getenv("QUERY_CACHE_TTL", "0")),
+                query_cache_dir=os.getenv("QUERY_CACHE_DIR"),
+                query_cache_disk_size=int(os.getenv("QUERY_CACHE_DISK_SIZE", "10000")),
+                hybrid_search=os.getenv("HYBRID_SEARCH", "true").lower() == "true",
+                rrf_k=int(os.getenv("RRF_K", "60")),
+                hybrid_candidates=int(os.getenv("HYBRID_CANDIDATES", "4")),
+                rerank=os.getenv("RERANK", "false").lower() == "true",
+                rerank_model=os.getenv("RERANK_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"),
+                rerank_device=os.getenv("RERANK_DEVICE", "cpu"),
+                rerank_batch_size=int(os.getenv("RERANK_BATCH_SIZE", "32")),
+                rerank_candidates=int(os.getenv("RERANK_CANDIDATES", "20")),
+                rerank_min_score=float(os.getenv("RERANK_MIN_SCORE")) if os.getenv("RERANK_MIN_SCORE") else None,
+                query_batching=os.getenv("QUERY_BATCHING", "false").lower() == "true",
+                query_batch_max_size=int(os.getenv("QUERY_BATCH_MAX_SIZE", "32")),
+                query_batch_max_wait_ms=float(os.getenv("QUERY_BATCH_MAX_WAIT_MS", "5")),
             ),
             llm=LLMConfig(
                 provider=os.getenv("LLM_PROVIDER", "ollama"),
@@ -183,6 +381,11 @@ class RAGConfig(BaseModel):
                 host=os.getenv("LLM_HOST", "https://ollama.com"),
                 temperature=float(os.getenv("LLM_TEMPERATURE", "0.1")),
                 max_tokens=int(os.getenv("LLM_MAX_TOKENS", "1000")),
+                context_max_tokens=int(os.getenv("CONTEXT_MAX_TOKENS", "2000")),
+                context_chars_per_token=float(os.getenv("CONTEXT_CHARS_PER_TOKEN", "3.5")),
+                answer_cache_size=int(os.getenv("ANSWER_CACHE_SIZE", "512")),
+                answer_cache_similarity=float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95")),
+                answer_cache_ttl=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
             ),
             processing=ProcessingConfig(
                 chunk_size=int(os.getenv("CHUNK_SIZE", "800")),
@@ -190,10 +393,18 @@ class RAGConfig(BaseModel):
                 max_workers=int(os.getenv("MAX_WORKERS", "4")),
                 batch_insert_size=int(os.getenv("BATCH_INSERT_SIZE", "100")),
                 enable_ocr=os.getenv("ENABLE_OCR", "true").lower() == "true",
+                cpu_executor_workers=int(os.getenv("CPU_EXECUTOR_WORKERS", "4")),
+                ocr_pool_size=int(os.getenv("OCR_POOL_SIZE", "1")),
+                ocr_min_page_chars=int(os.getenv("OCR_MIN_PAGE_CHARS", "20")),
+                ocr_batch_pages=int(os.getenv("OCR_BATCH_PAGES", "8")),
+                max_upload_size_mb=float(os.getenv("MAX_UPLOAD_SIZE_MB", "500")),
+                job_workers=int(os.getenv("JOB_WORKERS", "2")),
+                jobs_db_path=os.getenv("JOBS_DB_PATH", "ingestion_jobs.db"),
+                job_lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", "60")),
             ),
             top_k_results=int(os.getenv("TOP_K_RESULTS", "5")),
             upload_directory=os.getenv("UPLOAD_DIR", "uploads"),
-            processed_files_path=os.getenv("PROCESSED_FILES_PATH", "processed_files.json"),
+            processed_files_path=os.getenv("PROCESSED_FILES_PATH", "processed_files.db"),
         )
     
     def to_yaml(self, yaml_path: str):
@@ -211,6 +422,8 @@ class RAGConfig(BaseModel):
             return self._create_weaviate
         elif self.vector_db.provider == "qdrant":
             return self._create_qdrant
+        elif self.vector_db.provider == "local":
+            return self._create_local
         else:
             raise ValueError(f"Unsupported vector DB: {self.vector_db.provider}")
     
@@ -277,6 +490,18 @@ class RAGConfig(BaseModel):
             return client
         except ImportError:
             raise ImportError("Qdrant client not installed. Run: pip install qdrant-client")
+    
+    def _create_local(self):
+        """Create the local memory-mapped vector index."""
+        from utils.local_vector_index import LocalVectorClient
+        
+        client = LocalVectorClient(
+            self.vector_db.persist_directory,
+            dtype=self.vector_db.local_dtype,
+            ann=self.vector_db.local_ann,
+            ann_min_rows=self.vector_db.local_ann_min_rows
+        )
+        return client.get_or_create_collection(self.vector_db.index_name)
 
 
 # Create default configuration
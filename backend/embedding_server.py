@@ -0,0 +1,102 @@
+"""
+Shared embedding server.
+Loads the embedding model once and serves encode requests to all API workers
+over a local socket, so each uvicorn worker no longer holds its own model copy.
+"""
+
+import os
+import threading
+from multiprocessing.connection import Listener
+from typing import Callable
+from dotenv import load_dotenv
+
+from utils.embedding_batcher import EmbeddingBatcher
+from utils.embedding_client import parse_server_address, get_server_authkey
+
+load_dotenv()
+
+DEFAULT_ADDRESS = "127.0.0.1:6101"
+
+
+def handle_connection(conn, model, model_name: str, batcher: EmbeddingBatcher, encode: Callable):
+    """
+    Serve requests from one client connection until it closes.
+
+    Single-text requests (queries) go through the micro-batcher so that questions
+    from different workers share one forward pass; document batches are encoded directly.
+    Both paths call encode, which serializes access to the model.
+    """
+    with conn:
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                return
+
+            try:
+                if message[0] == "encode":
+                    _, texts, kwargs = message
+                    if len(texts) == 1 and not kwargs:
+                        result = batcher.encode(texts[0]).reshape(1, -1)
+                    else:
+                        result = encode(texts, **kwargs)
+                elif message[0] == "info":
+                    result = {
+                        "model_name": model_name,
+                        "dimension": model.get_sentence_embedding_dimension()
+                    }
+                else:
+                    raise ValueError(f"Unknown request: {message[0]}")
+                conn.send(("ok", result))
+            except Exception as e:
+                conn.send(("error", str(e)))
+
+
+def serve(address: str = None):
+    """
+    Run the embedding server until the process is terminated.
+
+    Args:
+        address: "host:port" or Unix socket path (defaults to EMBEDDING_SERVER_ADDRESS)
+    """
+    from sentence_transformers import SentenceTransformer
+
+    # Refuse to start without a shared secret, before loading the model
+    authkey = get_server_authkey()
+    address = address or os.getenv("EMBEDDING_SERVER_ADDRESS", DEFAULT_ADDRESS)
+    model_name = "paraphrase-multilingual-MiniLM-L12-v2"
+
+    print(f"[INFO] Loading embedding model {model_name}...")
+    model = SentenceTransformer(model_name, device=os.getenv("EMBEDDING_DEVICE") or None)
+    encode_lock = threading.Lock()
+
+    def locked_encode(texts, **kwargs):
+        # The model is not safe for concurrent encode calls
+        with encode_lock:
+            return model.encode(texts, **kwargs)
+
+    batcher = EmbeddingBatcher(
+        locked_encode,
+        max_batch_size=int(os.getenv("QUERY_BATCH_MAX_SIZE", "32")),
+        max_wait_ms=float(os.getenv("QUERY_BATCH_MAX_WAIT_MS", "5"))
+    )
+
+    # Every thread of every API worker opens its own connection, often at the same moment
+    with Listener(parse_server_address(address), backlog=128, authkey=authkey) as listener:
+        print(f"[INFO] Embedding server listening on {address}")
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                # Failed handshakes (wrong authkey, port scans) must not stop the server
+                print(f"[WARNING] Rejected embedding client: {e}")
+                continue
+            threading.Thread(
+                target=handle_connection,
+                args=(conn, model, model_name, batcher, locked_encode),
+                daemon=True
+            ).start()
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,145 @@
+"""
+Background worker pool draining the ingestion job queue.
+Each worker thread claims the highest priority queued job and processes it with
+BatchProcessor, recording progress in the queue so clients can poll it. A
+heartbeat thread renews the leases of the jobs being processed.
+"""
+
+import functools
+import threading
+from typing import Any, Dict, List
+from batch_processor import BatchProcessor
+from utils.job_queue import JobQueue, SUCCEEDED, SKIPPED, FAILED, remove_source_file
+
+
+class JobWorkerPool:
+    """
+    Fixed number of worker threads processing ingestion jobs.
+    """
+
+    def __init__(
+        self,
+        processor: BatchProcessor,
+        job_queue: JobQueue,
+        concurrency: int = 2,
+        poll_interval: float = 1.0
+    ):
+        """
+        Initialize the pool.
+
+        Args:
+            processor: Batch processor used to ingest each file
+            job_queue: Persistent job queue
+            concurrency: Number of jobs processed at the same time
+            poll_interval: Seconds between queue checks when idle (jobs enqueued by
+                other API workers are picked up within this delay)
+        """
+        self.processor = processor
+        self.job_queue = job_queue
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._heartbeat_thread = None
+        self._active = 0
+        self._active_lock = threading.Lock()
+
+    def start(self):
+        """Requeue jobs left running by a dead process and start the worker threads."""
+        requeued = self.job_queue.requeue_orphaned()
+        if requeued:
+            print(f"[INFO] Requeued {requeued} interrupted ingestion jobs")
+
+        self._stopping.clear()
+        for i in range(self.concurrency):
+            thread = threading.Thread(target=self._run, name=f"ingest-job-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat, name="ingest-job-heartbeat", daemon=True)
+        self._heartbeat_thread.start()
+
+    def stop(self, timeout: float = None):
+        """
+        Stop the workers after their current job. Jobs still running after the
+        timeout stop being renewed, so they are requeued once their lease expires.
+
+        Args:
+            timeout: Seconds to wait for each worker thread
+        """
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join(timeout)
+        self._threads = []
+        self._heartbeat_thread = None
+
+    def notify(self):
+        """Wake idle workers after a job was enqueued in this process."""
+        self._wakeup.set()
+
+    def _heartbeat(self):
+        # Renew well before expiry, so a slow renewal does not cost the lease
+        interval = max(self.job_queue.lease_seconds / 3, 0.1)
+        while not self._stopping.wait(interval):
+            try:
+                self.job_queue.renew_leases()
+            except Exception as e:
+                print(f"[WARNING] Could not renew ingestion job leases: {e}")
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                job = self.job_queue.claim()
+            except Exception as e:
+                print(f"[WARNING] Could not claim an ingestion job, retrying: {e}")
+                self._stopping.wait(self.poll_interval)
+                continue
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            with self._active_lock:
+                self._active += 1
+            try:
+                self._process(job)
+            finally:
+                with self._active_lock:
+                    self._active -= 1
+
+    def _process(self, job: Dict[str, Any]):
+        """Ingest the file of one job and record the outcome."""
+        on_progress = functools.partial(self.job_queue.update_progress, job['id'])
+        try:
+            result = self.processor.process_single_file(
+                job['file_path'],
+                on_progress=on_progress,
+                source_path=job['source_path']
+            )
+        except Exception as e:
+            result = {'filename': job['filename'], 'status': 'failed', 'error': str(e)}
+        finally:
+            if job['source_path']:
+                remove_source_file(job['source_path'])
+
+        status = {'success': SUCCEEDED, 'skipped': SKIPPED}.get(result['status'], FAILED)
+        on_progress(stage='done')
+        self.job_queue.finish(job['id'], status, result=result, error=result.get('error'))
+
+        if status == FAILED:
+            print(f"[ERROR] Ingestion job {job['id']} ({job['filename']}) failed: {result.get('error')}")
+        else:
+            print(f"[OK] Ingestion job {job['id']} ({job['filename']}) {status}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Get worker activity and queue counts."""
+        with self._active_lock:
+            active = self._active
+        return {
+            'concurrency': self.concurrency,
+            'active': active,
+            'jobs': self.job_queue.counts()
+        }
@@ -1,53 +1,150 @@
-from fastapi import FastAPI, UploadFile, Form
-from utils.pdf_loader import extract_text_by_pages, compute_file_hash
-from utils.splitter import split_text_by_pages
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, Form, HTTPException, Depends
+from fastapi.responses import StreamingResponse, JSONResponse, Response
+from utils.pdf_loader import warm_up_ocr
+from utils.file_registry import FileRegistry
+from utils.job_queue import JobQueue
+from utils.metadata_filter import build_where
+from utils.metrics import PROMETHEUS_AVAILABLE, render_metrics
 from rag_engine import RAGEngine
+from batch_processor import BatchProcessor
+from job_worker import JobWorkerPool
+import asyncio
+import hashlib
 import os
+import shutil
+import time
 import json
+import uuid
+from typing import List, Optional
 
-app = FastAPI(title="ISM Portfolio - Enterprise RAG")
-
+# Heavy components (embedding model, ChromaDB) load lazily; see warm_up below
 engine = RAGEngine()
 
+warmup_state = {"status": "pending", "timings": None, "error": None}
+
+
+async def warm_up_engine():
+    """Load heavy engine components in the background and record readiness."""
+    warmup_state["status"] = "warming"
+    try:
+        timings = await engine.run_in_executor(engine.warm_up)
+        if os.getenv("WARMUP_OCR", "false").lower() == "true":
+            start = time.perf_counter()
+            await engine.run_in_executor(warm_up_ocr)
+            timings['ocr'] = time.perf_counter() - start
+        warmup_state["timings"] = timings
+        warmup_state["status"] = "ready"
+        print(f"[OK] Engine warm-up completed: {warmup_state['timings']}")
+    except Exception as e:
+        warmup_state["status"] = "failed"
+        warmup_state["error"] = str(e)
+        print(f"[ERROR] Engine warm-up failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    os.makedirs(JOB_FILES_DIR, exist_ok=True)
+    # Warm up without blocking startup, so the worker accepts connections (and /health) immediately
+    warmup_task = None
+    if os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true":
+        warmup_task = asyncio.create_task(warm_up_engine())
+    # Background ingestion workers drain the persistent job queue
+    job_workers.start()
+    yield
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    job_workers.stop(timeout=5)
+
+
+app = FastAPI(title="ISM Portfolio - Enterprise RAG", lifespan=lifespan)
+
 UPLOAD_DIR = "uploads"
-PROCESSED_FILE_PATH = "processed_files.json"
+# Private copies of uploads for queued jobs, so a newer upload never changes a file mid-job
+JOB_FILES_DIR = os.path.join(UPLOAD_DIR, ".jobs")
+PROCESSED_FILE_PATH = os.getenv("PROCESSED_FILES_PATH", "processed_files.db")
+MAX_UPLOAD_BYTES = int(float(os.getenv("MAX_UPLOAD_SIZE_MB", "500")) * 1024 * 1024)
+UPLOAD_CHUNK_BYTES = 1024 * 1024
 
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+# Processed files registry (SQLite, safe across threads and workers; opened on first use)
+registry = FileRegistry.from_path(PROCESSED_FILE_PATH)
 
-def load_processed_files():
-    """Load the registry of processed files with their hashes."""
-    if os.path.exists(PROCESSED_FILE_PATH):
-        with open(PROCESSED_FILE_PATH, "r") as f:
-            return json.load(f)
-    return {}
+# Ingestion jobs: /upload enqueues, a local worker pool processes them (the queue database is opened on first use)
+job_queue = JobQueue(
+    os.getenv("JOBS_DB_PATH", "ingestion_jobs.db"),
+    lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", "60"))
+)
+job_workers = JobWorkerPool(
+    BatchProcessor(engine, processed_file_path=PROCESSED_FILE_PATH),
+    job_queue,
+    concurrency=int(os.getenv("JOB_WORKERS", "2"))
+)
 
-def save_processed_files(processed):
-    """Save the registry of processed files."""
-    with open(PROCESSED_FILE_PATH, "w") as f:
-        json.dump(processed, f, indent=2)
+async def stream_upload(file: UploadFile, file_path: str) -> str:
+    """
+    Stream an upload to disk in large chunks, hashing it on the way.
+    
+    Args:
+        file: Uploaded file
+        file_path: Destination path
+    
+    Returns:
+        SHA-256 hex digest of the content
+    
+    Raises:
+        HTTPException: 413 if the upload exceeds MAX_UPLOAD_SIZE_MB
+    """
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"File exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB upload limit")
+
+    sha256_hash = hashlib.sha256()
+    size = 0
+    f = await engine.run_in_executor(open, file_path, "wb")
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail=f"File exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB upload limit")
+            sha256_hash.update(chunk)
+            await engine.run_in_executor(f.write, chunk)
+    except BaseException:
+        f.close()
+        os.remove(file_path)
+        raise
+    f.close()
+    return sha256_hash.hexdigest()
+
+def link_or_copy(src: str, dst: str):
+    """Hard-link a file (no copy of the content), copying it where links are not supported."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
 
 @app.post("/upload")
-async def upload_file(file: UploadFile):
+async def upload_file(file: UploadFile, priority: int = Form(0)):
     """
-    Upload and process a PDF file with incremental updates.
-    Only reprocesses if the file content has changed.
+    Upload a PDF file and queue it for background processing.
+    Unchanged files are skipped immediately; poll /jobs/{job_id} for progress.
     """
-    # Save the file
+    # Stream the upload to a temporary file, hashing it in flight
     file_path = os.path.join(UPLOAD_DIR, file.filename)
-    with open(file_path, "wb") as f:
-        f.write(await file.read())
-
-    # Compute file hash for change detection
-    file_hash = compute_file_hash(file_path)
+    part_path = f"{file_path}.{uuid.uuid4().hex}.part"
+    file_hash = await stream_upload(file, part_path)
     
-    # Load processed files registry
-    processed = load_processed_files()
+    # Look up the file in the processed files registry
+    entry = await engine.run_in_executor(registry.get, file.filename)
     
     # Check if file was already processed with the same hash
-    if file.filename in processed:
-        stored_hash = processed[file.filename].get('hash')
+    if entry is not None:
+        stored_hash = entry['hash']
         if stored_hash == file_hash:
-            chunk_count = processed[file.filename].get('chunk_count', 0)
+            # Same content as the file already on disk: skip before any parsing
+            await engine.run_in_executor(os.remove, part_path)
+            chunk_count = entry['chunk_count']
             return {
                 "message": f"File '{file.filename}' already processed (unchanged)",
                 "chunks": chunk_count,
@@ -56,59 +153,144 @@ async def upload_file(file: UploadFile):
         else:
             print(f"[INFO] File '{file.filename}' modified. Reprocessing...")
 
-    # Extract text by pages (preserves page numbers)
-    pages_text, page_count = extract_text_by_pages(file_path)
-    
-    # Split text with metadata
-    base_metadata = {
-        'filename': file.filename,
-        'total_pages': page_count
-    }
-    chunks = split_text_by_pages(pages_text, chunk_size=800, overlap=100, base_metadata=base_metadata)
-
-    # Prepare documents for batch insertion
-    documents_to_add = []
-    for i, chunk_data in enumerate(chunks):
-        doc_id = f"{file.filename}::{chunk_data['metadata'].get('page_number', 0)}::{i}"
-        documents_to_add.append({
-            'text': chunk_data['text'],
-            'doc_id': doc_id,
-            'metadata': chunk_data['metadata']
-        })
-
-    # Add to vector database in batch
-    engine.add_documents_batch(documents_to_add)
-
-    # Update processed files registry
-    processed[file.filename] = {
-        'hash': file_hash,
-        'chunk_count': len(chunks),
-        'page_count': page_count
-    }
-    save_processed_files(processed)
+    # Give the job its own copy, then move the complete upload into place
+    source_path = os.path.join(JOB_FILES_DIR, f"{uuid.uuid4().hex}-{file.filename}")
+    await engine.run_in_executor(link_or_copy, part_path, source_path)
+    await engine.run_in_executor(os.replace, part_path, file_path)
 
-    print(f"[SUCCESS] {file.filename} processed - {len(chunks)} chunks indexed from {page_count} pages")
+    # Queue extraction, OCR, embedding and indexing for the background workers
+    # (a job still queued for the same file is updated instead)
+    job_id = await engine.run_in_executor(job_queue.enqueue, file.filename, file_path, priority, source_path)
+    job_workers.notify()
+
+    print(f"[INFO] {file.filename} queued for processing (job {job_id})")
     return {
-        "message": "PDF processed and indexed successfully",
-        "chunks": len(chunks),
-        "pages": page_count,
-        "status": "processed"
+        "message": f"File '{file.filename}' queued for processing",
+        "job_id": job_id,
+        "status": "queued"
     }
 
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Report the status and progress of an ingestion job.
+    """
+    job = await engine.run_in_executor(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
+
+@app.get("/jobs")
+async def list_jobs(status: str = None, limit: int = 50):
+    """
+    List recent ingestion jobs, newest first.
+    """
+    return await engine.run_in_executor(job_queue.list, status, limit)
+
+def retrieval_filter(
+    filename: Optional[str] = Form(None),
+    filenames: Optional[List[str]] = Form(None),
+    page_from: Optional[int] = Form(None),
+    page_to: Optional[int] = Form(None),
+    ingested_after: Optional[str] = Form(None),
+    ingested_before: Optional[str] = Form(None)
+) -> Optional[dict]:
+    """
+    Optional retrieval filters of /ask and /ask/stream, as a ChromaDB where clause.
+    Dates are ISO 8601 (e.g. 2025-01-31 or 2025-01-31T12:00).
+    """
+    try:
+        return build_where(
+            filename=filename,
+            filenames=[name for name in filenames or [] if name],
+            page_from=page_from,
+            page_to=page_to,
+            ingested_after=ingested_after or None,
+            ingested_before=ingested_before or None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid date filter: {e}")
+
 @app.post("/ask")
-async def ask_question(question: str = Form(...)):
+async def ask_question(question: str = Form(...), where: Optional[dict] = Depends(retrieval_filter)):
     """
     Query the RAG system and get answers with source references.
+    Retrieval can be limited to some files, a page range or an ingestion period.
     """
     # Query for relevant documents
-    docs = engine.query(question, top_k=5)
+    docs = await engine.aquery(question, top_k=5, where=where)
     
     # Generate answer with sources
-    result = engine.generate_answer(question, docs)
+    result = await engine.agenerate_answer(question, docs)
     
     return {
         "question": question,
         "answer": result['answer'],
         "sources": result['sources'],
-        "num_sources": len(result['sources'])
+        "num_sources": len(result['sources']),
+        "cached": result['cached']
+    }
+
+@app.post("/ask/stream")
+async def ask_question_stream(question: str = Form(...), where: Optional[dict] = Depends(retrieval_filter)):
+    """
+    Query the RAG system and stream the answer as Server-Sent Events.
+    Sources are sent first, followed by answer tokens as the LLM produces them.
+    Accepts the same retrieval filters as /ask.
+    """
+    # Query for relevant documents
+    docs = await engine.aquery(question, top_k=5, where=where)
+
+    async def event_stream():
+        async for event in engine.agenerate_answer_stream(question, docs):
+            payload = json.dumps(event, ensure_ascii=False)
+            yield f"event: {event['type']}\ndata: {payload}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/health")
+async def health():
+    """
+    Liveness probe: the worker process is up and serving requests.
+    """
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    """
+    Readiness probe: the embedding model and vector store are loaded.
+    """
+    body = {
+        "ready": engine.is_ready,
+        "warmup": warmup_state
+    }
+    return JSONResponse(status_code=200 if engine.is_ready else 503, content=body)
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus metrics: per-stage duration histograms and counters for indexed
+    chunks, cache hits and failures, labelled by worker.
+    """
+    if not PROMETHEUS_AVAILABLE:
+        raise HTTPException(status_code=503, detail="prometheus-client not installed")
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/stats")
+async def get_stats():
+    """
+    Report runtime cache and ingestion statistics for this worker.
+    """
+    return {
+        "query_embedding_cache": engine.query_cache.stats(),
+        "answer_cache": engine.answer_cache.stats(),
+        "ingestion_jobs": job_workers.stats(),
+        "embedding_store": engine.embedding_store.stats() if engine.embedding_store else None,
+        "reranker": engine.reranker.stats() if engine.reranker else None,
+        "query_batcher": engine.query_batcher.stats() if engine.query_batcher else None
     }
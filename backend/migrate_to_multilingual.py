@@ -1,31 +1,25 @@
 """
 Migration script to upgrade to multilingual embeddings model.
-Removes old database and reindexes all documents with the new model.
+Reindexes all documents with the new model into a new collection and switches
+to it once complete, so the API keeps serving during the migration.
 """
-import os
-import shutil
-from reindex_all import reindex_all_documents
+from clean_and_reindex import clean_and_reindex
 
 def migrate():
     """Migrate from monolingual to multilingual embeddings model."""
     print("Multilingual Model Migration (Romanian + English + 48 other languages)")
     print("=" * 80)
     
-    # Remove old database with monolingual embeddings
-    chroma_path = "../chroma_store"
-    if os.path.exists(chroma_path):
-        print(f"\n[INFO] Removing old database: {chroma_path}")
-        shutil.rmtree(chroma_path)
-        print("[OK] Old database removed")
-    
-    # Reindex all documents with new multilingual model
+    # Reindex all documents with new multilingual model (old collection kept for rollback)
     print("\n[INFO] Reindexing documents with multilingual model...")
     print("   Model: paraphrase-multilingual-MiniLM-L12-v2")
     print("   Embedding dimension: 384 (unchanged)")
     print("   Language support: Romanian, English, + 48 other languages")
     print()
     
-    reindex_all_documents()
+    if not clean_and_reindex():
+        print("\n[ERROR] Migration aborted, the previous collection is still live")
+        return
     
     print("\n" + "=" * 80)
     print("[SUCCESS] Migration completed successfully!")
@@ -37,6 +31,3 @@ def migrate():
 
 if __name__ == "__main__":
     migrate()
-
-if __name__ == "__main__":
-    migrate()
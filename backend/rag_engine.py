@@ -1,27 +1,133 @@
 import os
 from dotenv import load_dotenv
-import chromadb
-from sentence_transformers import SentenceTransformer
-from ollama import Client
-from typing import List, Dict, Any
+from ollama import Client, AsyncClient
+from typing import List, Dict, Any, Iterator, AsyncIterator, Callable, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
 import json
+import threading
+import time
+import numpy as np
+from utils.embedding_cache import QueryEmbeddingCache
+from utils.answer_cache import SemanticAnswerCache
+from utils.index_generation import IndexGeneration
+from utils.embedding_batcher import EmbeddingBatcher
+from utils.embedding_client import RemoteEmbedder, get_server_authkey
+from utils.embedding_store import EmbeddingStore
+from utils.collection_alias import CollectionAlias
+from utils.sharded_collection import ShardedCollection, shard_collection_names, base_collection_name
+from utils.bm25_index import BM25Index
+from utils.reranker import CrossEncoderReranker
+from utils.context_builder import build_context
+from utils.metrics import time_stage, observe_stage, count_chunks_indexed, count_cache, count_failure
+from utils.splitter import chunk_content_hash
 
 load_dotenv()
 
+# Metadata identifying a chunk's content and position. Other fields (e.g. 'ingested_at',
+# the file's modification time) change with every edit of the file, even for chunks that did not
+CHUNK_IDENTITY_FIELDS = ('content_hash', 'page_number', 'chunk_index', 'start_char', 'end_char')
+
+# Filtered keyword search: growth factor of the over-fetch, and rounds before searching only matching chunks
+KEYWORD_FILTER_OVERFETCH = 4
+KEYWORD_FILTER_ROUNDS = 3
+
 class RAGEngine:
-    def __init__(self, persist_directory="../chroma_store"):
+    def __init__(
+        self,
+        persist_directory="../chroma_store",
+        collection_name: str = None,
+        embedding_batch_size: int = None,
+        embedding_device: str = None
+    ):
         """
         Initialize RAG engine with multilingual embeddings and persistent storage.
         
+        The embedding model and ChromaDB are loaded lazily on first use (or by
+        warm_up), so constructing the engine and importing the API stay fast.
+        
         Args:
             persist_directory: Path to ChromaDB persistent storage
+            collection_name: Pin the engine to this collection (e.g. a shadow collection
+                being rebuilt); by default the engine follows the collection alias
+            embedding_batch_size: Texts per model forward pass (default: EMBEDDING_BATCH_SIZE)
+            embedding_device: Device of the embedding model, e.g. 'cpu' or 'cuda'
+                (default: EMBEDDING_DEVICE, else the model picks one)
         """
-        # Initialize multilingual embeddings model (supports 50+ languages including Romanian and English)
-        self.embedder = SentenceTransformer("paraphrase-multilingual-MiniLM-L12-v2")
+        # Multilingual embeddings model (supports 50+ languages including Romanian and English)
+        self.embedding_model_name = "paraphrase-multilingual-MiniLM-L12-v2"
+        self.persist_directory = persist_directory
+        self.embedding_batch_size = embedding_batch_size or int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+        self.embedding_device = embedding_device or os.getenv("EMBEDDING_DEVICE") or None
+        self._embedder = None
+        self._client = None
+        self._collection = None
+        self._collection_name = None
+        self.pinned_collection_name = collection_name
+        self.collection_alias = CollectionAlias(os.path.join(persist_directory, "collection_alias.json"))
+        self._init_lock = threading.Lock()
+        self._encode_lock = threading.Lock()
+
+        # Optionally split the collection into shards queried concurrently (changing the count requires a reindex)
+        self.shard_count = max(1, int(os.getenv("SHARD_COUNT", "1")))
+        self.shard_key = os.getenv("SHARD_KEY", "filename")
+        self.shard_executor = (
+            ThreadPoolExecutor(max_workers=self.shard_count, thread_name_prefix="rag-shard")
+            if self.shard_count > 1 else None
+        )
+
+        # Persistent content-addressed store of chunk embeddings, so rebuilds only embed new text
+        embedding_store_dir = os.getenv("EMBEDDING_STORE_DIR", "embedding_store")
+        self.embedding_store = (
+            EmbeddingStore(embedding_store_dir, self.embedding_model_name) if embedding_store_dir else None
+        )
+
+        # BM25 keyword index kept alongside the collection, fused with vector search in query
+        self.keyword_index = None
+        if os.getenv("HYBRID_SEARCH", "true").lower() == "true":
+            self.keyword_index = BM25Index(
+                os.getenv("BM25_INDEX_PATH") or os.path.join(persist_directory, "bm25_index.db")
+            )
+        self.rrf_k = int(os.getenv("RRF_K", "60"))
+        self.hybrid_candidates = int(os.getenv("HYBRID_CANDIDATES", "4"))
+        self._keyword_index_checked = set()
+
+        # Optional cross-encoder rerank of over-fetched candidates, so fewer, better chunks reach the LLM
+        self.reranker = None
+        if os.getenv("RERANK", "false").lower() == "true":
+            self.reranker = CrossEncoderReranker(
+                model_name=os.getenv("RERANK_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"),
+                device=os.getenv("RERANK_DEVICE", "cpu") or None,
+                batch_size=int(os.getenv("RERANK_BATCH_SIZE", "32"))
+            )
+        self.rerank_candidates = int(os.getenv("RERANK_CANDIDATES", "20"))
+        rerank_min_score = os.getenv("RERANK_MIN_SCORE")
+        self.rerank_min_score = float(rerank_min_score) if rerank_min_score else None
 
-        # Initialize persistent ChromaDB client
-        self.client = chromadb.PersistentClient(path=persist_directory)
-        self.collection = self.client.get_or_create_collection("documents")
+        # Overlapping chunks are merged and the prompt context is trimmed to this budget
+        context_max_tokens = int(os.getenv("CONTEXT_MAX_TOKENS", "2000"))
+        self.context_max_tokens = context_max_tokens if context_max_tokens > 0 else None
+        self.context_chars_per_token = float(os.getenv("CONTEXT_CHARS_PER_TOKEN", "3.5"))
+
+        # Cache query embeddings so repeated questions skip the forward pass
+        query_cache_ttl = float(os.getenv("QUERY_CACHE_TTL", "0"))
+        self.query_cache = QueryEmbeddingCache(
+            model_name=self.embedding_model_name,
+            max_size=int(os.getenv("QUERY_CACHE_SIZE", "1024")),
+            ttl_seconds=query_cache_ttl if query_cache_ttl > 0 else None,
+            disk_dir=os.getenv("QUERY_CACHE_DIR") or None,
+            disk_max_entries=int(os.getenv("QUERY_CACHE_DISK_SIZE", "10000"))
+        )
+
+        # Optionally coalesce concurrent query embeddings into batched encode calls
+        self.query_batcher = None
+        if os.getenv("QUERY_BATCHING", "false").lower() == "true":
+            self.query_batcher = EmbeddingBatcher(
+                self.encode,
+                max_batch_size=int(os.getenv("QUERY_BATCH_MAX_SIZE", "32")),
+                max_wait_ms=float(os.getenv("QUERY_BATCH_MAX_WAIT_MS", "5"))
+            )
 
         # Load LLM configuration from environment
         self.model_name = os.getenv("MODEL_NAME", "gpt-oss:120b")
@@ -35,6 +141,205 @@ class RAGEngine:
             host="https://ollama.com",
             headers={"Authorization": f"Bearer {self.api_key}"}
         )
+        self.async_llm_client = AsyncClient(
+            host="https://ollama.com",
+            headers={"Authorization": f"Bearer {self.api_key}"}
+        )
+
+        # Bounded executor for blocking CPU/IO work (embedding, OCR, ChromaDB) used by the async API
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("CPU_EXECUTOR_WORKERS", "4")),
+            thread_name_prefix="rag-cpu"
+        )
+
+        # Reuse answers for near-identical questions over the same retrieved chunks; the shared
+        # index generation drops them when another process re-indexes, the TTL bounds the rest
+        self.index_generation = IndexGeneration(os.path.join(persist_directory, "index_generation.db"))
+        answer_cache_ttl = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+        self.answer_cache = SemanticAnswerCache(
+            max_size=int(os.getenv("ANSWER_CACHE_SIZE", "512")),
+            similarity_threshold=float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95")),
+            ttl_seconds=answer_cache_ttl if answer_cache_ttl > 0 else None
+        )
+
+    @property
+    def embedder(self):
+        """Embedding model, loaded on first access."""
+        if self._embedder is None:
+            with self._init_lock:
+                if self._embedder is None:
+                    embedding_server_address = os.getenv("EMBEDDING_SERVER_ADDRESS")
+                    if embedding_server_address:
+                        # Shared embedding server: one model copy serves every API worker
+                        self._embedder = RemoteEmbedder(embedding_server_address, get_server_authkey())
+                    else:
+                        from sentence_transformers import SentenceTransformer
+                        self._embedder = SentenceTransformer(self.embedding_model_name, device=self.embedding_device)
+        return self._embedder
+
+    def encode(self, texts: List[str], **kwargs) -> np.ndarray:
+        """
+        Encode texts with the embedding model. Every embedding call goes through here:
+        an in-process model is not safe for concurrent encode calls (job workers, the
+        executor and the query batcher share it), so they are serialized. The
+        embedding server serializes its own calls.
+        
+        Args:
+            texts: Texts to embed
+            **kwargs: Passed to encode (e.g. batch_size)
+            
+        Returns:
+            2-D array with one embedding per text
+        """
+        embedder = self.embedder
+        if isinstance(embedder, RemoteEmbedder):
+            return embedder.encode(texts, **kwargs)
+        with self._encode_lock:
+            return embedder.encode(texts, **kwargs)
+
+    @property
+    def client(self):
+        """Persistent vector store client (ChromaDB, or the local memory-mapped index), opened on first access."""
+        if self._client is None:
+            with self._init_lock:
+                if self._client is None:
+                    if os.getenv("VECTOR_DB_PROVIDER", "chromadb").lower() == "local":
+                        from utils.local_vector_index import LocalVectorClient
+                        self._client = LocalVectorClient(
+                            self.persist_directory,
+                            dtype=os.getenv("LOCAL_INDEX_DTYPE", "float16"),
+                            ann=os.getenv("LOCAL_INDEX_ANN") or None,
+                            ann_min_rows=int(os.getenv("LOCAL_INDEX_ANN_MIN_ROWS", "20000"))
+                        )
+                    else:
+                        import chromadb
+                        self._client = chromadb.PersistentClient(path=self.persist_directory)
+        return self._client
+
+    @property
+    def collection(self):
+        """
+        ChromaDB collection holding the indexed chunks (the alias target unless pinned).
+        With SHARD_COUNT > 1 this is a ShardedCollection over one collection per shard.
+        """
+        name = self.pinned_collection_name or self.collection_alias.active()
+        if self._collection is None or self._collection_name != name:
+            client = self.client
+            with self._init_lock:
+                if self._collection is None or self._collection_name != name:
+                    switched = self._collection is not None
+                    if self.shard_count > 1:
+                        self._collection = ShardedCollection(
+                            name,
+                            [
+                                client.get_or_create_collection(
+                                    shard_name,
+                                    metadata={"embedding_model": self.embedding_model_name}
+                                )
+                                for shard_name in shard_collection_names(name, self.shard_count)
+                            ],
+                            self.shard_key,
+                            self.shard_executor
+                        )
+                    else:
+                        self._collection = client.get_or_create_collection(
+                            name,
+                            metadata={"embedding_model": self.embedding_model_name}
+                        )
+                    self._collection_name = name
+                    if switched:
+                        # Cached answers were built from the previous collection
+                        self.answer_cache.clear()
+                        print(f"[INFO] Switched to collection '{name}'")
+        return self._collection
+
+    def switch_collection(self, name: str) -> Dict[str, Any]:
+        """
+        Atomically make a collection live for every engine following the alias.
+        The replaced collection is kept for rollback.
+        
+        Args:
+            name: Collection to activate
+            
+        Returns:
+            The new alias state ('active', 'previous', 'updated_at')
+        """
+        return self.collection_alias.switch(name)
+
+    def rollback_collection(self) -> Dict[str, Any]:
+        """
+        Switch the alias back to the collection that was live before the last switch.
+        
+        Returns:
+            The new alias state
+        """
+        return self.collection_alias.rollback()
+
+    @property
+    def is_ready(self) -> bool:
+        """True once the embedding model and vector store have been loaded."""
+        return self._embedder is not None and self._collection is not None
+
+    def warm_up(self) -> Dict[str, float]:
+        """
+        Load heavy components ahead of the first request.
+        
+        Returns:
+            Dict with load time in seconds per component
+        """
+        timings = {}
+
+        start = time.perf_counter()
+        self.encode(["warm-up"])
+        timings['embedder'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.collection.count()
+        timings['vector_store'] = time.perf_counter() - start
+
+        if self.keyword_index is not None:
+            start = time.perf_counter()
+            self.ensure_keyword_index()
+            timings['keyword_index'] = time.perf_counter() - start
+
+        if self.reranker is not None:
+            start = time.perf_counter()
+            self.reranker.rerank("warm-up", [{'text': "warm-up"}], top_k=1)
+            timings['reranker'] = time.perf_counter() - start
+
+        return timings
+
+    def ensure_keyword_index(self):
+        """
+        Backfill the BM25 index from the live collection if they are out of step
+        (e.g. chunks indexed before hybrid search was enabled). Only chunks missing
+        from the index are added, and entries no longer in the collection removed.
+        Checked once per collection and process.
+        """
+        collection = self.collection
+        name = collection.name
+        if self.keyword_index is None or name in self._keyword_index_checked:
+            return
+
+        with self._init_lock:
+            if name in self._keyword_index_checked:
+                return
+            total = collection.count()
+            if self.keyword_index.count(name) != total:
+                page_size = 1000
+                collection_ids = set()
+                for offset in range(0, total, page_size):
+                    collection_ids.update(collection.get(limit=page_size, offset=offset, include=[])['ids'])
+                indexed_ids = self.keyword_index.ids(name)
+                missing = sorted(collection_ids - indexed_ids)
+                self.keyword_index.delete(name, sorted(indexed_ids - collection_ids))
+
+                print(f"[INFO] Adding {len(missing)} chunks to the BM25 index for collection '{name}'...")
+                for start in range(0, len(missing), page_size):
+                    page = collection.get(ids=missing[start:start + page_size], include=["documents"])
+                    self.keyword_index.add(name, page['ids'], page['documents'])
+                print("[OK] BM25 index backfilled")
+            self._keyword_index_checked.add(name)
 
     def add_document(self, text: str, doc_id: str, metadata: Dict[str, Any] = None):
         """
@@ -48,13 +353,8 @@ class RAGEngine:
         if metadata is None:
             metadata = {}
             
-        embeddings = self.embedder.encode([text])
-        self.collection.add(
-            documents=[text],
-            embeddings=embeddings.tolist(),
-            ids=[doc_id],
-            metadatas=[metadata]
-        )
+        embeddings = self.encode([text])
+        self.write_documents([{'text': text, 'doc_id': doc_id, 'metadata': metadata}], embeddings)
 
     def add_documents_batch(self, documents: List[Dict[str, Any]]):
         """
@@ -66,34 +366,396 @@ class RAGEngine:
         if not documents:
             return
             
-        texts = [doc['text'] for doc in documents]
+        embeddings = self.embed_documents([doc['text'] for doc in documents])
+        self.write_documents(documents, embeddings)
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed document chunk texts with the configured batch size (EMBEDDING_BATCH_SIZE).
+        Texts already in the embedding store are not embedded again.
+        
+        Args:
+            texts: Chunk texts
+            
+        Returns:
+            2-D array with one embedding per text
+        """
+        return self.embed_documents_counted(texts)[0]
+
+    def embed_documents_counted(self, texts: List[str]) -> Tuple[np.ndarray, int]:
+        """
+        Same as embed_documents, also reporting how many texts came from the embedding store.
+        
+        Args:
+            texts: Chunk texts
+            
+        Returns:
+            Tuple of (2-D array with one embedding per text, number of store hits)
+        """
+        if self.embedding_store is None or not texts:
+            with time_stage("embed"):
+                return self.encode(texts, batch_size=self.embedding_batch_size), 0
+
+        hashes = [chunk_content_hash(text) for text in texts]
+        stored = self.embedding_store.get_many(hashes)
+        missing = [i for i, content_hash in enumerate(hashes) if content_hash not in stored]
+        count_cache("embedding_store", hits=len(texts) - len(missing), misses=len(missing))
+
+        if missing:
+            with time_stage("embed"):
+                embeddings = self.encode([texts[i] for i in missing], batch_size=self.embedding_batch_size)
+            try:
+                self.embedding_store.put_many([hashes[i] for i in missing], embeddings)
+            except Exception as e:
+                print(f"[WARNING] Could not write to the embedding store: {e}")
+            for i, embedding in zip(missing, embeddings):
+                stored[hashes[i]] = embedding
+
+        return np.stack([stored[content_hash] for content_hash in hashes]), len(texts) - len(missing)
+
+    def write_documents(self, documents: List[Dict[str, Any]], embeddings: np.ndarray):
+        """
+        Write already embedded documents to the vector database.
+        
+        Args:
+            documents: List of dicts with 'text', 'doc_id', and 'metadata' keys
+            embeddings: One embedding per document, in the same order
+        """
+        if not documents:
+            return
+            
         doc_ids = [doc['doc_id'] for doc in documents]
-        metadatas = [doc.get('metadata', {}) for doc in documents]
         
-        embeddings = self.embedder.encode(texts)
+        # Upsert, so rewriting an existing chunk id replaces it instead of failing
+        collection = self.collection
+        with time_stage("vector_write"):
+            collection.upsert(
+                documents=[doc['text'] for doc in documents],
+                embeddings=np.asarray(embeddings).tolist(),
+                ids=doc_ids,
+                metadatas=[doc.get('metadata', {}) for doc in documents]
+            )
+        count_chunks_indexed(len(doc_ids))
+        if self.keyword_index is not None:
+            self.keyword_index.add(collection.name, doc_ids, [doc['text'] for doc in documents])
+        self.answer_cache.invalidate(doc_ids, generation=self.index_generation.bump(collection.name))
+
+    def delete_documents(self, doc_ids: List[str]):
+        """
+        Delete chunks from the vector database.
+        
+        Args:
+            doc_ids: Ids of the chunks to delete
+        """
+        if not doc_ids:
+            return
+            
+        collection = self.collection
+        collection.delete(ids=list(doc_ids))
+        if self.keyword_index is not None:
+            self.keyword_index.delete(collection.name, doc_ids)
+        self.answer_cache.invalidate(doc_ids, generation=self.index_generation.bump(collection.name))
+
+    def drop_collection(self, name: str):
+        """
+        Delete a collection, all its shards and its keyword index (e.g. an old blue/green version).
+        
+        Args:
+            name: Logical collection name
+        """
+        for collection in self.client.list_collections():
+            # Older ChromaDB versions return names, newer ones return collection objects
+            physical_name = getattr(collection, "name", collection)
+            if base_collection_name(physical_name) == name:
+                self.client.delete_collection(physical_name)
+        if self.keyword_index is not None:
+            self.keyword_index.drop_collection(name)
+
+    def diff_document(self, filename: str, documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Compare the new chunks of a file with the chunks already indexed for it.
+        
+        Chunks are matched by content hash, so a chunk whose id moved (e.g. after
+        text was inserted earlier in the file) reuses its stored embedding. A chunk
+        is unchanged when its content and position are (CHUNK_IDENTITY_FIELDS); unchanged
+        and moved chunks keep their stored 'ingested_at'.
         
-        self.collection.add(
-            documents=texts,
-            embeddings=embeddings.tolist(),
-            ids=doc_ids,
-            metadatas=metadatas
+        Args:
+            filename: Source filename (the 'filename' metadata of its chunks)
+            documents: New chunks, as returned by build_chunk_documents
+            
+        Returns:
+            Dict with:
+                'embed': chunks with new content, which need embedding
+                'reuse': (chunks, embeddings) for chunks whose content is already indexed
+                'stale': ids of indexed chunks the new version no longer has
+                'unchanged': number of chunks already stored exactly as they are
+        """
+        existing = self.collection.get(
+            where={"filename": filename},
+            include=["metadatas", "embeddings"]
         )
+        existing_ids = existing['ids'] or []
+        existing_metadatas = existing['metadatas'] or [{}] * len(existing_ids)
+        existing_embeddings = existing['embeddings'] if existing['embeddings'] is not None else []
+
+        stored = {doc_id: metadata or {} for doc_id, metadata in zip(existing_ids, existing_metadatas)}
+        embedding_by_hash, metadata_by_hash = {}, {}
+        for metadata, embedding in zip(existing_metadatas, existing_embeddings):
+            content_hash = (metadata or {}).get('content_hash')
+            if content_hash:
+                embedding_by_hash[content_hash] = embedding
+                metadata_by_hash[content_hash] = metadata
+
+        def keep_ingested_at(metadata, stored_metadata):
+            if 'ingested_at' in stored_metadata:
+                metadata['ingested_at'] = stored_metadata['ingested_at']
 
-    def query(self, question: str, top_k=3) -> List[Dict[str, Any]]:
+        to_embed, reuse_docs, reuse_embeddings = [], [], []
+        unchanged = 0
+        for doc in documents:
+            metadata = doc.setdefault('metadata', {})
+            content_hash = metadata.setdefault('content_hash', chunk_content_hash(doc['text']))
+            stored_metadata = stored.get(doc['doc_id'])
+
+            if stored_metadata is not None and all(
+                stored_metadata.get(field) == metadata.get(field) for field in CHUNK_IDENTITY_FIELDS
+            ):
+                unchanged += 1
+                keep_ingested_at(metadata, stored_metadata)
+            elif content_hash in embedding_by_hash:
+                keep_ingested_at(metadata, metadata_by_hash[content_hash])
+                reuse_docs.append(doc)
+                reuse_embeddings.append(embedding_by_hash[content_hash])
+            else:
+                to_embed.append(doc)
+
+        new_ids = {doc['doc_id'] for doc in documents}
+        return {
+            'embed': to_embed,
+            'reuse': (reuse_docs, reuse_embeddings),
+            'stale': [doc_id for doc_id in existing_ids if doc_id not in new_ids],
+            'unchanged': unchanged
+        }
+
+    def sync_document(
+        self,
+        filename: str,
+        documents: List[Dict[str, Any]],
+        progress_callback: Callable[[int, int], None] = None
+    ) -> Dict[str, int]:
+        """
+        Reindex a file by diffing its chunks against the indexed version.
+        Only chunks with new content are embedded; moved chunks reuse their stored
+        embeddings, unchanged chunks are not touched and removed chunks are deleted.
+        
+        Args:
+            filename: Source filename
+            documents: New chunks, as returned by build_chunk_documents
+            progress_callback: Optional callback receiving (chunks indexed, total chunks)
+            
+        Returns:
+            Dict with 'embedded', 'reused', 'unchanged' and 'deleted' chunk counts
+        """
+        diff = self.diff_document(filename, documents)
+
+        reuse_docs, reuse_embeddings = diff['reuse']
+        self.write_documents(reuse_docs, reuse_embeddings)
+        done = diff['unchanged'] + len(reuse_docs)
+        if progress_callback:
+            progress_callback(done, len(documents))
+
+        # Embed in slices so progress can be reported on long documents
+        step = self.embedding_batch_size * 4
+        for start in range(0, len(diff['embed']), step):
+            batch = diff['embed'][start:start + step]
+            self.add_documents_batch(batch)
+            done += len(batch)
+            if progress_callback:
+                progress_callback(done, len(documents))
+
+        self.delete_documents(diff['stale'])
+
+        return {
+            'embedded': len(diff['embed']),
+            'reused': len(reuse_docs),
+            'unchanged': diff['unchanged'],
+            'deleted': len(diff['stale'])
+        }
+
+    async def run_in_executor(self, func: Callable, *args, **kwargs):
+        """
+        Run a blocking function on the engine's bounded executor without blocking the event loop.
+        
+        Args:
+            func: Blocking callable
+            *args, **kwargs: Arguments passed to the callable
+            
+        Returns:
+            The callable's return value
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def aadd_documents_batch(self, documents: List[Dict[str, Any]]):
+        """Async variant of add_documents_batch; embedding and ChromaDB writes run on the executor."""
+        await self.run_in_executor(self.add_documents_batch, documents)
+
+    async def async_sync_document(self, filename: str, documents: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Async variant of sync_document; runs on the executor."""
+        return await self.run_in_executor(self.sync_document, filename, documents)
+
+    def embed_query(self, question: str) -> np.ndarray:
+        """
+        Embed a question, serving repeated questions from the query embedding cache.
+        
+        Args:
+            question: The query text
+            
+        Returns:
+            1-D embedding vector
+        """
+        embedding = self.query_cache.get(question)
+        count_cache("query_embedding", hits=int(embedding is not None), misses=int(embedding is None))
+        if embedding is None:
+            with time_stage("query_embed"):
+                if self.query_batcher is not None:
+                    embedding = self.query_batcher.encode(question)
+                else:
+                    embedding = self.encode([question])[0]
+            self.query_cache.put(question, embedding)
+        return embedding
+
+    async def aembed_query(self, question: str) -> np.ndarray:
+        """
+        Async variant of embed_query.
+        
+        With micro-batching enabled the caller awaits its batch without holding an
+        executor thread, so many concurrent questions share one encode call.
+        """
+        embedding = self.query_cache.get(question)
+        count_cache("query_embedding", hits=int(embedding is not None), misses=int(embedding is None))
+        if embedding is None:
+            with time_stage("query_embed"):
+                if self.query_batcher is not None:
+                    embedding = await asyncio.wrap_future(self.query_batcher.submit(question))
+                else:
+                    embedding = await self.run_in_executor(lambda: self.encode([question])[0])
+            self.query_cache.put(question, embedding)
+        return embedding
+
+    def query(self, question: str, top_k=3, where: Dict[str, Any] = None) -> List[Dict[str, Any]]:
         """
         Caută documente relevante în baza vectorială și returnează cu metadata.
         
         Args:
             question: The query text
             top_k: Number of results to return
+            where: Optional metadata filter in ChromaDB syntax (see utils.metadata_filter.build_where)
             
         Returns:
-            List of dicts with 'text', 'metadata', and 'distance' keys
+            List of dicts with 'id', 'text', 'metadata', and 'distance' keys
+            (distance is None for chunks found only by keyword search), plus
+            'rerank_score' when reranking is enabled
+        """
+        return self._retrieve(self.embed_query(question), top_k, question, where)
+
+    def _retrieve(self, q_emb: np.ndarray, top_k: int, question: str, where: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """Search, then rerank over-fetched candidates when a reranker is configured."""
+        with time_stage("retrieval"):
+            candidates = self._search(
+                q_emb, top_k if self.reranker is None else max(top_k, self.rerank_candidates), question, where
+            )
+        if self.reranker is None:
+            return candidates
+        with time_stage("rerank"):
+            return self.reranker.rerank(question, candidates, top_k, self.rerank_min_score)
+
+    def _search(
+        self,
+        q_emb: np.ndarray,
+        top_k: int,
+        question: str = None,
+        where: Dict[str, Any] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Search for an already embedded question. With hybrid search enabled, vector
+        and BM25 candidates are merged with reciprocal-rank fusion.
         """
-        q_emb = self.embedder.encode([question])
+        if self.keyword_index is None or not question:
+            return self._vector_search(q_emb, top_k, where)
+
+        self.ensure_keyword_index()
+        num_candidates = top_k * self.hybrid_candidates
+        vector_results = self._vector_search(q_emb, num_candidates, where)
+        keyword_results = self._keyword_search(question, num_candidates, where)
+        return self._fuse_results(vector_results, keyword_results, top_k)
+
+    def _keyword_search(self, question: str, limit: int, where: Dict[str, Any] = None) -> List[tuple]:
+        """
+        BM25 hits matching a metadata filter. The keyword index holds no metadata, so
+        hits are over-fetched and checked against the vector store; if a few widening
+        rounds still leave too few, the search is restricted to the filter's chunks.
+        """
+        collection = self.collection
+        if not where:
+            return self.keyword_index.search(collection.name, question, limit)
+
+        fetch = limit * KEYWORD_FILTER_OVERFETCH
+        for _ in range(KEYWORD_FILTER_ROUNDS):
+            hits = self.keyword_index.search(collection.name, question, fetch)
+            if not hits:
+                return []
+            matching = set(collection.get(ids=[doc_id for doc_id, _ in hits], where=where, include=[])['ids'])
+            filtered = [hit for hit in hits if hit[0] in matching]
+            if len(filtered) >= limit or len(hits) < fetch:
+                # Enough matches, or every hit of the query was checked
+                return filtered[:limit]
+            fetch *= KEYWORD_FILTER_OVERFETCH
+
+        # Narrow filter: rank only the chunks it matches
+        doc_ids = collection.get(where=where, include=[])['ids']
+        return self.keyword_index.search(collection.name, question, limit, doc_ids=doc_ids)
+
+    def _fuse_results(
+        self,
+        vector_results: List[Dict[str, Any]],
+        keyword_results: List[tuple],
+        top_k: int
+    ) -> List[Dict[str, Any]]:
+        """Reciprocal-rank fusion of vector hits and (chunk id, BM25 score) keyword hits."""
+        scores = {}
+        for rank, result in enumerate(vector_results):
+            scores[result['id']] = scores.get(result['id'], 0.0) + 1.0 / (self.rrf_k + rank + 1)
+        for rank, (doc_id, _) in enumerate(keyword_results):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+
+        top_ids = sorted(scores, key=lambda doc_id: -scores[doc_id])[:top_k]
+
+        # Keyword-only hits are not in the vector results; fetch their text and metadata
+        by_id = {result['id']: result for result in vector_results}
+        missing = [doc_id for doc_id in top_ids if doc_id not in by_id]
+        if missing:
+            fetched = self.collection.get(ids=missing, include=['documents', 'metadatas'])
+            for i, doc_id in enumerate(fetched['ids']):
+                by_id[doc_id] = {
+                    'id': doc_id,
+                    'text': fetched['documents'][i],
+                    'metadata': fetched['metadatas'][i] if fetched['metadatas'] else {},
+                    'distance': None
+                }
+
+        return [
+            {**by_id[doc_id], 'score': scores[doc_id]}
+            for doc_id in top_ids if doc_id in by_id
+        ]
+
+    def _vector_search(self, q_emb: np.ndarray, top_k: int, where: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """Run the vector search for an already embedded question, filtered by metadata if given."""
         results = self.collection.query(
-            query_embeddings=q_emb.tolist(), 
+            query_embeddings=[q_emb.tolist()], 
             n_results=top_k,
+            where=where or None,
             include=['documents', 'metadatas', 'distances']
         )
         
@@ -104,6 +766,7 @@ class RAGEngine:
         formatted_results = []
         for i, doc in enumerate(results["documents"][0]):
             result = {
+                'id': results["ids"][0][i],
                 'text': doc,
                 'metadata': results["metadatas"][0][i] if results["metadatas"] else {},
                 'distance': results["distances"][0][i] if results["distances"] else None
@@ -112,6 +775,117 @@ class RAGEngine:
         
         return formatted_results
 
+    async def aquery(self, question: str, top_k=3, where: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """Async variant of query; the ChromaDB search and rerank run on the executor."""
+        q_emb = await self.aembed_query(question)
+        return await self.run_in_executor(self._retrieve, q_emb, top_k, question, where)
+
+    def _assemble_context(self, context_docs: List[Dict[str, Any]]):
+        """
+        Merge overlapping chunks and trim them to the context token budget.
+        
+        Returns:
+            Tuple of (passages for the prompt, chunks they cover for the sources list)
+        """
+        passages = build_context(context_docs, self.context_max_tokens, self.context_chars_per_token)
+        return passages, [doc for passage in passages for doc in passage['docs']]
+
+    def _build_prompt(self, question: str, passages: List[Dict[str, Any]]) -> str:
+        """Build the LLM prompt from the question and the assembled context passages."""
+        # Number passages by source file, matching 'document_index' in the sources list
+        document_indexes = {}
+        blocks = []
+        for passage in passages:
+            index = document_indexes.setdefault(passage['filename'], len(document_indexes) + 1)
+            label = f"Document {index}, pagina {passage['page_number']}" if passage['page_number'] else f"Document {index}"
+            blocks.append(f"[{label}]: {passage['text']}")
+        context = "\n\n".join(blocks)
+        
+        return f"""
+        Context:
+        {context}
+
+        Întrebare: {question}
+
+        Dacă răspunsul nu se găsește clar în context, răspunde cu:
+        "Nu am găsit această informație în documente."
+        
+        Când răspunzi, menționează din ce document(e) provine informația (ex: "Conform Document 1...").
+        Răspunde clar, concis și în limba română:
+        """
+
+    def _format_sources(self, context_docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Group retrieved documents by filename into the sources list returned to clients."""
+        sources_by_file = {}
+        for doc in context_docs:
+            metadata = doc.get('metadata', {})
+            filename = metadata.get('filename', 'Unknown')
+            page_num = metadata.get('page_number')
+            
+            if filename not in sources_by_file:
+                sources_by_file[filename] = {
+                    'filename': filename,
+                    'pages': set(),
+                    'chunks': [],
+                    'min_distance': None
+                }
+            
+            if page_num:
+                sources_by_file[filename]['pages'].add(page_num)
+            
+            sources_by_file[filename]['chunks'].append({
+                'page': page_num,
+                'chunk_index': metadata.get('chunk_index'),
+                'distance': doc.get('distance')
+            })
+            
+            # Track minimum distance (most relevant); keyword-only hits have no distance
+            if doc.get('distance') is not None:
+                current = sources_by_file[filename]['min_distance']
+                sources_by_file[filename]['min_distance'] = (
+                    doc['distance'] if current is None else min(current, doc['distance'])
+                )
+        
+        # Format sources list
+        sources = []
+        for idx, (filename, info) in enumerate(sources_by_file.items(), 1):
+            pages_list = sorted(list(info['pages'])) if info['pages'] else []
+            source_info = {
+                'document_index': idx,
+                'filename': filename,
+                'pages': pages_list,
+                'num_chunks': len(info['chunks']),
+                'relevance': 1 - info['min_distance'] if info['min_distance'] is not None else None
+            }
+            sources.append(source_info)
+
+        return sources
+
+    @staticmethod
+    def _apply_answer_guardrail(answer: str) -> str:
+        """Mini guardrail: dacă răspunsul e prea scurt/generic."""
+        if len(answer.strip()) < 5:
+            return "⚠️ Nu am găsit un răspuns clar în documente."
+        return answer
+
+    def _answer_cache_key(self, question_embedding: np.ndarray, context_docs: List[Dict[str, Any]]):
+        """
+        Build the answer cache key for a question, or None if the documents lack chunk ids.
+        
+        Returns:
+            Dict of answer cache arguments (question embedding, chunk ids, model name,
+            index generation) or None
+        """
+        chunk_ids = [doc['id'] for doc in context_docs if doc.get('id')]
+        if len(chunk_ids) != len(context_docs):
+            return None
+        return {
+            'question_embedding': question_embedding,
+            'chunk_ids': chunk_ids,
+            'model_name': self.model_name,
+            'generation': self.index_generation.current(self.collection.name)
+        }
+
     def generate_answer(self, question: str, context_docs: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Generează răspunsul final cu referințe la surse.
@@ -121,91 +895,202 @@ class RAGEngine:
             context_docs: List of retrieved documents with metadata
             
         Returns:
-            Dict with 'answer' and 'sources' keys
+            Dict with 'answer', 'sources' and 'cached' keys
         """
         if not context_docs:
             return {
                 "answer": "Nu am găsit nicio informație relevantă în documente pentru această întrebare.",
-                "sources": []
+                "sources": [],
+                "cached": False
             }
 
-        # Build context from documents
-        context = "\n\n".join([f"[Document {i+1}]: {doc['text']}" for i, doc in enumerate(context_docs)])
+        # Serve near-identical questions over the same chunks from the answer cache
+        cache_key = self._answer_cache_key(self.embed_query(question), context_docs)
+        if cache_key is not None:
+            cached = self.answer_cache.get(**cache_key)
+            count_cache("answer", hits=int(cached is not None), misses=int(cached is None))
+            if cached is not None:
+                return {**cached, "cached": True}
+
+        passages, used_docs = self._assemble_context(context_docs)
+        prompt = self._build_prompt(question, passages)
+
+        try:
+            with time_stage("llm"):
+                response = self.llm_client.chat(self.model_name, messages=[
+                    {"role": "user", "content": prompt}
+                ])
+            return self._finalize_answer(response["message"]["content"], used_docs, cache_key)
+
+        except Exception as e:
+            return self._error_answer(e)
+
+    async def agenerate_answer(self, question: str, context_docs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Async variant of generate_answer using the async Ollama client.
         
-        prompt = f"""
-        Context:
-        {context}
+        Args:
+            question: The user's question
+            context_docs: List of retrieved documents with metadata
+            
+        Returns:
+            Dict with 'answer', 'sources' and 'cached' keys
+        """
+        if not context_docs:
+            return self.generate_answer(question, context_docs)
 
-        Întrebare: {question}
+        cache_key = self._answer_cache_key(await self.aembed_query(question), context_docs)
+        if cache_key is not None:
+            cached = self.answer_cache.get(**cache_key)
+            count_cache("answer", hits=int(cached is not None), misses=int(cached is None))
+            if cached is not None:
+                return {**cached, "cached": True}
 
-        Dacă răspunsul nu se găsește clar în context, răspunde cu:
-        "Nu am găsit această informație în documente."
+        passages, used_docs = self._assemble_context(context_docs)
+        prompt = self._build_prompt(question, passages)
+
+        try:
+            with time_stage("llm"):
+                response = await self.async_llm_client.chat(self.model_name, messages=[
+                    {"role": "user", "content": prompt}
+                ])
+            return self._finalize_answer(response["message"]["content"], used_docs, cache_key)
+
+        except Exception as e:
+            return self._error_answer(e)
+
+    def _finalize_answer(self, content: str, context_docs: List[Dict[str, Any]], cache_key) -> Dict[str, Any]:
+        """Apply the guardrail, attach sources and populate the answer cache."""
+        result = {
+            "answer": self._apply_answer_guardrail(content),
+            "sources": self._format_sources(context_docs)
+        }
+        if cache_key is not None:
+            self.answer_cache.put(**cache_key, result=result)
+
+        return {**result, "cached": False}
+
+    @staticmethod
+    def _error_answer(error: Exception) -> Dict[str, Any]:
+        return {
+            "answer": f"Eroare la generarea răspunsului: {error}",
+            "sources": [],
+            "cached": False
+        }
+
+    def generate_answer_stream(self, question: str, context_docs: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Generează răspunsul în flux, token cu token.
         
-        Când răspunzi, menționează din ce document(e) provine informația (ex: "Conform Document 1...").
-        Răspunde clar, concis și în limba română:
+        Sources are emitted first, before the LLM is called, so clients can render
+        them immediately. Cached answers are emitted as a single token event.
+        
+        Args:
+            question: The user's question
+            context_docs: List of retrieved documents with metadata
+            
+        Yields:
+            Event dicts with a 'type' key: 'sources', 'token', 'done' or 'error'
         """
+        if not context_docs:
+            answer = "Nu am găsit nicio informație relevantă în documente pentru această întrebare."
+            yield {"type": "sources", "sources": [], "cached": False}
+            yield {"type": "token", "content": answer}
+            yield {"type": "done", "answer": answer}
+            return
+
+        cache_key = self._answer_cache_key(self.embed_query(question), context_docs)
+        cached = self.answer_cache.get(**cache_key) if cache_key is not None else None
+        if cache_key is not None:
+            count_cache("answer", hits=int(cached is not None), misses=int(cached is None))
+        if cached is not None:
+            yield {"type": "sources", "sources": cached["sources"], "cached": True}
+            yield {"type": "token", "content": cached["answer"]}
+            yield {"type": "done", "answer": cached["answer"]}
+            return
+
+        passages, used_docs = self._assemble_context(context_docs)
+        sources = self._format_sources(used_docs)
+        yield {"type": "sources", "sources": sources, "cached": False}
+
+        prompt = self._build_prompt(question, passages)
 
         try:
-            response = self.llm_client.chat(self.model_name, messages=[
+            parts = []
+            start = time.perf_counter()
+            for chunk in self.llm_client.chat(self.model_name, messages=[
                 {"role": "user", "content": prompt}
-            ])
-            answer = response["message"]["content"]
-
-            # Mini guardrail: dacă răspunsul e prea scurt/generic
-            if len(answer.strip()) < 5:
-                answer = "⚠️ Nu am găsit un răspuns clar în documente."
-
-            # Extract and format sources - group by filename
-            sources_by_file = {}
-            for doc in context_docs:
-                metadata = doc.get('metadata', {})
-                filename = metadata.get('filename', 'Unknown')
-                page_num = metadata.get('page_number')
-                
-                if filename not in sources_by_file:
-                    sources_by_file[filename] = {
-                        'filename': filename,
-                        'pages': set(),
-                        'chunks': [],
-                        'min_distance': doc.get('distance', 1.0)
-                    }
-                
-                if page_num:
-                    sources_by_file[filename]['pages'].add(page_num)
-                
-                sources_by_file[filename]['chunks'].append({
-                    'page': page_num,
-                    'chunk_index': metadata.get('chunk_index'),
-                    'distance': doc.get('distance')
-                })
-                
-                # Track minimum distance (most relevant)
-                if doc.get('distance') is not None:
-                    sources_by_file[filename]['min_distance'] = min(
-                        sources_by_file[filename]['min_distance'],
-                        doc.get('distance')
-                    )
-            
-            # Format sources list
-            sources = []
-            for idx, (filename, info) in enumerate(sources_by_file.items(), 1):
-                pages_list = sorted(list(info['pages'])) if info['pages'] else []
-                source_info = {
-                    'document_index': idx,
-                    'filename': filename,
-                    'pages': pages_list,
-                    'num_chunks': len(info['chunks']),
-                    'relevance': 1 - info['min_distance'] if info['min_distance'] is not None else None
-                }
-                sources.append(source_info)
+            ], stream=True):
+                content = chunk["message"]["content"]
+                if content:
+                    if not parts:
+                        observe_stage("llm_first_token", time.perf_counter() - start)
+                    parts.append(content)
+                    yield {"type": "token", "content": content}
+            observe_stage("llm", time.perf_counter() - start)
 
-            return {
-                "answer": answer,
-                "sources": sources
-            }
+            answer = self._apply_answer_guardrail("".join(parts))
+            if cache_key is not None:
+                self.answer_cache.put(**cache_key, result={"answer": answer, "sources": sources})
+
+            yield {"type": "done", "answer": answer}
 
         except Exception as e:
-            return {
-                "answer": f"Eroare la generarea răspunsului: {e}",
-                "sources": []
-            }
+            count_failure("llm")
+            yield {"type": "error", "message": f"Eroare la generarea răspunsului: {e}"}
+
+    async def agenerate_answer_stream(self, question: str, context_docs: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Async variant of generate_answer_stream using the async Ollama client.
+        
+        Args:
+            question: The user's question
+            context_docs: List of retrieved documents with metadata
+            
+        Yields:
+            Event dicts with a 'type' key: 'sources', 'token', 'done' or 'error'
+        """
+        if not context_docs:
+            for event in self.generate_answer_stream(question, context_docs):
+                yield event
+            return
+
+        cache_key = self._answer_cache_key(await self.aembed_query(question), context_docs)
+        cached = self.answer_cache.get(**cache_key) if cache_key is not None else None
+        if cache_key is not None:
+            count_cache("answer", hits=int(cached is not None), misses=int(cached is None))
+        if cached is not None:
+            yield {"type": "sources", "sources": cached["sources"], "cached": True}
+            yield {"type": "token", "content": cached["answer"]}
+            yield {"type": "done", "answer": cached["answer"]}
+            return
+
+        passages, used_docs = self._assemble_context(context_docs)
+        sources = self._format_sources(used_docs)
+        yield {"type": "sources", "sources": sources, "cached": False}
+
+        prompt = self._build_prompt(question, passages)
+
+        try:
+            parts = []
+            start = time.perf_counter()
+            async for chunk in await self.async_llm_client.chat(self.model_name, messages=[
+                {"role": "user", "content": prompt}
+            ], stream=True):
+                content = chunk["message"]["content"]
+                if content:
+                    if not parts:
+                        observe_stage("llm_first_token", time.perf_counter() - start)
+                    parts.append(content)
+                    yield {"type": "token", "content": content}
+            observe_stage("llm", time.perf_counter() - start)
+
+            answer = self._apply_answer_guardrail("".join(parts))
+            if cache_key is not None:
+                self.answer_cache.put(**cache_key, result={"answer": answer, "sources": sources})
+
+            yield {"type": "done", "answer": answer}
+
+        except Exception as e:
+            count_failure("llm")
+            yield {"type": "error", "message": f"Eroare la generarea răspunsului: {e}"}
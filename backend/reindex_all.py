@@ -1,90 +1,195 @@
 """
 Script to reindex all documents with proper metadata.
 Run this to update old documents that were indexed without metadata.
+
+Files are processed in parallel by the BatchProcessor pipeline. Each finished
+file is appended to a checkpoint, so an interrupted run resumes where it stopped.
 """
 
-import os
+import argparse
 import json
-from utils.pdf_loader import extract_text_by_pages, compute_file_hash
-from utils.splitter import split_text_by_pages
+import os
+import time
+from batch_processor import BatchProcessor
 from rag_engine import RAGEngine
+from utils.pdf_loader import compute_file_hash
+from utils.sharded_collection import shard_index
+
+CHECKPOINT_PATH = "reindex_checkpoint.jsonl"
+
+
+def load_checkpoint(checkpoint_path: str) -> dict:
+    """
+    Load the files completed by an interrupted run.
+
+    Args:
+        checkpoint_path: Path to the checkpoint file
 
-def reindex_all_documents():
-    """Reindex all documents in the uploads folder with proper metadata."""
-    
+    Returns:
+        Dict mapping filename to its checkpoint entry ('hash', 'chunks')
+    """
+    completed = {}
+    if not os.path.exists(checkpoint_path):
+        return completed
+    with open(checkpoint_path, "r") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave a partially written last line
+                continue
+            completed[entry['filename']] = entry
+    return completed
+
+
+def format_duration(seconds: float) -> str:
+    """Format seconds as e.g. '1h02m', '3m20s' or '12s'."""
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{(seconds % 3600) // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+def reindex_all_documents(
+    upload_dir: str = "uploads",
+    max_workers: int = None,
+    resume: bool = True,
+    checkpoint_path: str = CHECKPOINT_PATH,
+    shard: int = None
+):
+    """
+    Reindex all documents in the uploads folder with proper metadata.
+
+    Args:
+        upload_dir: Directory containing the PDF files
+        max_workers: Extraction processes (default: CPU count)
+        resume: Skip files completed by an interrupted run (unchanged since)
+        checkpoint_path: Path to the checkpoint file
+        shard: Only reindex the files of this shard (with SHARD_COUNT > 1 and SHARD_KEY=filename),
+            leaving the other shards untouched
+    """
     engine = RAGEngine()
-    upload_dir = "uploads"
-    processed_file_path = "processed_files.json"
-    
+    if shard is not None and (engine.shard_count < 2 or engine.shard_key != "filename"):
+        raise ValueError("--shard requires SHARD_COUNT > 1 and SHARD_KEY=filename")
+    if shard is not None and checkpoint_path == CHECKPOINT_PATH:
+        # Shard runs keep their own checkpoint, so they never resume or clear a full run
+        checkpoint_path = f"reindex_checkpoint.shard{shard}.jsonl"
+    processed_file_path = os.getenv("PROCESSED_FILES_PATH", "processed_files.db")
+    processor = BatchProcessor(
+        rag_engine=engine,
+        max_workers=max_workers or os.cpu_count() or 4,
+        processed_file_path=processed_file_path
+    )
+
     # Get all PDF files from upload directory
-    pdf_files = [f for f in os.listdir(upload_dir) if f.endswith('.pdf')]
-    
+    pdf_files = sorted(f for f in os.listdir(upload_dir) if f.endswith('.pdf'))
+    if shard is not None:
+        pdf_files = [f for f in pdf_files if shard_index(f, engine.shard_count) == shard]
+
     print(f"\n{'='*60}")
     print(f"REINDEXING ALL DOCUMENTS")
     print(f"{'='*60}")
+    if shard is not None:
+        print(f"Shard: {shard} of {engine.shard_count}")
     print(f"Found {len(pdf_files)} PDF files\n")
-    
-    processed_registry = {}
-    
-    for i, filename in enumerate(pdf_files, 1):
-        file_path = os.path.join(upload_dir, filename)
-        
-        print(f"[{i}/{len(pdf_files)}] Processing: {filename}")
-        
-        try:
-            # Compute file hash for change detection
-            file_hash = compute_file_hash(file_path)
-            
-            # Extract text preserving page boundaries
-            pages_text, page_count = extract_text_by_pages(file_path)
-            
-            # Split text into chunks with metadata
-            base_metadata = {
-                'filename': filename,
-                'total_pages': page_count
-            }
-            chunks = split_text_by_pages(
-                pages_text, 
-                chunk_size=800, 
-                overlap=100, 
-                base_metadata=base_metadata
+
+    # Resume from the checkpoint of an interrupted run
+    completed = load_checkpoint(checkpoint_path) if resume else {}
+    if not resume and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    pending = []
+    for filename in pdf_files:
+        entry = completed.get(filename)
+        if entry is not None:
+            try:
+                if compute_file_hash(os.path.join(upload_dir, filename)) == entry['hash']:
+                    continue
+            except OSError:
+                pass
+            del completed[filename]
+        pending.append(os.path.join(upload_dir, filename))
+
+    if completed:
+        print(f"[INFO] Resuming: {len(completed)} files already reindexed, {len(pending)} remaining\n")
+
+    reindexed = set(completed)
+    failed = 0
+    chunks = 0
+    start = time.perf_counter()
+
+    with open(checkpoint_path, "a") as checkpoint:
+        results = processor.iter_pipeline_results(pending, force_reprocess=True)
+        for i, result in enumerate(results, 1):
+            filename = result['filename']
+
+            if result['status'] == 'success':
+                # The registry entry is written before the result is reported, so the checkpoint never runs ahead of it
+                checkpoint.write(json.dumps({
+                    'filename': filename,
+                    'hash': processor.registry.get(filename)['hash'],
+                    'chunks': result['chunks']
+                }) + "\n")
+                checkpoint.flush()
+                os.fsync(checkpoint.fileno())
+                reindexed.add(filename)
+                chunks += result['chunks']
+                status = f"[OK] Indexed {result['chunks']} chunks from {result['pages']} pages"
+            else:
+                failed += 1
+                status = f"[ERROR] Failed: {result.get('error')}"
+
+            # Throughput and ETA over this run
+            elapsed = time.perf_counter() - start
+            files_per_sec = i / elapsed if elapsed > 0 else 0.0
+            eta = (len(pending) - i) / files_per_sec if files_per_sec > 0 else 0.0
+            print(
+                f"[{len(completed) + i}/{len(pdf_files)}] {filename}: {status} | "
+                f"{files_per_sec:.2f} files/s, {chunks / elapsed if elapsed > 0 else 0.0:.1f} chunks/s, "
+                f"ETA {format_duration(eta)}"
             )
-            
-            # Prepare documents for batch insertion
-            documents_to_add = []
-            for j, chunk_data in enumerate(chunks):
-                doc_id = f"{filename}::{chunk_data['metadata'].get('page_number', 0)}::{j}"
-                documents_to_add.append({
-                    'text': chunk_data['text'],
-                    'doc_id': doc_id,
-                    'metadata': chunk_data['metadata']
-                })
-            
-            # Batch insert into vector database
-            engine.add_documents_batch(documents_to_add)
-            
-            # Update processing registry
-            processed_registry[filename] = {
-                'hash': file_hash,
-                'chunk_count': len(chunks),
-                'page_count': page_count
-            }
-            
-            print(f"  [OK] Indexed {len(chunks)} chunks from {page_count} pages")
-            
-        except Exception as e:
-            print(f"  [ERROR] Failed to process {filename}: {e}")
-    
-    # Save updated registry to disk
-    with open(processed_file_path, 'w') as f:
-        json.dump(processed_registry, f, indent=2)
-    
+
+    elapsed = time.perf_counter() - start
+
+    if failed == 0:
+        # Drop registry entries for files that no longer exist (other shards' files are not listed), and the finished checkpoint
+        if shard is None:
+            processor.registry.prune(reindexed)
+        os.remove(checkpoint_path)
+
     print(f"\n{'='*60}")
     print(f"REINDEXING COMPLETE")
     print(f"{'='*60}")
-    print(f"Total documents processed: {len(processed_registry)}")
-    print(f"Registry saved to: {processed_file_path}\n")
+    print(f"Total documents processed: {len(reindexed)}")
+    print(f"Failed: {failed}")
+    print(f"Duration: {format_duration(elapsed)} ({len(pending) / elapsed if elapsed > 0 else 0.0:.2f} files/s, "
+          f"{chunks / elapsed if elapsed > 0 else 0.0:.1f} chunks/s)")
+    if failed:
+        print(f"Checkpoint kept at: {checkpoint_path} (rerun to retry failed files)")
+    print(f"Registry saved to: {processor.registry.db_path}\n")
 
 
 if __name__ == "__main__":
-    reindex_all_documents()
+    parser = argparse.ArgumentParser(description='Reindex all uploaded documents')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Number of extraction processes (default: CPU count)'
+    )
+    parser.add_argument(
+        '--restart',
+        action='store_true',
+        help='Ignore the checkpoint of an interrupted run and reindex everything'
+    )
+    parser.add_argument(
+        '--shard',
+        type=int,
+        default=None,
+        help='Only reindex the files of this shard (0-based; requires SHARD_COUNT > 1)'
+    )
+    args = parser.parse_args()
+
+    reindex_all_documents(max_workers=args.workers, resume=not args.restart, shard=args.shard)
@@ -5,11 +5,68 @@ Runs with multiple workers and production-grade settings.
 
 import uvicorn
 import os
+import secrets
+import time
+import multiprocessing
+from multiprocessing.connection import Client
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
+def start_embedding_server() -> multiprocessing.Process:
+    """
+    Start the shared embedding server and point API workers at it.
+    Workers inherit EMBEDDING_SERVER_ADDRESS and skip loading their own model copy.
+    Unless EMBEDDING_SERVER_AUTHKEY is set, a random key is generated for this run
+    and inherited by the server and the workers.
+    """
+    import embedding_server
+    from utils.embedding_client import parse_server_address, get_server_authkey
+
+    address = os.getenv("EMBEDDING_SERVER_ADDRESS", embedding_server.DEFAULT_ADDRESS)
+    os.environ["EMBEDDING_SERVER_ADDRESS"] = address
+    if not os.getenv("EMBEDDING_SERVER_AUTHKEY"):
+        os.environ["EMBEDDING_SERVER_AUTHKEY"] = secrets.token_hex(32)
+
+    process = multiprocessing.Process(
+        target=embedding_server.serve,
+        args=(address,),
+        name="embedding-server",
+        daemon=True
+    )
+    process.start()
+
+    # Wait until the model is loaded and the server accepts connections
+    timeout = float(os.getenv("EMBEDDING_SERVER_STARTUP_TIMEOUT", "300"))
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            Client(parse_server_address(address), authkey=get_server_authkey()).close()
+            break
+        except OSError:
+            if not process.is_alive() or time.monotonic() > deadline:
+                process.terminate()
+                raise RuntimeError("Shared embedding server failed to start")
+            time.sleep(0.5)
+
+    return process
+
+
+def prepare_metrics_dir():
+    """
+    Empty the Prometheus multiprocess directory, so /metrics only aggregates
+    the processes of this run (stale files would keep old workers' series).
+    """
+    metrics_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if not metrics_dir:
+        return
+    os.makedirs(metrics_dir, exist_ok=True)
+    for name in os.listdir(metrics_dir):
+        if name.endswith(".db"):
+            os.remove(os.path.join(metrics_dir, name))
+
+
 def main():
     """Run the FastAPI application with production settings."""
     
@@ -37,7 +94,19 @@ def main():
     print(f"Alternative Docs: http://{config['host']}:{config['port']}/redoc")
     print("\nPress CTRL+C to stop\n")
     
-    uvicorn.run(**config)
+    prepare_metrics_dir()
+
+    embedding_process = None
+    if os.getenv("SHARED_EMBEDDER", "false").lower() == "true":
+        print("[INFO] Starting shared embedding server...")
+        embedding_process = start_embedding_server()
+        print(f"[OK] Shared embedding server ready at {os.environ['EMBEDDING_SERVER_ADDRESS']}\n")
+    
+    try:
+        uvicorn.run(**config)
+    finally:
+        if embedding_process is not None:
+            embedding_process.terminate()
 
 
 if __name__ == "__main__":
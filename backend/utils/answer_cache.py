@@ -0,0 +1,227 @@
+"""
+Semantic answer cache placed in front of LLM answer generation.
+A cached answer is reused when a near-identical question retrieves exactly
+the same chunks with the same model, and is dropped as soon as any of those
+chunks is re-indexed. Re-indexing in other processes is detected through a
+shared index generation (see utils/index_generation.py).
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """
+    Thread-safe answer cache keyed on (question embedding neighbourhood, retrieved chunk ids, model name).
+
+    Chunks re-indexed by this process drop only the answers built from them.
+    When callers pass the index generation, a change made by another process
+    (which cannot say which chunks it touched) drops every cached answer.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 512,
+        similarity_threshold: float = 0.95,
+        ttl_seconds: Optional[float] = None
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            max_size: Maximum number of cached answers (0 disables the cache)
+            similarity_threshold: Minimum cosine similarity between question embeddings
+            ttl_seconds: Entry lifetime in seconds, None for no expiry
+        """
+        self.max_size = max_size
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._buckets: Dict[tuple, set] = {}
+        self._entries_by_chunk: Dict[str, set] = {}
+        self._next_id = 0
+        self._generation: Optional[int] = None
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'invalidations': 0
+        }
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _drop(self, entry_id: int):
+        """Remove an entry from every index. Caller holds the lock."""
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        bucket = self._buckets.get(entry['bucket'])
+        if bucket is not None:
+            bucket.discard(entry_id)
+            if not bucket:
+                del self._buckets[entry['bucket']]
+        for chunk_id in entry['bucket'][1]:
+            ids = self._entries_by_chunk.get(chunk_id)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del self._entries_by_chunk[chunk_id]
+
+    def _sync_generation(self, generation: Optional[int]):
+        """Drop everything if the index changed since the last lookup. Caller holds the lock."""
+        if generation is None or generation == self._generation:
+            return
+        if self._generation is not None:
+            self._stats['invalidations'] += len(self._entries)
+            self._clear()
+        self._generation = generation
+
+    def get(
+        self,
+        question_embedding: np.ndarray,
+        chunk_ids: Iterable[str],
+        model_name: str,
+        generation: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Look up a stored answer for a near-identical question over the same context.
+
+        Args:
+            question_embedding: Embedding of the incoming question
+            chunk_ids: Ids of the chunks retrieved for the question
+            model_name: LLM model name
+            generation: Current index generation; a change since the last lookup drops every entry
+
+        Returns:
+            Copy of the stored result dict, or None on a miss
+        """
+        if self.max_size <= 0:
+            return None
+
+        bucket_key = (model_name, frozenset(chunk_ids))
+        query = self._normalize(question_embedding)
+
+        with self._lock:
+            self._sync_generation(generation)
+            best_id, best_score = None, self.similarity_threshold
+            for entry_id in list(self._buckets.get(bucket_key, ())):
+                entry = self._entries[entry_id]
+                if self.ttl_seconds is not None and time.time() - entry['created_at'] > self.ttl_seconds:
+                    self._drop(entry_id)
+                    continue
+                score = float(np.dot(query, entry['embedding']))
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None:
+                self._stats['misses'] += 1
+                return None
+
+            self._entries.move_to_end(best_id)
+            self._stats['hits'] += 1
+            return copy.deepcopy(self._entries[best_id]['result'])
+
+    def put(
+        self,
+        question_embedding: np.ndarray,
+        chunk_ids: Iterable[str],
+        model_name: str,
+        result: Dict[str, Any],
+        generation: Optional[int] = None
+    ):
+        """
+        Store a generated answer.
+
+        Args:
+            question_embedding: Embedding of the question
+            chunk_ids: Ids of the chunks the answer was generated from
+            model_name: LLM model name
+            result: Dict with 'answer' and 'sources' keys
+            generation: Index generation read before the answer was generated; the
+                answer is not stored if the index changed since
+        """
+        if self.max_size <= 0:
+            return
+
+        bucket_key = (model_name, frozenset(chunk_ids))
+
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = {
+                'embedding': self._normalize(question_embedding),
+                'bucket': bucket_key,
+                'result': copy.deepcopy(result),
+                'created_at': time.time()
+            }
+            self._buckets.setdefault(bucket_key, set()).add(entry_id)
+            for chunk_id in bucket_key[1]:
+                self._entries_by_chunk.setdefault(chunk_id, set()).add(entry_id)
+
+            while len(self._entries) > self.max_size:
+                oldest_id = next(iter(self._entries))
+                self._drop(oldest_id)
+                self._stats['evictions'] += 1
+
+    def invalidate(self, chunk_ids: Iterable[str], generation: Optional[int] = None) -> int:
+        """
+        Drop every answer generated from any of the given chunks.
+
+        Args:
+            chunk_ids: Ids of re-indexed or deleted chunks
+            generation: Index generation after this change; if another process changed
+                the index in between, every entry is dropped
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            if generation is not None:
+                if self._generation is None or generation != self._generation + 1:
+                    removed = len(self._entries)
+                    self._clear()
+                    self._generation = generation
+                    self._stats['invalidations'] += removed
+                    return removed
+                self._generation = generation
+            affected = set()
+            for chunk_id in chunk_ids:
+                affected.update(self._entries_by_chunk.get(chunk_id, ()))
+            for entry_id in affected:
+                self._drop(entry_id)
+            self._stats['invalidations'] += len(affected)
+            return len(affected)
+
+    def clear(self):
+        """Drop all cached answers."""
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        """Drop all entries. Caller holds the lock."""
+        self._entries.clear()
+        self._buckets.clear()
+        self._entries_by_chunk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and current size."""
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                **self._stats,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hit_rate': self._stats['hits'] / lookups if lookups else 0.0
+            }
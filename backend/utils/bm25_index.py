@@ -0,0 +1,216 @@
+"""
+BM25 keyword index kept alongside the vector collections.
+Codes, article numbers and product SKUs are matched exactly here, where sentence
+embeddings tend to miss them. Backed by SQLite FTS5 (bm25 ranking, diacritics
+folded), with one table per collection so blue/green collections stay separate.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+# Unicode words (letters with diacritics, digits); FTS5 query syntax is never passed through
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def _table_suffix(collection: str) -> str:
+    return hashlib.sha256(collection.encode("utf-8")).hexdigest()[:16]
+
+
+class BM25Index:
+    """
+    Inverted index of chunk texts per collection, ranked with BM25.
+    Safe for concurrent use from threads and processes (SQLite WAL).
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Initialize the index. The database is created on first use.
+
+        Args:
+            db_path: Path to the SQLite database
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; SQLite connections must not be shared across threads."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._initialize(conn)
+        return conn
+
+    def _initialize(self, conn: sqlite3.Connection):
+        """Create the collections table, once per instance."""
+        with self._init_lock:
+            if self._initialized:
+                return
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS collections (name TEXT PRIMARY KEY, suffix TEXT NOT NULL)"
+                )
+            self._initialized = True
+
+    def _tables(self, conn: sqlite3.Connection, collection: str, create: bool = False):
+        """Names of the (FTS, row map) tables of a collection, or None if it has none."""
+        suffix = _table_suffix(collection)
+        fts_table, rows_table = f"fts_{suffix}", f"rows_{suffix}"
+        exists = conn.execute("SELECT 1 FROM collections WHERE name = ?", (collection,)).fetchone()
+        if exists is None:
+            if not create:
+                return None
+            conn.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} "
+                f"USING fts5(text, tokenize='unicode61 remove_diacritics 2')"
+            )
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {rows_table} (doc_id TEXT PRIMARY KEY, fts_rowid INTEGER NOT NULL)"
+            )
+            conn.execute("INSERT INTO collections (name, suffix) VALUES (?, ?)", (collection, suffix))
+        return fts_table, rows_table
+
+    @staticmethod
+    def _delete_rows(conn: sqlite3.Connection, fts_table: str, rows_table: str, doc_ids: Sequence[str]):
+        for doc_id in doc_ids:
+            row = conn.execute(f"SELECT fts_rowid FROM {rows_table} WHERE doc_id = ?", (doc_id,)).fetchone()
+            if row is not None:
+                conn.execute(f"DELETE FROM {fts_table} WHERE rowid = ?", (row[0],))
+                conn.execute(f"DELETE FROM {rows_table} WHERE doc_id = ?", (doc_id,))
+
+    def add(self, collection: str, doc_ids: Sequence[str], texts: Sequence[str]):
+        """
+        Index chunk texts, replacing any existing entries with the same ids.
+
+        Args:
+            collection: Collection the chunks belong to
+            doc_ids: Chunk ids
+            texts: Chunk texts, in the same order
+        """
+        if not doc_ids:
+            return
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            fts_table, rows_table = self._tables(conn, collection, create=True)
+            self._delete_rows(conn, fts_table, rows_table, doc_ids)
+            for doc_id, text in zip(doc_ids, texts):
+                cursor = conn.execute(f"INSERT INTO {fts_table} (text) VALUES (?)", (text,))
+                conn.execute(
+                    f"INSERT INTO {rows_table} (doc_id, fts_rowid) VALUES (?, ?)",
+                    (doc_id, cursor.lastrowid)
+                )
+
+    def delete(self, collection: str, doc_ids: Sequence[str]):
+        """
+        Remove chunks from the index.
+
+        Args:
+            collection: Collection the chunks belong to
+            doc_ids: Chunk ids
+        """
+        if not doc_ids:
+            return
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            tables = self._tables(conn, collection)
+            if tables is not None:
+                self._delete_rows(conn, *tables, doc_ids)
+
+    def drop_collection(self, collection: str):
+        """Remove the whole index of a collection."""
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            tables = self._tables(conn, collection)
+            if tables is None:
+                return
+            fts_table, rows_table = tables
+            conn.execute(f"DROP TABLE IF EXISTS {fts_table}")
+            conn.execute(f"DROP TABLE IF EXISTS {rows_table}")
+            conn.execute("DELETE FROM collections WHERE name = ?", (collection,))
+
+    def search(
+        self,
+        collection: str,
+        query: str,
+        limit: int = 20,
+        doc_ids: Optional[Sequence[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Rank chunks by BM25 against the words of a query.
+
+        Args:
+            collection: Collection to search
+            query: Free-text query
+            limit: Maximum number of results
+            doc_ids: Only rank these chunks (e.g. the chunks matching a metadata filter)
+
+        Returns:
+            List of (chunk id, BM25 score) pairs, best first (higher is better)
+        """
+        tokens = list(dict.fromkeys(token.lower() for token in TOKEN_PATTERN.findall(query)))
+        if not tokens:
+            return []
+
+        conn = self._connection()
+        tables = self._tables(conn, collection)
+        if tables is None:
+            return []
+        fts_table, rows_table = tables
+
+        restrict = ""
+        if doc_ids is not None:
+            # Temporary tables are private to this thread's connection
+            with conn:
+                conn.execute("CREATE TEMP TABLE IF NOT EXISTS search_ids (doc_id TEXT PRIMARY KEY)")
+                conn.execute("DELETE FROM temp.search_ids")
+                conn.executemany("INSERT OR IGNORE INTO temp.search_ids (doc_id) VALUES (?)", [(i,) for i in doc_ids])
+            restrict = "JOIN temp.search_ids s ON s.doc_id = r.doc_id"
+
+        # Any word may match; BM25 rewards rare words (codes, article numbers) and frequent matches
+        match = " OR ".join('"' + token.replace('"', '""') + '"' for token in tokens)
+        rows = conn.execute(
+            f"""
+            SELECT r.doc_id, bm25({fts_table}) AS score
+            FROM {fts_table} JOIN {rows_table} r ON r.fts_rowid = {fts_table}.rowid {restrict}
+            WHERE {fts_table} MATCH ?
+            ORDER BY score
+            LIMIT ?
+            """,
+            (match, limit)
+        ).fetchall()
+        # FTS5 reports BM25 as a negative number (lower is better)
+        return [(doc_id, -score) for doc_id, score in rows]
+
+    def count(self, collection: str) -> int:
+        """Number of indexed chunks in a collection."""
+        conn = self._connection()
+        tables = self._tables(conn, collection)
+        if tables is None:
+            return 0
+        return conn.execute(f"SELECT COUNT(*) FROM {tables[1]}").fetchone()[0]
+
+    def ids(self, collection: str) -> Set[str]:
+        """Ids of the indexed chunks in a collection."""
+        conn = self._connection()
+        tables = self._tables(conn, collection)
+        if tables is None:
+            return set()
+        return {row[0] for row in conn.execute(f"SELECT doc_id FROM {tables[1]}")}
+
+    def stats(self) -> Dict[str, int]:
+        """Number of indexed chunks per collection."""
+        conn = self._connection()
+        names = [row[0] for row in conn.execute("SELECT name FROM collections")]
+        return {name: self.count(name) for name in names}
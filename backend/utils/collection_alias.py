@@ -0,0 +1,112 @@
+"""
+Alias pointing at the live ChromaDB collection.
+Reindexing builds a new versioned collection next to the live one and then
+switches the alias, so the API keeps answering during a rebuild and the
+previous collection stays available for rollback.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+# Collection used before versioned collections existed
+DEFAULT_COLLECTION = "documents"
+
+
+def versioned_collection_name(prefix: str = DEFAULT_COLLECTION) -> str:
+    """
+    Build a new, time-ordered collection name.
+
+    Args:
+        prefix: Collection name prefix
+
+    Returns:
+        Name such as 'documents_v20250115103000'
+    """
+    return f"{prefix}_v{datetime.now().strftime('%Y%m%d%H%M%S')}"
+
+
+class CollectionAlias:
+    """
+    JSON file recording the active collection and the one it replaced.
+    Updates are atomic (write to a temp file, then rename), and readers in other
+    processes pick up a switch on their next access.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Path of the alias file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._version: Optional[tuple] = None
+        self._state: Dict[str, Any] = {}
+
+    def read(self) -> Dict[str, Any]:
+        """
+        Get the alias state, re-reading the file only when it changed.
+
+        Returns:
+            Dict with 'active', 'previous' and 'updated_at' keys
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return {'active': DEFAULT_COLLECTION, 'previous': None, 'updated_at': None}
+
+        # Every switch renames a new file into place, so the inode changes even within one mtime tick
+        version = (stat.st_ino, stat.st_mtime_ns)
+        with self._lock:
+            if version != self._version:
+                with open(self.path, "r") as f:
+                    self._state = json.load(f)
+                self._version = version
+            return dict(self._state)
+
+    def active(self) -> str:
+        """Name of the live collection."""
+        return self.read()['active']
+
+    def switch(self, name: str) -> Dict[str, Any]:
+        """
+        Atomically make a collection live, keeping the current one as 'previous'.
+
+        Args:
+            name: Collection to activate
+
+        Returns:
+            The new alias state
+        """
+        current = self.read()
+        state = {
+            'active': name,
+            'previous': current['active'] if current['active'] != name else current['previous'],
+            'updated_at': datetime.now().isoformat()
+        }
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        return state
+
+    def rollback(self) -> Dict[str, Any]:
+        """
+        Switch back to the previous collection.
+
+        Returns:
+            The new alias state
+
+        Raises:
+            ValueError: If there is no previous collection
+        """
+        previous = self.read()['previous']
+        if not previous:
+            raise ValueError("No previous collection to roll back to")
+        return self.switch(previous)
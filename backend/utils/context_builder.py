@@ -0,0 +1,115 @@
+"""
+Context assembly for the LLM prompt.
+Retrieved chunks from the same page often overlap (split_text keeps 100
+characters of overlap) or are adjacent; they are merged into one passage so
+no text is sent twice, then passages are ordered by relevance and trimmed to
+a token budget.
+"""
+
+from typing import Any, Dict, List, Optional
+
+
+def estimate_tokens(text: str, chars_per_token: float = 3.5) -> int:
+    """
+    Estimate the number of LLM tokens in a text without loading a tokenizer.
+
+    Args:
+        text: Text to measure
+        chars_per_token: Average characters per token (about 3.5-4 for Romanian and English)
+
+    Returns:
+        Estimated token count
+    """
+    return int(len(text) / chars_per_token) + 1
+
+
+def _span(doc: Dict[str, Any]):
+    """(filename, page, start, end) of a chunk, or None if it lacks position metadata."""
+    metadata = doc.get('metadata') or {}
+    start = metadata.get('start_char')
+    if metadata.get('filename') is None or start is None:
+        return None
+    # end_char in the metadata is start + chunk_size, past the end of a page's last chunk
+    return metadata['filename'], metadata.get('page_number'), start, start + len(doc['text'])
+
+
+def build_context(
+    context_docs: List[Dict[str, Any]],
+    max_tokens: Optional[int] = None,
+    chars_per_token: float = 3.5
+) -> List[Dict[str, Any]]:
+    """
+    Merge overlapping or adjacent chunks and trim them to a token budget.
+
+    Args:
+        context_docs: Retrieved chunks, most relevant first
+        max_tokens: Token budget for all passages together, None for no limit
+        chars_per_token: Average characters per token, used to estimate sizes
+
+    Returns:
+        Passages, most relevant first. Each is a dict with 'text', 'filename',
+        'page_number' and 'docs' (the chunks it covers, for source attribution)
+    """
+    # Drop duplicate chunks (e.g. a chunk found by both retrievers); earlier means more relevant
+    seen = set()
+    ranked = []
+    for doc in context_docs:
+        key = doc.get('id') or id(doc)
+        if key not in seen:
+            seen.add(key)
+            ranked.append(doc)
+
+    # Group positioned chunks by page; chunks never span pages
+    passages = []
+    by_page = {}
+    for rank, doc in enumerate(ranked):
+        span = _span(doc)
+        if span is None:
+            passages.append({'rank': rank, 'text': doc['text'], 'docs': [doc],
+                             'filename': (doc.get('metadata') or {}).get('filename'),
+                             'page_number': (doc.get('metadata') or {}).get('page_number')})
+        else:
+            by_page.setdefault(span[:2], []).append((span[2], span[3], rank, doc))
+
+    for (filename, page_number), chunks in by_page.items():
+        chunks.sort(key=lambda chunk: chunk[0])
+        current = None
+        for start, end, rank, doc in chunks:
+            if current is not None and start <= current['end']:
+                # Overlapping or touching: append only the part past the current end
+                if end > current['end']:
+                    current['text'] += doc['text'][current['end'] - start:]
+                    current['end'] = end
+                current['rank'] = min(current['rank'], rank)
+                current['docs'].append(doc)
+                continue
+            current = {'rank': rank, 'text': doc['text'], 'docs': [doc], 'end': end,
+                       'filename': filename, 'page_number': page_number}
+            passages.append(current)
+
+    passages.sort(key=lambda passage: passage['rank'])
+
+    # Greedily keep the most relevant passages that fit the budget
+    selected = []
+    remaining = max_tokens
+    for passage in passages:
+        tokens = estimate_tokens(passage['text'], chars_per_token)
+        if remaining is not None and tokens > remaining:
+            if selected:
+                continue
+            # Never return an empty context: cut the best passage down to the budget
+            passage['text'] = passage['text'][:int(max_tokens * chars_per_token)]
+            tokens = remaining
+        selected.append(passage)
+        if remaining is not None:
+            remaining -= tokens
+
+    return [
+        {
+            'text': passage['text'],
+            'filename': passage['filename'],
+            'page_number': passage['page_number'],
+            'docs': passage['docs']
+        }
+        for passage in selected
+    ]
@@ -0,0 +1,126 @@
+"""
+Cross-request micro-batching for query embeddings.
+Concurrent callers are collected over a short window and encoded with a
+single model call, using the batch path of sentence-transformers.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+
+class EmbeddingBatcher:
+    """
+    Collects single-text embedding requests from many threads or coroutines into batched encode calls.
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0
+    ):
+        """
+        Initialize the batcher.
+
+        Args:
+            encode: Function embedding a list of texts into a 2-D array (e.g. SentenceTransformer.encode)
+            max_batch_size: Maximum number of texts per encode call
+            max_wait_ms: Maximum time to wait for more requests after the first one arrives
+        """
+        self._encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes: Dict[int, int] = {}
+        self._stats = {
+            'batches': 0,
+            'items': 0,
+            'failed_batches': 0
+        }
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        """
+        Queue a text for embedding.
+
+        Args:
+            text: Text to embed
+
+        Returns:
+            Future resolving to a 1-D embedding (use asyncio.wrap_future from async code)
+        """
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, text: str) -> np.ndarray:
+        """Embed a single text, blocking until its batch has been encoded."""
+        return self.submit(text).result()
+
+    def _collect_batch(self) -> list:
+        """Block for the first request, then gather more until the batch is full or the window closes."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = [
+                (text, future) for text, future in self._collect_batch()
+                if future.set_running_or_notify_cancel()
+            ]
+            if not batch:
+                continue
+
+            try:
+                embeddings = self._encode([text for text, _ in batch])
+            except Exception as e:
+                with self._stats_lock:
+                    self._stats['failed_batches'] += 1
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            with self._stats_lock:
+                self._stats['batches'] += 1
+                self._stats['items'] += len(batch)
+                self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+
+            for (_, future), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get batch counters and the batch-size distribution."""
+        with self._stats_lock:
+            return {
+                **self._stats,
+                'avg_batch_size': self._stats['items'] / self._stats['batches'] if self._stats['batches'] else 0.0,
+                'batch_size_histogram': dict(sorted(self._batch_sizes.items())),
+                'pending': self._queue.qsize(),
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0
+            }
@@ -0,0 +1,228 @@
+"""
+Query embedding cache with LRU/TTL eviction and an optional, size-bounded
+on-disk tier. Repeated questions skip the embedding model forward pass entirely.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalize question text so trivially different spellings share a cache entry.
+
+    Args:
+        text: Raw question text
+
+    Returns:
+        Case-folded text with collapsed whitespace
+    """
+    return " ".join(text.split()).casefold()
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded, thread-safe cache of query embeddings keyed on (model name, normalized text).
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        max_size: int = 1024,
+        ttl_seconds: Optional[float] = None,
+        disk_dir: Optional[str] = None,
+        disk_max_entries: int = 10000
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            model_name: Embedding model name, part of every cache key
+            max_size: Maximum number of in-memory entries (0 disables the cache, both tiers)
+            ttl_seconds: Entry lifetime in seconds, None for no expiry
+            disk_dir: Optional directory for the persistent on-disk tier (empty disables it)
+            disk_max_entries: Maximum number of on-disk entries; the least recently used files are
+                evicted on write (0 disables the on-disk tier)
+        """
+        self.model_name = model_name
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir if max_size > 0 and disk_max_entries > 0 else None
+        self.disk_max_entries = disk_max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Approximate, per process: other workers write to the same directory
+        self._disk_entries: Optional[int] = None
+        self._stats = {
+            'hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'disk_evictions': 0
+        }
+
+    def _key(self, text: str) -> str:
+        """Build the cache key for a question."""
+        raw = f"{self.model_name}\x00{normalize_query(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _is_expired(self, created_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.npy")
+
+    def _disk_files(self):
+        """List (last use, path) of the on-disk entries."""
+        files = []
+        with os.scandir(self.disk_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".npy"):
+                    try:
+                        files.append((entry.stat().st_atime, entry.path))
+                    except OSError:
+                        pass
+        return files
+
+    def _evict_disk(self):
+        """
+        Keep the on-disk tier within disk_max_entries. Once over the limit, the least
+        recently used files (by access time, set on every disk hit) are removed down to
+        90% of it, so the directory is not rescanned on every write.
+        """
+        with self._lock:
+            if self._disk_entries is not None and self._disk_entries <= self.disk_max_entries:
+                return
+        try:
+            files = self._disk_files()
+        except OSError:
+            return
+        evicted = 0
+        if len(files) > self.disk_max_entries:
+            files.sort()
+            excess = len(files) - int(self.disk_max_entries * 0.9)
+            for _, path in files[:excess]:
+                try:
+                    os.remove(path)
+                    evicted += 1
+                except OSError:
+                    pass
+        with self._lock:
+            self._disk_entries = len(files) - evicted
+            self._stats['disk_evictions'] += evicted
+
+    def _remember(self, key: str, embedding: np.ndarray, created_at: float):
+        """Insert into the memory tier, evicting least recently used entries. Caller holds the lock."""
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (embedding, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """
+        Look up the embedding for a question.
+
+        Args:
+            text: The question text
+
+        Returns:
+            Read-only 1-D embedding, or None on a miss
+        """
+        if self.max_size <= 0:
+            return None
+        key = self._key(text)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                embedding, created_at = entry
+                if not self._is_expired(created_at):
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return embedding
+                del self._entries[key]
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                created_at = os.path.getmtime(path)
+                if not self._is_expired(created_at):
+                    embedding = np.load(path)
+                    embedding.setflags(write=False)
+                    # The access time marks recent use for eviction; the modification
+                    # time stays the creation time the TTL is measured from
+                    os.utime(path, (time.time(), created_at))
+                    with self._lock:
+                        self._remember(key, embedding, created_at)
+                        self._stats['disk_hits'] += 1
+                    return embedding
+                os.remove(path)
+            except (OSError, ValueError):
+                pass
+
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+
+    def put(self, text: str, embedding: np.ndarray):
+        """
+        Store the embedding for a question.
+
+        Args:
+            text: The question text
+            embedding: 1-D embedding vector
+        """
+        if self.max_size <= 0:
+            return
+        key = self._key(text)
+        embedding = np.array(embedding, dtype=np.float32).reshape(-1)
+        embedding.setflags(write=False)
+        created_at = time.time()
+
+        with self._lock:
+            self._remember(key, embedding, created_at)
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                os.makedirs(self.disk_dir, exist_ok=True)
+                existed = os.path.exists(path)
+                with open(tmp_path, "wb") as f:
+                    np.save(f, embedding)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"[WARNING] Could not write query embedding cache entry: {e}")
+                return
+            if not existed:
+                with self._lock:
+                    if self._disk_entries is not None:
+                        self._disk_entries += 1
+            self._evict_disk()
+
+    def clear(self):
+        """Drop all in-memory entries (the on-disk tier is left untouched)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and current size."""
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['disk_hits'] + self._stats['misses']
+            return {
+                **self._stats,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'disk_size': self._disk_entries,
+                'disk_max_entries': self.disk_max_entries if self.disk_dir else 0,
+                'hit_rate': (self._stats['hits'] + self._stats['disk_hits']) / lookups if lookups else 0.0
+            }
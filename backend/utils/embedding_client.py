@@ -0,0 +1,113 @@
+"""
+Client for the shared embedding server (see embedding_server.py).
+Lets every uvicorn worker use one embedding model loaded in a single process.
+"""
+
+import os
+import threading
+from multiprocessing.connection import Client
+from typing import List, Union
+
+import numpy as np
+
+
+def get_server_authkey() -> bytes:
+    """
+    Shared secret between the embedding server and its clients.
+    The server unpickles requests, so there is no default: anyone who knows the
+    key can run code in the server process.
+
+    Raises:
+        ValueError: If EMBEDDING_SERVER_AUTHKEY is not set
+    """
+    authkey = os.getenv("EMBEDDING_SERVER_AUTHKEY")
+    if not authkey:
+        raise ValueError("EMBEDDING_SERVER_AUTHKEY not found in environment variables")
+    return authkey.encode("utf-8")
+
+
+def parse_server_address(address: str):
+    """
+    Parse an embedding server address.
+
+    Args:
+        address: "host:port" for TCP, or a filesystem path for a Unix socket
+
+    Returns:
+        (host, port) tuple or socket path string, as expected by multiprocessing.connection
+    """
+    if ":" in address and not address.startswith("/"):
+        host, port = address.rsplit(":", 1)
+        return (host, int(port))
+    return address
+
+
+class RemoteEmbedder:
+    """
+    Drop-in replacement for SentenceTransformer.encode backed by the shared embedding server.
+    """
+
+    def __init__(self, address: str, authkey: bytes):
+        """
+        Initialize the client. Connections are opened lazily, one per thread.
+
+        Args:
+            address: Server address ("host:port" or Unix socket path)
+            authkey: Shared secret used to authenticate with the server
+        """
+        self.address = parse_server_address(address)
+        self.authkey = authkey
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = Client(self.address, authkey=self.authkey)
+            self._local.conn = conn
+        return conn
+
+    def _reset(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def _request(self, message: tuple):
+        # Retry once on a broken connection (e.g. the server was restarted)
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                conn.send(message)
+                status, payload = conn.recv()
+                break
+            except (EOFError, OSError):
+                self._reset()
+                if attempt == 1:
+                    raise
+
+        if status == "error":
+            raise RuntimeError(f"Embedding server error: {payload}")
+        return payload
+
+    def encode(self, sentences: Union[str, List[str]], **kwargs) -> np.ndarray:
+        """
+        Embed texts on the shared server.
+
+        Args:
+            sentences: Text or list of texts
+            **kwargs: Forwarded to SentenceTransformer.encode on the server
+
+        Returns:
+            2-D embedding array (1-D for a single string, like SentenceTransformer)
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        embeddings = self._request(("encode", texts, kwargs))
+        return embeddings[0] if single else embeddings
+
+    def get_sentence_embedding_dimension(self) -> int:
+        """Get the embedding dimension of the served model."""
+        return self._request(("info",))["dimension"]
@@ -0,0 +1,112 @@
+"""
+Embedding stage for bulk ingestion.
+Accumulates chunks across many files into full batches, sorts them by length
+to reduce padding, and tracks embedding throughput. Chunks served from the
+embedding store are counted separately, so throughput reflects model work only.
+"""
+
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+
+class EmbeddingBatchError(Exception):
+    """
+    Raised when embedding a batch fails. Carries the documents of the failed batch
+    and the batches that were embedded successfully before it in the same call.
+    """
+
+    def __init__(self, documents: List[Dict[str, Any]], error: Exception):
+        super().__init__(str(error))
+        self.documents = documents
+        self.completed: List[Tuple[List[Dict[str, Any]], np.ndarray]] = []
+
+
+class EmbeddingStage:
+    """
+    Buffers document chunks and embeds them in full, length-sorted batches.
+    Not thread-safe: intended to be driven by a single embedding thread.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[List[str]], Tuple[np.ndarray, int]],
+        flush_size: int = 256
+    ):
+        """
+        Initialize the stage.
+
+        Args:
+            embed: Function embedding a list of texts and returning (embeddings, number
+                of texts served from a store), e.g. RAGEngine.embed_documents_counted,
+                which applies the configured model batch size and device
+            flush_size: Number of buffered chunks that triggers an embedding call
+        """
+        self.embed = embed
+        self.flush_size = max(1, flush_size)
+        self._buffer: List[Dict[str, Any]] = []
+        self._chunks = 0
+        self._store_hits = 0
+        self._seconds = 0.0
+
+    def add(self, documents: List[Dict[str, Any]]) -> List[Tuple[List[Dict[str, Any]], np.ndarray]]:
+        """
+        Add chunks to the buffer, embedding every full batch.
+
+        Args:
+            documents: List of dicts with 'text', 'doc_id', and 'metadata' keys
+
+        Returns:
+            List of (documents, embeddings) pairs for the batches embedded by this call
+
+        Raises:
+            EmbeddingBatchError: If a batch fails; remaining chunks stay buffered
+        """
+        self._buffer.extend(documents)
+        batches = []
+        while len(self._buffer) >= self.flush_size:
+            batch, self._buffer = self._buffer[:self.flush_size], self._buffer[self.flush_size:]
+            try:
+                batches.append(self._embed_batch(batch))
+            except EmbeddingBatchError as e:
+                e.completed = batches
+                raise
+        return batches
+
+    def flush(self) -> List[Tuple[List[Dict[str, Any]], np.ndarray]]:
+        """Embed whatever is left in the buffer."""
+        if not self._buffer:
+            return []
+        batch, self._buffer = self._buffer, []
+        return [self._embed_batch(batch)]
+
+    def _embed_batch(self, batch: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        # Similar lengths end up in the same model mini-batch, so less padding is computed.
+        # Documents are returned in sorted order, paired with their embeddings.
+        batch = sorted(batch, key=lambda doc: len(doc['text']))
+        start = time.perf_counter()
+        try:
+            embeddings, store_hits = self.embed([doc['text'] for doc in batch])
+        except Exception as e:
+            raise EmbeddingBatchError(batch, e) from e
+        self._store_hits += store_hits
+        if store_hits < len(batch):
+            # Batches served entirely from the store involve no model work
+            self._seconds += time.perf_counter() - start
+            self._chunks += len(batch) - store_hits
+        return batch, embeddings
+
+    @property
+    def pending(self) -> int:
+        """Number of buffered chunks not yet embedded."""
+        return len(self._buffer)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get embedding throughput counters (chunks_embedded counts model-embedded chunks only)."""
+        return {
+            'chunks_embedded': self._chunks,
+            'store_hits': self._store_hits,
+            'embedding_seconds': self._seconds,
+            'chunks_per_sec': self._chunks / self._seconds if self._seconds > 0 else 0.0
+        }
@@ -0,0 +1,206 @@
+"""
+Content-addressed store of document chunk embeddings.
+Embeddings are keyed by the SHA-256 of the chunk text and stored per model in a
+flat float32 file read through a memory map, with a SQLite index from content
+hash to row. Full rebuilds of the vector database then only embed new text.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    content_hash TEXT PRIMARY KEY,
+    row INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class EmbeddingStore:
+    """
+    Persistent content hash -> embedding map for one embedding model.
+    Safe for concurrent use from threads and processes: writers are serialized
+    by a SQLite write transaction, readers only see rows that were fully written.
+    """
+
+    def __init__(self, directory: str, model_name: str):
+        """
+        Initialize the store for a model. Files are created on first use.
+
+        Args:
+            directory: Root directory of the store; each model gets its own subdirectory
+            model_name: Embedding model name
+        """
+        self.model_name = model_name
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        model_key = hashlib.sha256(model_name.encode("utf-8")).hexdigest()[:8]
+        self.directory = os.path.join(directory, f"{safe_name}-{model_key}")
+
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self.index_path = os.path.join(self.directory, "index.db")
+
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._map_lock = threading.Lock()
+        self._map: Optional[np.memmap] = None
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'stored': 0
+        }
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; SQLite connections must not be shared across threads."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(self.directory, exist_ok=True)
+            conn = sqlite3.connect(self.index_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._initialize(conn)
+        return conn
+
+    def _initialize(self, conn: sqlite3.Connection):
+        """Create the index schema and the vectors file, once per instance."""
+        with self._init_lock:
+            if self._initialized:
+                return
+            with conn:
+                conn.executescript(SCHEMA)
+            open(self.vectors_path, "ab").close()
+            self._initialized = True
+
+    def _meta(self, conn: sqlite3.Connection, key: str) -> Optional[str]:
+        row = conn.execute("SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    @staticmethod
+    def _lookup_rows(conn: sqlite3.Connection, content_hashes: List[str]) -> Dict[str, int]:
+        """Map stored content hashes to their rows, staying below SQLite's bound-parameter limit."""
+        rows = {}
+        for i in range(0, len(content_hashes), 500):
+            part = content_hashes[i:i + 500]
+            placeholders = ",".join("?" * len(part))
+            rows.update(conn.execute(
+                f"SELECT content_hash, row FROM embeddings WHERE content_hash IN ({placeholders})",
+                part
+            ).fetchall())
+        return rows
+
+    def _vectors(self, min_rows: int, dim: int) -> np.memmap:
+        """Memory map of the vectors file covering at least min_rows rows (remapped as the file grows)."""
+        with self._map_lock:
+            if self._map is None or self._map.shape[0] < min_rows:
+                rows = os.path.getsize(self.vectors_path) // (dim * 4)
+                self._map = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, dim))
+            return self._map
+
+    def get_many(self, content_hashes: Sequence[str]) -> Dict[str, np.ndarray]:
+        """
+        Look up stored embeddings.
+
+        Args:
+            content_hashes: Chunk content hashes
+
+        Returns:
+            Dict mapping the hashes found to their 1-D embeddings
+        """
+        if not content_hashes:
+            return {}
+
+        conn = self._connection()
+        dim = self._meta(conn, "dim")
+        found = {}
+        if dim is not None:
+            rows = self._lookup_rows(conn, list(dict.fromkeys(content_hashes)))
+            if rows:
+                vectors = self._vectors(max(rows.values()) + 1, int(dim))
+                found = {content_hash: np.array(vectors[row]) for content_hash, row in rows.items()}
+
+        with self._stats_lock:
+            self._stats['hits'] += sum(1 for h in content_hashes if h in found)
+            self._stats['misses'] += sum(1 for h in content_hashes if h not in found)
+        return found
+
+    def put_many(self, content_hashes: Sequence[str], embeddings: np.ndarray):
+        """
+        Store embeddings; hashes that are already stored are left as they are.
+
+        Args:
+            content_hashes: Chunk content hashes
+            embeddings: 2-D array with one embedding per hash, in the same order
+
+        Raises:
+            ValueError: If the embedding dimension differs from the stored one
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if not len(content_hashes):
+            return
+        dim = embeddings.shape[1]
+
+        conn = self._connection()
+        with conn:
+            # BEGIN IMMEDIATE takes the write lock, so concurrent writers never append to the same rows
+            conn.execute("BEGIN IMMEDIATE")
+            stored_dim = self._meta(conn, "dim")
+            if stored_dim is None:
+                conn.execute("INSERT INTO store_meta (key, value) VALUES ('dim', ?)", (str(dim),))
+            elif int(stored_dim) != dim:
+                raise ValueError(f"Embedding dimension {dim} does not match stored dimension {stored_dim}")
+
+            new = {}
+            for content_hash, embedding in zip(content_hashes, embeddings):
+                if content_hash not in new:
+                    new[content_hash] = embedding
+            existing = self._lookup_rows(conn, list(new))
+            new = {h: e for h, e in new.items() if h not in existing}
+            if not new:
+                return
+
+            next_row = int(self._meta(conn, "rows") or 0)
+            # Vectors are written before the index rows are committed; a crash leaves
+            # unreferenced bytes past 'rows', which the next writer overwrites.
+            with open(self.vectors_path, "r+b") as f:
+                f.seek(next_row * dim * 4)
+                f.write(np.stack(list(new.values())).astype(np.float32).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            conn.executemany(
+                "INSERT INTO embeddings (content_hash, row) VALUES (?, ?)",
+                [(content_hash, next_row + i) for i, content_hash in enumerate(new)]
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO store_meta (key, value) VALUES ('rows', ?)",
+                (str(next_row + len(new)),)
+            )
+
+        with self._stats_lock:
+            self._stats['stored'] += len(new)
+
+    def count(self) -> int:
+        """Number of stored embeddings."""
+        return self._connection().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and the number of stored embeddings."""
+        with self._stats_lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                **self._stats,
+                'size': self.count(),
+                'hit_rate': self._stats['hits'] / lookups if lookups else 0.0
+            }
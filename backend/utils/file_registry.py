@@ -0,0 +1,219 @@
+"""
+Processed-files registry backed by SQLite (WAL mode).
+Safe for concurrent use from many threads and uvicorn worker processes, with
+per-file upserts and an indexed hash lookup instead of rewriting a JSON file.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    filename TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    chunk_count INTEGER NOT NULL DEFAULT 0,
+    page_count INTEGER NOT NULL DEFAULT 0,
+    processed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_files_hash ON files(hash);
+CREATE TABLE IF NOT EXISTS registry_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class FileRegistry:
+    """
+    Registry of processed files with their content hashes.
+    """
+
+    def __init__(self, db_path: str = "processed_files.db", legacy_json_path: Optional[str] = "processed_files.json"):
+        """
+        Initialize the registry. The database is created (and the legacy JSON
+        imported) on first use, so constructing it has no side effects.
+
+        Args:
+            db_path: Path to the SQLite database
+            legacy_json_path: Old processed_files.json, imported once if present
+        """
+        self.db_path = db_path
+        self.legacy_json_path = legacy_json_path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    @classmethod
+    def from_path(cls, path: str) -> "FileRegistry":
+        """
+        Open the registry from a configured path.
+        A legacy .json path maps to a .db file next to it, importing the JSON once.
+
+        Args:
+            path: Configured registry path (.db, or legacy .json)
+        """
+        if path.endswith(".json"):
+            return cls(db_path=path[:-len(".json")] + ".db", legacy_json_path=path)
+        return cls(db_path=path, legacy_json_path=os.path.splitext(path)[0] + ".json")
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; SQLite connections must not be shared across threads."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._initialize(conn)
+        return conn
+
+    def _initialize(self, conn: sqlite3.Connection):
+        """Create the schema and import the legacy JSON, once per instance."""
+        with self._init_lock:
+            if self._initialized:
+                return
+            with conn:
+                conn.executescript(SCHEMA)
+            if self.legacy_json_path:
+                self._migrate_from_json(self.legacy_json_path)
+            self._initialized = True
+
+    def _migrate_from_json(self, json_path: str):
+        """Import the legacy JSON registry exactly once."""
+        if not os.path.exists(json_path):
+            return
+
+        conn = self._connection()
+        with conn:
+            # BEGIN IMMEDIATE serializes concurrent workers racing to migrate
+            conn.execute("BEGIN IMMEDIATE")
+            done = conn.execute("SELECT value FROM registry_meta WHERE key = 'json_migrated'").fetchone()
+            if done is not None:
+                return
+
+            with open(json_path, "r") as f:
+                legacy = json.load(f)
+
+            conn.executemany(
+                """
+                INSERT OR IGNORE INTO files (filename, hash, chunk_count, page_count, processed_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                [
+                    (
+                        filename,
+                        entry.get('hash', ''),
+                        entry.get('chunk_count', 0),
+                        entry.get('page_count', 0),
+                        entry.get('processed_at')
+                    )
+                    for filename, entry in legacy.items()
+                ]
+            )
+            conn.execute(
+                "INSERT INTO registry_meta (key, value) VALUES ('json_migrated', ?)",
+                (datetime.now().isoformat(),)
+            )
+        print(f"[INFO] Migrated {len(legacy)} entries from {json_path} to {self.db_path}")
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            'hash': row['hash'],
+            'chunk_count': row['chunk_count'],
+            'page_count': row['page_count'],
+            'processed_at': row['processed_at']
+        }
+
+    def get(self, filename: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the registry entry for a file.
+
+        Args:
+            filename: Name of the file
+
+        Returns:
+            Dict with 'hash', 'chunk_count', 'page_count' and 'processed_at' keys, or None
+        """
+        row = self._connection().execute(
+            "SELECT * FROM files WHERE filename = ?", (filename,)
+        ).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def find_by_hash(self, file_hash: str) -> List[str]:
+        """
+        Find files with the given content hash.
+
+        Args:
+            file_hash: SHA-256 hex digest
+
+        Returns:
+            List of matching filenames
+        """
+        rows = self._connection().execute(
+            "SELECT filename FROM files WHERE hash = ?", (file_hash,)
+        ).fetchall()
+        return [row['filename'] for row in rows]
+
+    def upsert(self, filename: str, file_hash: str, chunk_count: int, page_count: int, processed_at: Optional[str] = None):
+        """
+        Insert or update the entry for one file.
+
+        Args:
+            filename: Name of the file
+            file_hash: SHA-256 hex digest of the file content
+            chunk_count: Number of indexed chunks
+            page_count: Number of pages
+            processed_at: ISO timestamp (defaults to now)
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                """
+                INSERT INTO files (filename, hash, chunk_count, page_count, processed_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(filename) DO UPDATE SET
+                    hash = excluded.hash,
+                    chunk_count = excluded.chunk_count,
+                    page_count = excluded.page_count,
+                    processed_at = excluded.processed_at
+                """,
+                (filename, file_hash, chunk_count, page_count, processed_at or datetime.now().isoformat())
+            )
+
+    def delete(self, filename: str):
+        """Remove the entry for one file."""
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM files WHERE filename = ?", (filename,))
+
+    def prune(self, keep_filenames: Iterable[str]) -> int:
+        """
+        Remove every entry not in keep_filenames.
+
+        Returns:
+            Number of removed entries
+        """
+        keep = set(keep_filenames)
+        conn = self._connection()
+        with conn:
+            stale = [
+                row['filename'] for row in conn.execute("SELECT filename FROM files")
+                if row['filename'] not in keep
+            ]
+            conn.executemany("DELETE FROM files WHERE filename = ?", [(filename,) for filename in stale])
+        return len(stale)
+
+    def all(self) -> Dict[str, Dict[str, Any]]:
+        """Get all entries keyed by filename."""
+        rows = self._connection().execute("SELECT * FROM files ORDER BY filename").fetchall()
+        return {row['filename']: self._to_dict(row) for row in rows}
+
+    def count(self) -> int:
+        """Number of registered files."""
+        return self._connection().execute("SELECT COUNT(*) FROM files").fetchone()[0]
@@ -0,0 +1,74 @@
+"""
+Change counter of the indexed chunks, shared by every process.
+Each write or delete of chunks bumps the counter of its collection, so caches
+in other uvicorn workers or job worker processes can tell that chunks they
+served answers from may have changed.
+"""
+
+import os
+import sqlite3
+import threading
+
+
+class IndexGeneration:
+    """
+    Per-collection generation numbers in a small SQLite database (WAL).
+    The database is opened on first use.
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path: Path to the SQLite database
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; SQLite connections must not be shared across threads."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS generations (collection TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+                )
+            self._local.conn = conn
+        return conn
+
+    def current(self, collection: str) -> int:
+        """
+        Current generation of a collection (0 if it was never written).
+
+        Args:
+            collection: Logical collection name
+        """
+        row = self._connection().execute(
+            "SELECT value FROM generations WHERE collection = ?", (collection,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, collection: str) -> int:
+        """
+        Record a change to a collection.
+
+        Args:
+            collection: Logical collection name
+
+        Returns:
+            The new generation
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT INTO generations (collection, value) VALUES (?, 1) "
+                "ON CONFLICT(collection) DO UPDATE SET value = value + 1",
+                (collection,)
+            )
+            return conn.execute(
+                "SELECT value FROM generations WHERE collection = ?", (collection,)
+            ).fetchone()[0]
@@ -0,0 +1,319 @@
+"""
+Persistent ingestion job queue backed by SQLite (WAL mode).
+Jobs survive restarts, are claimed atomically by worker threads in any API
+worker process, and record progress so clients can poll their status. Jobs for
+the same file are coalesced while queued and never run concurrently.
+
+A running job holds a lease that its worker renews; jobs whose lease expired
+(their worker crashed or was restarted) are put back in the queue.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    source_path TEXT,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    progress TEXT NOT NULL DEFAULT '{}',
+    result TEXT,
+    error TEXT,
+    worker_pid INTEGER,
+    worker_id TEXT,
+    lease_expires_at REAL,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs(status, priority DESC, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_filename ON jobs(filename, status);
+"""
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+class JobQueue:
+    """
+    Queue of ingestion jobs. Higher priority jobs are claimed first, then oldest first.
+    """
+
+    def __init__(self, db_path: str = "ingestion_jobs.db", lease_seconds: float = 60.0):
+        """
+        Initialize the queue. The database is created on first use.
+
+        Args:
+            db_path: Path to the SQLite database
+            lease_seconds: How long a claimed job stays reserved without a lease renewal
+        """
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        # Identifies this queue instance's claims; unlike a pid, it is never reused after a restart
+        self.worker_id = uuid.uuid4().hex
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; SQLite connections must not be shared across threads."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._initialize(conn)
+        return conn
+
+    def _initialize(self, conn: sqlite3.Connection):
+        """Create (or upgrade) the schema, once per instance."""
+        with self._init_lock:
+            if self._initialized:
+                return
+            with conn:
+                conn.executescript(SCHEMA)
+                columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+                if 'source_path' not in columns:
+                    # Queues created before jobs had private copies of their uploads
+                    conn.execute("ALTER TABLE jobs ADD COLUMN source_path TEXT")
+                if 'worker_id' not in columns:
+                    # Queues created before leases; their running jobs count as expired
+                    conn.execute("ALTER TABLE jobs ADD COLUMN worker_id TEXT")
+                    conn.execute("ALTER TABLE jobs ADD COLUMN lease_expires_at REAL")
+            self._initialized = True
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            'id': row['id'],
+            'filename': row['filename'],
+            'priority': row['priority'],
+            'status': row['status'],
+            'progress': json.loads(row['progress']),
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'created_at': row['created_at'],
+            'started_at': row['started_at'],
+            'finished_at': row['finished_at']
+        }
+
+    def enqueue(self, filename: str, file_path: str, priority: int = 0, source_path: str = None) -> str:
+        """
+        Add an ingestion job. If a job for the same file is still queued, that job
+        is updated to the new upload instead (keeping the higher priority).
+
+        Args:
+            filename: Name of the uploaded file
+            file_path: Path of the file on disk
+            priority: Higher values are processed first
+            source_path: Private copy of the upload the job reads instead of file_path, so a
+                newer upload can replace file_path meanwhile. The job owns it: it is deleted
+                when the job finishes or is superseded
+
+        Returns:
+            The job id
+        """
+        superseded = None
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id, source_path, priority FROM jobs WHERE filename = ? AND status = ? ORDER BY created_at LIMIT 1",
+                (filename, QUEUED)
+            ).fetchone()
+            if row is not None:
+                job_id, superseded = row['id'], row['source_path']
+                conn.execute(
+                    "UPDATE jobs SET file_path = ?, source_path = ?, priority = ? WHERE id = ?",
+                    (file_path, source_path, max(priority, row['priority']), job_id)
+                )
+            else:
+                job_id = uuid.uuid4().hex
+                conn.execute(
+                    """
+                    INSERT INTO jobs (id, filename, file_path, source_path, priority, status, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (job_id, filename, file_path, source_path, priority, QUEUED, datetime.now().isoformat())
+                )
+        if superseded and superseded != source_path:
+            remove_source_file(superseded)
+        return job_id
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """
+        Atomically take the next queued job and lease it to this queue instance.
+        Jobs whose lease expired are requeued first; jobs for a file that is still
+        being processed under a valid lease are left queued.
+
+        Returns:
+            Job dict including 'file_path' and 'source_path', or None if no job can run
+        """
+        conn = self._connection()
+        with conn:
+            # BEGIN IMMEDIATE takes the write lock, so two workers never claim the same job
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            self._requeue_expired(conn, now)
+            row = conn.execute(
+                """
+                SELECT * FROM jobs WHERE status = ? AND filename NOT IN (
+                    SELECT filename FROM jobs WHERE status = ?
+                )
+                ORDER BY priority DESC, created_at LIMIT 1
+                """,
+                (QUEUED, RUNNING)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                """
+                UPDATE jobs SET status = ?, worker_pid = ?, worker_id = ?, lease_expires_at = ?, started_at = ?
+                WHERE id = ?
+                """,
+                (RUNNING, os.getpid(), self.worker_id, now + self.lease_seconds,
+                 datetime.now().isoformat(), row['id'])
+            )
+        job = self._to_dict(row)
+        job['file_path'] = row['file_path']
+        job['source_path'] = row['source_path']
+        job['status'] = RUNNING
+        return job
+
+    def renew_leases(self) -> int:
+        """
+        Extend the leases of all jobs this queue instance is running.
+
+        Returns:
+            Number of renewed jobs
+        """
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE status = ? AND worker_id = ?",
+                (time.time() + self.lease_seconds, RUNNING, self.worker_id)
+            )
+        return cursor.rowcount
+
+    def update_progress(self, job_id: str, **progress):
+        """
+        Merge progress fields (e.g. stage, pages_extracted, chunks_embedded) into a job.
+
+        Args:
+            job_id: Job id
+            **progress: Progress fields to set
+        """
+        conn = self._connection()
+        with conn:
+            row = conn.execute("SELECT progress FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            merged = {**json.loads(row['progress']), **progress}
+            conn.execute("UPDATE jobs SET progress = ? WHERE id = ?", (json.dumps(merged), job_id))
+
+    def finish(self, job_id: str, status: str, result: Dict[str, Any] = None, error: str = None):
+        """
+        Mark a job as finished. Ignored if the job's lease was lost meanwhile
+        (it was requeued and belongs to another worker now).
+
+        Args:
+            job_id: Job id
+            status: SUCCEEDED, SKIPPED or FAILED
+            result: Optional result dict
+            error: Optional error message
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                """
+                UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_expires_at = NULL
+                WHERE id = ? AND status = ? AND worker_id = ?
+                """,
+                (status, json.dumps(result) if result is not None else None, error,
+                 datetime.now().isoformat(), job_id, RUNNING, self.worker_id)
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a job by id.
+
+        Returns:
+            Job dict, or None if unknown
+        """
+        row = self._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def list(self, status: str = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        List the most recent jobs.
+
+        Args:
+            status: Optional status filter
+            limit: Maximum number of jobs
+
+        Returns:
+            Job dicts, newest first
+        """
+        if status:
+            rows = self._connection().execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?", (status, limit)
+            ).fetchall()
+        else:
+            rows = self._connection().execute(
+                "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    @staticmethod
+    def _requeue_expired(conn: sqlite3.Connection, now: float) -> int:
+        """Put back running jobs whose lease expired. Caller holds the write lock."""
+        cursor = conn.execute(
+            """
+            UPDATE jobs SET status = ?, worker_pid = NULL, worker_id = NULL, lease_expires_at = NULL, started_at = NULL
+            WHERE status = ? AND (lease_expires_at IS NULL OR lease_expires_at < ?)
+            """,
+            (QUEUED, RUNNING, now)
+        )
+        return cursor.rowcount
+
+    def requeue_orphaned(self) -> int:
+        """
+        Put back running jobs whose worker stopped renewing their lease (e.g. after a
+        crash or restart).
+
+        Returns:
+            Number of requeued jobs
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            return self._requeue_expired(conn, time.time())
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status."""
+        rows = self._connection().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+
+def remove_source_file(path: str):
+    """Delete a job's private copy of its upload, if it still exists."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
@@ -0,0 +1,768 @@
+"""
+Local, in-process vector index (VECTOR_DB_PROVIDER=local).
+Normalized embeddings live in a memory-mapped float16 or int8 matrix (int8 with
+one scale per vector) that every uvicorn worker maps read-only (one copy in the
+page cache), searched with a
+blocked NumPy matmul top-k, or with HNSW (optional hnswlib) on large corpora.
+The HNSW graph is built and kept up to date by a background thread; queries use
+exact search until the first graph is ready.
+Ids, documents and metadata live in SQLite. The client and collection classes
+mirror the subset of the ChromaDB API that RAGEngine uses, so they are drop-in.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from utils.metadata_filter import matches_where
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    row INTEGER PRIMARY KEY,
+    doc_id TEXT NOT NULL,
+    document TEXT,
+    metadata TEXT NOT NULL DEFAULT '{}',
+    filename TEXT,
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_items_live_id ON items(doc_id) WHERE deleted = 0;
+CREATE INDEX IF NOT EXISTS idx_items_filename ON items(filename) WHERE deleted = 0;
+CREATE INDEX IF NOT EXISTS idx_items_ingested_at ON items(json_extract(metadata, '$.ingested_at')) WHERE deleted = 0;
+CREATE TABLE IF NOT EXISTS index_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Rows scored per matmul block; bounds the float32 copy made from the float16/int8 matrix
+SEARCH_BLOCK_ROWS = 16384
+
+# int8 storage maps each vector's largest component to this value (one scale per vector)
+INT8_MAX = 127.0
+
+# Filtered queries score only the matching rows when they are at most this share of the index
+FILTERED_SEARCH_MAX_SHARE = 0.5
+
+# HNSW graphs are allocated for this many times the current rows, so appends rarely force a rebuild
+ANN_CAPACITY_FACTOR = 2
+
+SQL_OPERATORS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+
+def where_to_sql(where: Dict[str, Any]):
+    """
+    Translate a `where` clause to SQL over the items table.
+
+    Returns:
+        Tuple of (SQL condition, parameters), or None if the clause cannot be translated
+    """
+    clauses, params = [], []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            parts = [where_to_sql(clause) for clause in condition]
+            if not parts or any(part is None for part in parts):
+                return None
+            joiner = " AND " if key == "$and" else " OR "
+            clauses.append("(" + joiner.join(part[0] for part in parts) + ")")
+            for part in parts:
+                params.extend(part[1])
+            continue
+
+        if not re.fullmatch(r"\w+", key):
+            return None
+        column = "filename" if key == "filename" else f"json_extract(metadata, '$.{key}')"
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, operand in condition.items():
+            if op in ("$in", "$nin"):
+                operand = list(operand)
+                if not operand:
+                    clauses.append("0" if op == "$in" else "1")
+                    continue
+                placeholders = ",".join("?" * len(operand))
+                if op == "$in":
+                    clauses.append(f"{column} IN ({placeholders})")
+                else:
+                    clauses.append(f"({column} IS NULL OR {column} NOT IN ({placeholders}))")
+                params.extend(operand)
+            elif op == "$ne":
+                clauses.append(f"({column} IS NULL OR {column} != ?)")
+                params.append(operand)
+            elif op in SQL_OPERATORS:
+                clauses.append(f"{column} {SQL_OPERATORS[op]} ?")
+                params.append(operand)
+            else:
+                return None
+    return " AND ".join(clauses) or "1", params
+
+
+class LocalCollection:
+    """
+    One collection: SQLite rows plus a memory-mapped matrix of normalized embeddings.
+    Updates append a new row and tombstone the old one; the matrix is compacted
+    when tombstones outnumber live rows. Reads see one version of the matrix and
+    the rows together (a SQLite read transaction), so a concurrent compaction
+    never mixes up row numbers.
+    """
+
+    def __init__(self, directory: str, name: str, dtype: str = "float16", ann: Optional[str] = None, ann_min_rows: int = 20000):
+        """
+        Open (and create if needed) a collection.
+
+        Args:
+            directory: Directory holding this collection's files
+            name: Collection name
+            dtype: Storage type of the embeddings, 'float16' or 'int8'
+            ann: 'hnsw' to use an HNSW index (requires hnswlib) for unfiltered queries
+            ann_min_rows: Minimum live rows before the HNSW index is used
+        """
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"Unsupported local index dtype: {dtype}")
+        self.name = name
+        self.directory = directory
+        self.dtype = np.dtype(dtype)
+        self.ann = ann
+        self.ann_min_rows = ann_min_rows
+        os.makedirs(directory, exist_ok=True)
+
+        self.db_path = os.path.join(directory, "items.db")
+        self._local = threading.local()
+        self._cache_lock = threading.Lock()
+        self._snapshot_cache = None
+        # HNSW graph (see _ann_search); maintained by a background thread
+        self._ann_lock = threading.Lock()
+        self._ann_state = None
+        self._ann_target = None
+        self._ann_building = False
+
+        conn = self._connection()
+        with conn:
+            conn.executescript(SCHEMA)
+            conn.execute("INSERT OR IGNORE INTO index_meta (key, value) VALUES ('version', '0')")
+            conn.execute("INSERT OR IGNORE INTO index_meta (key, value) VALUES ('vectors', 'vectors-0.bin')")
+            conn.execute("INSERT OR IGNORE INTO index_meta (key, value) VALUES ('dtype', ?)", (dtype,))
+            if self._meta(conn, "live") is None:
+                # Row counters, so writes can decide on compaction without scanning the table
+                live, dead = conn.execute(
+                    "SELECT COUNT(*) - COALESCE(SUM(deleted), 0), COALESCE(SUM(deleted), 0) FROM items"
+                ).fetchone()
+                conn.execute("INSERT INTO index_meta (key, value) VALUES ('live', ?), ('dead', ?)", (str(live), str(dead)))
+        stored_dtype = self._meta(conn, "dtype")
+        if stored_dtype != dtype:
+            # The matrix on disk decides; the setting only applies to new collections
+            self.dtype = np.dtype(stored_dtype)
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; SQLite connections must not be shared across threads."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _meta(conn: sqlite3.Connection, key: str) -> Optional[str]:
+        row = conn.execute("SELECT value FROM index_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def _encode(self, embeddings: np.ndarray):
+        """
+        Normalize embeddings and convert them to the storage type.
+
+        Returns:
+            Tuple of (stored vectors, per-vector int8 steps or None for float16)
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.maximum(norms, 1e-12)
+        if self.dtype == np.int8:
+            # Scale each vector to the full int8 range; a fixed scale leaves most levels unused
+            steps = np.maximum(np.abs(embeddings).max(axis=1), 1e-12) / INT8_MAX
+            stored = np.clip(np.rint(embeddings / steps[:, None]), -INT8_MAX, INT8_MAX).astype(np.int8)
+            return stored, steps.astype(np.float32)
+        return embeddings.astype(np.float16), None
+
+    @staticmethod
+    def _decode(snapshot: SimpleNamespace, index) -> np.ndarray:
+        """Float32 embeddings of some rows (an index array or a slice) of a snapshot."""
+        vectors = np.asarray(snapshot.matrix[index], dtype=np.float32)
+        if snapshot.steps is not None:
+            vectors *= snapshot.steps[index][:, None]
+        return vectors
+
+    def _steps_path(self, vectors_name: str) -> str:
+        """Path of the per-vector int8 steps file belonging to a matrix file."""
+        return os.path.join(self.directory, vectors_name[:-len(".bin")] + ".steps.bin")
+
+    # -- Writes ------------------------------------------------------------
+
+    def add(self, ids, documents=None, embeddings=None, metadatas=None):
+        """Insert chunks (same as upsert: existing ids are replaced)."""
+        self.upsert(ids, documents=documents, embeddings=embeddings, metadatas=metadatas)
+
+    def upsert(self, ids, documents=None, embeddings=None, metadatas=None):
+        """
+        Insert or replace chunks.
+
+        Args:
+            ids: Chunk ids
+            documents: Chunk texts
+            embeddings: One embedding per chunk
+            metadatas: One metadata dict per chunk
+        """
+        if not len(ids):
+            return
+        if embeddings is None:
+            raise ValueError("The local vector index requires precomputed embeddings")
+        vectors, steps = self._encode(embeddings)
+        dim = vectors.shape[1]
+        documents = documents if documents is not None else [None] * len(ids)
+        metadatas = metadatas if metadatas is not None else [{}] * len(ids)
+
+        conn = self._connection()
+        with conn:
+            # BEGIN IMMEDIATE takes the write lock, so concurrent writers never append to the same rows
+            conn.execute("BEGIN IMMEDIATE")
+            stored_dim = self._meta(conn, "dim")
+            if stored_dim is None:
+                conn.execute("INSERT INTO index_meta (key, value) VALUES ('dim', ?)", (str(dim),))
+            elif int(stored_dim) != dim:
+                raise ValueError(f"Embedding dimension {dim} does not match index dimension {stored_dim}")
+
+            replaced = self._tombstone(conn, ids)
+            next_row = conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM items").fetchone()[0]
+
+            vectors_name = self._meta(conn, "vectors")
+            self._write_at(os.path.join(self.directory, vectors_name), next_row * dim * self.dtype.itemsize, vectors)
+            if steps is not None:
+                self._write_at(self._steps_path(vectors_name), next_row * steps.itemsize, steps)
+
+            conn.executemany(
+                "INSERT INTO items (row, doc_id, document, metadata, filename) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (next_row + i, doc_id, document, json.dumps(metadata or {}), (metadata or {}).get('filename'))
+                    for i, (doc_id, document, metadata) in enumerate(zip(ids, documents, metadatas))
+                ]
+            )
+            self._count_rows(conn, live=len(ids) - replaced, dead=replaced)
+            self._bump_version(conn)
+
+        self._maybe_compact()
+
+    def delete(self, ids=None, where=None):
+        """
+        Delete chunks by id and/or metadata filter.
+
+        Args:
+            ids: Chunk ids
+            where: Metadata filter
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            doc_ids = list(ids or [])
+            if where:
+                doc_ids += [item['doc_id'] for item in self._select(conn, where=where)]
+            if not doc_ids:
+                return
+            deleted = self._tombstone(conn, doc_ids)
+            self._count_rows(conn, live=-deleted, dead=deleted)
+            self._bump_version(conn)
+
+        self._maybe_compact()
+
+    @staticmethod
+    def _write_at(path: str, offset: int, array: np.ndarray):
+        """Write an array into a file at a byte offset, creating the file if needed."""
+        with open(path, "ab") as f:
+            pass
+        with open(path, "r+b") as f:
+            f.seek(offset)
+            f.write(array.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _tombstone(conn: sqlite3.Connection, doc_ids: Sequence[str]) -> int:
+        """Mark live chunks deleted, returning how many rows were tombstoned."""
+        cursor = conn.executemany("UPDATE items SET deleted = 1 WHERE doc_id = ? AND deleted = 0", [(i,) for i in doc_ids])
+        return max(cursor.rowcount, 0)
+
+    @staticmethod
+    def _count_rows(conn: sqlite3.Connection, live: int = 0, dead: int = 0):
+        conn.execute("UPDATE index_meta SET value = CAST(value AS INTEGER) + ? WHERE key = 'live'", (live,))
+        conn.execute("UPDATE index_meta SET value = CAST(value AS INTEGER) + ? WHERE key = 'dead'", (dead,))
+
+    @staticmethod
+    def _bump_version(conn: sqlite3.Connection):
+        conn.execute("UPDATE index_meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version'")
+
+    def _maybe_compact(self):
+        conn = self._connection()
+        live, dead = int(self._meta(conn, "live")), int(self._meta(conn, "dead"))
+        if dead > 1000 and dead > live:
+            self.compact()
+
+    def compact(self):
+        """
+        Rewrite the matrix without tombstoned rows.
+        The new matrix goes to a new file, so readers keep their old mapping until they refresh.
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            dim = self._meta(conn, "dim")
+            if dim is None:
+                return
+            dim = int(dim)
+            old_name = self._meta(conn, "vectors")
+            old_path = os.path.join(self.directory, old_name)
+            version = int(self._meta(conn, "version")) + 1
+            new_name = f"vectors-{version}.bin"
+
+            rows = [row for (row,) in conn.execute("SELECT row FROM items WHERE deleted = 0 ORDER BY row")]
+            old = np.memmap(old_path, dtype=self.dtype, mode="r").reshape(-1, dim) if rows else None
+            self._copy_rows(old, rows, os.path.join(self.directory, new_name))
+            del old
+            if self.dtype == np.int8:
+                old_steps = np.memmap(self._steps_path(old_name), dtype=np.float32, mode="r") if rows else None
+                self._copy_rows(old_steps, rows, self._steps_path(new_name))
+                del old_steps
+
+            conn.execute("DELETE FROM items WHERE deleted = 1")
+            # Renumber in row order; negative temporaries avoid primary key clashes
+            conn.executemany("UPDATE items SET row = ? WHERE row = ?", [(-(i + 1), row) for i, row in enumerate(rows)])
+            conn.execute("UPDATE items SET row = -row - 1")
+            conn.execute("UPDATE index_meta SET value = ? WHERE key = 'vectors'", (new_name,))
+            conn.execute("UPDATE index_meta SET value = ? WHERE key = 'version'", (str(version),))
+            conn.execute("UPDATE index_meta SET value = '0' WHERE key = 'dead'")
+
+        # Readers still on the old version keep their mapping; new readers open the new files
+        for path in (old_path, self._steps_path(old_name)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _copy_rows(source: Optional[np.ndarray], rows: List[int], path: str):
+        """Write the given rows of a memory-mapped array, in order, to a new file."""
+        with open(path, "wb") as f:
+            for start in range(0, len(rows), SEARCH_BLOCK_ROWS):
+                f.write(np.ascontiguousarray(source[rows[start:start + SEARCH_BLOCK_ROWS]]).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+    # -- Reads -------------------------------------------------------------
+
+    @contextmanager
+    def _read_transaction(self):
+        """
+        Run several reads against one version of the index (a WAL snapshot), so row
+        numbers in the matrix and in the items table always agree.
+
+        Yields:
+            The thread's connection, inside a read transaction
+        """
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.rollback()
+
+    def _read(self, func):
+        """
+        Call func(conn, snapshot) in a read transaction. Retries if a compaction
+        removed the matrix file of the snapshot before this process mapped it.
+        """
+        for attempt in range(3):
+            try:
+                with self._read_transaction() as conn:
+                    return func(conn, self._snapshot(conn))
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+
+    def _snapshot(self, conn: sqlite3.Connection) -> SimpleNamespace:
+        """
+        Matrix, int8 steps and live-row mask of the version the read transaction sees,
+        remapped only after a write (from any process). Snapshots are never modified,
+        so searches that started on an older version can finish on it.
+        """
+        version = self._meta(conn, "version")
+        with self._cache_lock:
+            snapshot = self._snapshot_cache
+            if snapshot is not None and snapshot.version == version:
+                return snapshot
+
+            dim = self._meta(conn, "dim")
+            vectors_name = self._meta(conn, "vectors")
+            max_row = conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM items").fetchone()[0]
+            steps = None
+            if dim is None or max_row == 0:
+                matrix = np.zeros((0, int(dim or 0)), dtype=self.dtype)
+                if self.dtype == np.int8:
+                    steps = np.zeros(0, dtype=np.float32)
+            else:
+                matrix = np.memmap(
+                    os.path.join(self.directory, vectors_name),
+                    dtype=self.dtype, mode="r", shape=(max_row, int(dim))
+                )
+                if self.dtype == np.int8:
+                    steps = np.memmap(self._steps_path(vectors_name), dtype=np.float32, mode="r", shape=(max_row,))
+            alive = np.zeros(max_row, dtype=bool)
+            live_rows = [row for (row,) in conn.execute("SELECT row FROM items WHERE deleted = 0")]
+            alive[live_rows] = True
+
+            snapshot = SimpleNamespace(
+                version=version, vectors_name=vectors_name, matrix=matrix, steps=steps, alive=alive
+            )
+            self._snapshot_cache = snapshot
+            return snapshot
+
+    def _select(self, conn: sqlite3.Connection, ids=None, where=None, rows=None) -> List[Dict[str, Any]]:
+        """Fetch live items by id, by row or by metadata filter."""
+        if rows is not None:
+            query, params = "SELECT * FROM items WHERE deleted = 0 AND row IN ({})", list(rows)
+        elif ids is not None:
+            query, params = "SELECT * FROM items WHERE deleted = 0 AND doc_id IN ({})", list(ids)
+        elif where and where_to_sql(where) is not None:
+            # Push the filter down to SQLite (filename and ingested_at are indexed)
+            condition, params = where_to_sql(where)
+            query = f"SELECT * FROM items WHERE deleted = 0 AND {condition}"
+            where = None
+        else:
+            query, params = "SELECT * FROM items WHERE deleted = 0 ORDER BY row", []
+
+        items = []
+        if "{}" in query:
+            # Stay below SQLite's bound-parameter limit
+            for start in range(0, len(params), 500):
+                part = params[start:start + 500]
+                cursor = conn.execute(query.format(",".join("?" * len(part))), part)
+                items.extend(self._item(cursor, values) for values in cursor.fetchall())
+        else:
+            cursor = conn.execute(query, params)
+            items = [self._item(cursor, values) for values in cursor.fetchall()]
+
+        if where:
+            items = [item for item in items if matches_where(item['metadata'], where)]
+        return sorted(items, key=lambda item: item['row'])
+
+    @staticmethod
+    def _item(cursor: sqlite3.Cursor, values: tuple) -> Dict[str, Any]:
+        item = dict(zip([column[0] for column in cursor.description], values))
+        item['metadata'] = json.loads(item['metadata'])
+        return item
+
+    def count(self) -> int:
+        """Number of live chunks."""
+        return self._connection().execute("SELECT COUNT(*) FROM items WHERE deleted = 0").fetchone()[0]
+
+    def get(self, ids=None, where=None, include=("documents", "metadatas"), limit=None, offset=None):
+        """
+        Fetch chunks by id and/or metadata filter.
+
+        Returns:
+            Dict with 'ids' and the requested 'documents', 'metadatas' and 'embeddings'
+        """
+        if "embeddings" in include:
+            return self._read(lambda conn, snapshot: self._get(conn, snapshot, ids, where, include, limit, offset))
+        return self._get(self._connection(), None, ids, where, include, limit, offset)
+
+    def _get(self, conn, snapshot, ids, where, include, limit, offset) -> Dict[str, Any]:
+        items = self._select(conn, ids=ids, where=where)
+        if ids is not None:
+            order = {doc_id: i for i, doc_id in enumerate(ids)}
+            items.sort(key=lambda item: order[item['doc_id']])
+        items = items[offset or 0:]
+        if limit is not None:
+            items = items[:limit]
+
+        result = {
+            'ids': [item['doc_id'] for item in items],
+            'documents': [item['document'] for item in items] if "documents" in include else None,
+            'metadatas': [item['metadata'] for item in items] if "metadatas" in include else None,
+            'embeddings': None
+        }
+        if snapshot is not None:
+            result['embeddings'] = self._decode(snapshot, [item['row'] for item in items]) if items else np.zeros((0, 0))
+        return result
+
+    def query(self, query_embeddings, n_results=10, where=None, include=("documents", "metadatas", "distances")):
+        """
+        Find the nearest chunks by cosine similarity.
+
+        Returns:
+            ChromaDB-shaped dict of per-query lists; distances are cosine distances (1 - cosine similarity)
+        """
+        return self._read(lambda conn, snapshot: self._query(conn, snapshot, query_embeddings, n_results, where, include))
+
+    def _query(self, conn, snapshot, query_embeddings, n_results, where, include) -> Dict[str, Any]:
+        alive = snapshot.alive
+        candidates = None
+        if where:
+            candidates = self._matching_rows(conn, where)
+            candidates = candidates[candidates < len(alive)]
+
+        result = {'ids': [], 'documents': [], 'metadatas': [], 'distances': []}
+        for embedding in query_embeddings:
+            q = np.asarray(embedding, dtype=np.float32)
+            q = q / max(float(np.linalg.norm(q)), 1e-12)
+
+            if candidates is not None:
+                rows, scores = self._filtered_search(snapshot, candidates, q, n_results)
+            elif self._use_ann(snapshot):
+                rows, scores = self._ann_search(snapshot, q, n_results)
+            else:
+                rows, scores = self._exact_search(snapshot, alive, q, n_results)
+
+            items = {item['row']: item for item in self._select(conn, rows=rows.tolist())} if len(rows) else {}
+            hits = [(row, score) for row, score in zip(rows.tolist(), scores.tolist()) if row in items]
+            result['ids'].append([items[row]['doc_id'] for row, _ in hits])
+            result['documents'].append([items[row]['document'] for row, _ in hits])
+            result['metadatas'].append([items[row]['metadata'] for row, _ in hits])
+            result['distances'].append([1.0 - score for _, score in hits])
+
+        for key in ("documents", "metadatas", "distances"):
+            if key not in include:
+                result[key] = None
+        return result
+
+    def _matching_rows(self, conn: sqlite3.Connection, where: Dict[str, Any]) -> np.ndarray:
+        """Rows of the live chunks matching a filter, in ascending order."""
+        translated = where_to_sql(where)
+        if translated is None:
+            return np.array([item['row'] for item in self._select(conn, where=where)], dtype=np.int64)
+        condition, params = translated
+        # Sorted here: ORDER BY row would make SQLite scan by rowid instead of using the metadata indexes
+        rows = conn.execute(f"SELECT row FROM items WHERE deleted = 0 AND {condition}", params)
+        return np.sort(np.array([row for (row,) in rows], dtype=np.int64))
+
+    def _filtered_search(self, snapshot: SimpleNamespace, rows: np.ndarray, q: np.ndarray, k: int):
+        """Score only the rows matching a filter; falls back to a masked scan for broad filters."""
+        alive = snapshot.alive
+        if len(rows) > FILTERED_SEARCH_MAX_SHARE * len(alive):
+            mask = np.zeros_like(alive)
+            mask[rows] = True
+            return self._exact_search(snapshot, mask & alive, q, k)
+
+        scores = np.concatenate(
+            [self._decode(snapshot, rows[start:start + SEARCH_BLOCK_ROWS]) @ q
+             for start in range(0, len(rows), SEARCH_BLOCK_ROWS)]
+        ) if len(rows) else np.zeros(0, dtype=np.float32)
+        if len(scores) > k:
+            keep = np.argpartition(-scores, k)[:k]
+            rows, scores = rows[keep], scores[keep]
+        order = np.argsort(-scores)[:k]
+        return rows[order], scores[order]
+
+    def _exact_search(self, snapshot: SimpleNamespace, mask: np.ndarray, q: np.ndarray, k: int):
+        """Blocked matmul over the memory-mapped matrix, keeping a running top-k."""
+        best_rows = np.zeros(0, dtype=np.int64)
+        best_scores = np.zeros(0, dtype=np.float32)
+        for start in range(0, snapshot.matrix.shape[0], SEARCH_BLOCK_ROWS):
+            block_mask = mask[start:start + SEARCH_BLOCK_ROWS]
+            if not block_mask.any():
+                continue
+            scores = self._decode(snapshot, slice(start, start + SEARCH_BLOCK_ROWS)) @ q
+            scores[~block_mask] = -np.inf
+            rows = np.arange(start, start + len(scores))
+            best_rows = np.concatenate([best_rows, rows])
+            best_scores = np.concatenate([best_scores, scores])
+            if len(best_scores) > k:
+                keep = np.argpartition(-best_scores, k)[:k]
+                best_rows, best_scores = best_rows[keep], best_scores[keep]
+
+        valid = np.isfinite(best_scores)
+        best_rows, best_scores = best_rows[valid], best_scores[valid]
+        order = np.argsort(-best_scores)[:k]
+        return best_rows[order], best_scores[order]
+
+    def _use_ann(self, snapshot: SimpleNamespace) -> bool:
+        return self.ann == "hnsw" and int(snapshot.alive.sum()) >= self.ann_min_rows and _hnswlib() is not None
+
+    def _ann_search(self, snapshot: SimpleNamespace, q: np.ndarray, k: int):
+        """
+        Approximate search with the process's HNSW graph. The graph may lag behind
+        the snapshot: hits deleted since are dropped (the graph is over-fetched by
+        their number) and rows appended since are searched exactly. Until a graph
+        of the snapshot's matrix file exists, the whole search is exact.
+        """
+        state = self._ann_state
+        if state is None or state.version != snapshot.version:
+            self._request_ann(snapshot)
+        if state is None or state.vectors_name != snapshot.vectors_name:
+            return self._exact_search(snapshot, snapshot.alive, q, k)
+
+        alive = snapshot.alive
+        covered = min(state.rows, len(alive))
+        stale = int(np.count_nonzero(state.alive[:covered] & ~alive[:covered]))
+        fetch = min(k + stale, state.live)
+        rows = np.zeros(0, dtype=np.int64)
+        scores = np.zeros(0, dtype=np.float32)
+        if fetch > 0:
+            try:
+                # ef applies to the whole graph, so it is set for each query's own k
+                state.index.set_ef(max(64, fetch * 4))
+                labels, distances = state.index.knn_query(q, k=fetch)
+            except RuntimeError:
+                # Fewer reachable elements than requested (e.g. deletions applied meanwhile)
+                return self._exact_search(snapshot, alive, q, k)
+            rows = labels[0].astype(np.int64)
+            # hnswlib's inner-product distance is 1 - dot
+            scores = 1.0 - distances[0]
+            keep = rows < covered
+            keep[keep] = alive[rows[keep]]
+            rows, scores = rows[keep], scores[keep]
+
+        appended = np.flatnonzero(alive[covered:]) + covered
+        if len(appended):
+            tail_rows, tail_scores = self._filtered_search(snapshot, appended, q, k)
+            rows = np.concatenate([rows, tail_rows])
+            scores = np.concatenate([scores, tail_scores])
+        order = np.argsort(-scores)[:k]
+        return rows[order], scores[order]
+
+    def _request_ann(self, snapshot: SimpleNamespace):
+        """Ask the background thread to bring the HNSW graph up to a snapshot."""
+        with self._ann_lock:
+            target = self._ann_target
+            if target is None or int(snapshot.version) > int(target.version):
+                self._ann_target = snapshot
+            if self._ann_building:
+                return
+            self._ann_building = True
+        threading.Thread(target=self._maintain_ann, name=f"hnsw-{self.name}", daemon=True).start()
+
+    def _maintain_ann(self):
+        # Applies the newest requested snapshot until none is pending
+        while True:
+            with self._ann_lock:
+                snapshot, self._ann_target = self._ann_target, None
+                if snapshot is None:
+                    self._ann_building = False
+                    return
+            state = self._ann_state
+            if state is not None and int(snapshot.version) <= int(state.version):
+                continue
+            try:
+                self._ann_state = self._update_ann(state, snapshot)
+            except Exception as e:
+                print(f"[WARNING] Could not update the HNSW index of '{self.name}': {e}")
+
+    def _update_ann(self, state: Optional[SimpleNamespace], snapshot: SimpleNamespace) -> SimpleNamespace:
+        """
+        Bring a graph up to a snapshot: deleted rows are marked deleted and new rows
+        added. A new graph is built after a compaction (rows are renumbered) or
+        when the rows outgrow the graph's capacity.
+        """
+        rows = len(snapshot.alive)
+        if state is None or state.vectors_name != snapshot.vectors_name or rows > state.capacity:
+            capacity = max(rows * ANN_CAPACITY_FACTOR, 1024)
+            index = _hnswlib().Index(space="ip", dim=snapshot.matrix.shape[1])
+            index.init_index(max_elements=capacity, ef_construction=200, M=16)
+            added = np.flatnonzero(snapshot.alive)
+            alive = snapshot.alive.copy()
+        else:
+            index, capacity = state.index, state.capacity
+            for row in np.flatnonzero(state.alive & ~snapshot.alive[:state.rows]):
+                index.mark_deleted(int(row))
+            added = np.flatnonzero(snapshot.alive[state.rows:]) + state.rows
+            alive = np.concatenate([state.alive & snapshot.alive[:state.rows], snapshot.alive[state.rows:]])
+
+        for start in range(0, len(added), SEARCH_BLOCK_ROWS):
+            block = added[start:start + SEARCH_BLOCK_ROWS]
+            index.add_items(self._decode(snapshot, block), block)
+        return SimpleNamespace(
+            version=snapshot.version, vectors_name=snapshot.vectors_name, index=index,
+            capacity=capacity, rows=rows, alive=alive, live=int(np.count_nonzero(alive))
+        )
+
+
+_hnswlib_module = None
+
+
+def _hnswlib():
+    """Import hnswlib on first use; None (exact search) if it is not installed."""
+    global _hnswlib_module
+    if _hnswlib_module is None:
+        try:
+            import hnswlib
+            _hnswlib_module = hnswlib
+        except ImportError:
+            print("[WARNING] hnswlib not installed, using exact search. Run: pip install hnswlib")
+            _hnswlib_module = False
+    return _hnswlib_module or None
+
+
+class LocalVectorClient:
+    """
+    Client managing local collections in a directory, mirroring chromadb.PersistentClient.
+    """
+
+    def __init__(self, path: str, dtype: str = "float16", ann: Optional[str] = None, ann_min_rows: int = 20000):
+        """
+        Args:
+            path: Root directory (the collections live in path/local_index)
+            dtype: Storage type of new collections, 'float16' or 'int8'
+            ann: 'hnsw' to use HNSW for large unfiltered queries
+            ann_min_rows: Minimum live rows before HNSW is used
+        """
+        self.root = os.path.join(path, "local_index")
+        self.dtype = dtype
+        self.ann = ann
+        self.ann_min_rows = ann_min_rows
+        self._collections: Dict[str, LocalCollection] = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _directory(self, name: str) -> str:
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", name)
+        return os.path.join(self.root, f"{safe_name}-{hashlib.sha256(name.encode('utf-8')).hexdigest()[:8]}")
+
+    def get_or_create_collection(self, name: str, metadata: Dict[str, Any] = None) -> LocalCollection:
+        """Open a collection, creating it if needed."""
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None or not os.path.exists(collection.directory):
+                directory = self._directory(name)
+                collection = LocalCollection(directory, name, self.dtype, self.ann, self.ann_min_rows)
+                with open(os.path.join(directory, "name"), "w") as f:
+                    f.write(name)
+                self._collections[name] = collection
+            return collection
+
+    def get_collection(self, name: str) -> LocalCollection:
+        """Open an existing collection."""
+        if not os.path.exists(self._directory(name)):
+            raise ValueError(f"Collection {name} does not exist")
+        return self.get_or_create_collection(name)
+
+    def delete_collection(self, name: str):
+        """Delete a collection and its files."""
+        with self._lock:
+            self._collections.pop(name, None)
+            shutil.rmtree(self._directory(name), ignore_errors=True)
+
+    def list_collections(self) -> List[SimpleNamespace]:
+        """List collections (objects with a 'name' attribute, like ChromaDB)."""
+        collections = []
+        for entry in sorted(os.listdir(self.root)):
+            name_path = os.path.join(self.root, entry, "name")
+            if os.path.exists(name_path):
+                with open(name_path, "r") as f:
+                    collections.append(SimpleNamespace(name=f.read()))
+        return collections
@@ -0,0 +1,122 @@
+"""
+Metadata filters for retrieval, in ChromaDB's `where` syntax.
+Filters are pushed down to the vector store, so a question about one contract
+searches only that contract's chunks.
+"""
+
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Union
+
+DateLike = Union[str, int, float, date, datetime]
+
+
+def to_timestamp(value: DateLike) -> int:
+    """
+    Convert a date to Unix seconds, the format of the 'ingested_at' chunk metadata.
+
+    Args:
+        value: ISO date or datetime string, date, datetime, or Unix seconds
+
+    Returns:
+        Unix timestamp in seconds
+    """
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.strip())
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    return int(value.timestamp())
+
+
+def build_where(
+    filename: Optional[str] = None,
+    filenames: Optional[List[str]] = None,
+    page_from: Optional[int] = None,
+    page_to: Optional[int] = None,
+    ingested_after: Optional[DateLike] = None,
+    ingested_before: Optional[DateLike] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Build a `where` clause from retrieval filters.
+
+    Args:
+        filename: Only chunks of this file
+        filenames: Only chunks of these files
+        page_from: First page (inclusive)
+        page_to: Last page (inclusive)
+        ingested_after: Only files ingested at or after this date
+        ingested_before: Only files ingested before this date
+
+    Returns:
+        A `where` dict, or None if no filter is set
+    """
+    clauses = []
+    if filename:
+        clauses.append({"filename": filename})
+    if filenames:
+        clauses.append({"filename": {"$in": list(filenames)}})
+    if page_from is not None:
+        clauses.append({"page_number": {"$gte": int(page_from)}})
+    if page_to is not None:
+        clauses.append({"page_number": {"$lte": int(page_to)}})
+    if ingested_after is not None:
+        clauses.append({"ingested_at": {"$gte": to_timestamp(ingested_after)}})
+    if ingested_before is not None:
+        clauses.append({"ingested_at": {"$lt": to_timestamp(ingested_before)}})
+
+    if not clauses:
+        return None
+    # ChromaDB requires an explicit $and for more than one condition
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def matches_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """
+    Evaluate a `where` clause against chunk metadata.
+    Supports equality, $eq, $ne, $gt, $gte, $lt, $lte, $in, $nin, $and and $or.
+
+    Args:
+        metadata: Chunk metadata
+        where: Filter, e.g. {"filename": "a.pdf"} or {"page_number": {"$gte": 3}}
+
+    Returns:
+        True if the metadata satisfies the filter
+    """
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        else:
+            value = metadata.get(key)
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for op, operand in condition.items():
+                if op == "$eq":
+                    ok = value == operand
+                elif op == "$ne":
+                    ok = value != operand
+                elif op == "$in":
+                    ok = value in operand
+                elif op == "$nin":
+                    ok = value not in operand
+                elif value is None:
+                    ok = False
+                elif op == "$gt":
+                    ok = value > operand
+                elif op == "$gte":
+                    ok = value >= operand
+                elif op == "$lt":
+                    ok = value < operand
+                elif op == "$lte":
+                    ok = value <= operand
+                else:
+                    raise ValueError(f"Unsupported filter operator: {op}")
+                if not ok:
+                    return False
+    return True
@@ -0,0 +1,139 @@
+"""
+Prometheus metrics for the ingestion and query pipelines.
+Every stage (PDF extraction, OCR, splitting, embedding, vector store writes,
+retrieval, reranking, LLM generation) records a duration histogram, and
+counters track indexed chunks, cache hits and failures; all series carry a
+'worker' label (the process id unless METRICS_WORKER_LABEL is set).
+
+With several processes (uvicorn workers, the extraction process pool) set
+PROMETHEUS_MULTIPROC_DIR so /metrics aggregates all of them. Without
+prometheus-client installed every function here is a no-op.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Tuple
+from dotenv import load_dotenv
+
+# prometheus_client picks single- or multi-process mode from PROMETHEUS_MULTIPROC_DIR at import time
+load_dotenv()
+if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+try:
+    from prometheus_client import CollectorRegistry, Counter, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+    from prometheus_client import multiprocess
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+# From cache lookups (milliseconds) to OCR of large scans and long LLM answers (minutes)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+if PROMETHEUS_AVAILABLE:
+    STAGE_DURATION = Histogram(
+        "rag_stage_duration_seconds",
+        "Duration of a pipeline stage",
+        ["stage", "worker"],
+        buckets=DURATION_BUCKETS
+    )
+    CHUNKS_INDEXED = Counter(
+        "rag_chunks_indexed_total",
+        "Chunks written to the vector store",
+        ["worker"]
+    )
+    CACHE_REQUESTS = Counter(
+        "rag_cache_requests_total",
+        "Cache lookups by cache and result (hit or miss)",
+        ["cache", "result", "worker"]
+    )
+    FAILURES = Counter(
+        "rag_failures_total",
+        "Failures by pipeline stage",
+        ["stage", "worker"]
+    )
+
+
+def worker_label() -> str:
+    """Value of the 'worker' label for this process."""
+    return os.getenv("METRICS_WORKER_LABEL") or str(os.getpid())
+
+
+def observe_stage(stage: str, seconds: float):
+    """
+    Record the duration of one run of a stage.
+
+    Args:
+        stage: Stage name, e.g. 'extract', 'embed' or 'llm'
+        seconds: Duration in seconds
+    """
+    if PROMETHEUS_AVAILABLE:
+        STAGE_DURATION.labels(stage=stage, worker=worker_label()).observe(seconds)
+
+
+@contextmanager
+def time_stage(stage: str):
+    """
+    Time a block as one run of a stage; an exception also counts as a failure of the stage.
+
+    Args:
+        stage: Stage name
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        count_failure(stage)
+        raise
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def count_chunks_indexed(count: int):
+    """Count chunks written to the vector store."""
+    if PROMETHEUS_AVAILABLE and count:
+        CHUNKS_INDEXED.labels(worker=worker_label()).inc(count)
+
+
+def count_cache(cache: str, hits: int = 0, misses: int = 0):
+    """
+    Count cache lookups.
+
+    Args:
+        cache: Cache name, e.g. 'query_embedding', 'answer' or 'embedding_store'
+        hits: Number of hits
+        misses: Number of misses
+    """
+    if not PROMETHEUS_AVAILABLE:
+        return
+    if hits:
+        CACHE_REQUESTS.labels(cache=cache, result="hit", worker=worker_label()).inc(hits)
+    if misses:
+        CACHE_REQUESTS.labels(cache=cache, result="miss", worker=worker_label()).inc(misses)
+
+
+def count_failure(stage: str):
+    """Count one failure of a stage (e.g. 'ingest' for a file that could not be indexed)."""
+    if PROMETHEUS_AVAILABLE:
+        FAILURES.labels(stage=stage, worker=worker_label()).inc()
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Render all metrics in the Prometheus text format.
+
+    Returns:
+        Tuple of (body, content type)
+
+    Raises:
+        RuntimeError: If prometheus-client is not installed
+    """
+    if not PROMETHEUS_AVAILABLE:
+        raise RuntimeError("prometheus-client not installed. Run: pip install prometheus-client")
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        # Aggregate the metric files written by every worker process
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -1,12 +1,87 @@
 from PyPDF2 import PdfReader
-from doctr.io import DocumentFile
-from doctr.models import ocr_predictor
-from typing import List, Tuple
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
 import hashlib
+import os
+import queue
+import threading
+from utils.metrics import time_stage
+
+
+class OCRPredictorPool:
+    """
+    Process-wide pool of docTR OCR predictors, reused across files and threads.
+    Predictors are created lazily, up to `size`; callers beyond that wait for a free one.
+    """
+    
+    def __init__(self, size: int = 1):
+        """
+        Initialize the pool.
+        
+        Args:
+            size: Maximum number of predictors (each holds its own detection + recognition models)
+        """
+        self.size = max(1, size)
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _create_predictor():
+        # docTR/torch are imported only when OCR is actually needed
+        from doctr.models import ocr_predictor
+        print("[INFO] Loading docTR OCR predictor...")
+        return ocr_predictor(pretrained=True)
+    
+    @contextmanager
+    def acquire(self):
+        """Borrow a predictor for the duration of the with-block."""
+        try:
+            predictor = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    predictor = self._create_predictor()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                predictor = self._idle.get()
+        
+        try:
+            yield predictor
+        finally:
+            self._idle.put(predictor)
+
+
+_ocr_pool = None
+_ocr_pool_lock = threading.Lock()
+
+
+def get_ocr_pool() -> OCRPredictorPool:
+    """Get the process-wide OCR predictor pool (sized by OCR_POOL_SIZE)."""
+    global _ocr_pool
+    if _ocr_pool is None:
+        with _ocr_pool_lock:
+            if _ocr_pool is None:
+                _ocr_pool = OCRPredictorPool(size=int(os.getenv("OCR_POOL_SIZE", "1")))
+    return _ocr_pool
+
+
+def warm_up_ocr():
+    """Load an OCR predictor ahead of the first scanned document."""
+    with get_ocr_pool().acquire():
+        pass
+
 
 def extract_text_from_pdf(file_path: str) -> str:
     """
-    Extract text from PDF document. Falls back to OCR (docTR) if no native text found.
+    Extract text from PDF document. Falls back to OCR (docTR) for pages without native text.
     
     Args:
         file_path: Path to the PDF file
@@ -14,67 +89,114 @@ def extract_text_from_pdf(file_path: str) -> str:
     Returns:
         Extracted text content as string
     """
-    reader = PdfReader(file_path)
-    text = ""
-
-    # Attempt native text extraction first
-    for page in reader.pages:
-        content = page.extract_text()
-        if content:
-            text += content + "\n"
-
-    # OCR fallback for scanned documents
-    if not text.strip():
-        print("[INFO] No native text detected. Initiating OCR with docTR...")
-        model = ocr_predictor(pretrained=True)
-        doc = DocumentFile.from_pdf(file_path)
-        result = model(doc)
-        text = result.render()
-        print("[INFO] OCR extraction completed successfully")
+    pages_text, _ = extract_text_by_pages(file_path)
+    return "\n".join(page_text for page_text in pages_text if page_text).strip()
+
 
-    return text.strip()
+def _ocr_page_text(page) -> str:
+    """Join the words of a docTR result page into plain text."""
+    return " ".join([
+        " ".join([word.value for word in line.words])
+        for block in page.blocks
+        for line in block.lines
+    ])
 
 
-def extract_text_by_pages(file_path: str) -> Tuple[List[str], int]:
+@time_stage("ocr")
+def ocr_pages(
+    file_path: str,
+    page_indices: List[int],
+    batch_size: int = 8,
+    progress_callback: Optional[Callable[[int], None]] = None
+) -> Dict[int, str]:
+    """
+    Rasterise and OCR only the selected pages of a PDF.
+    
+    Args:
+        file_path: Path to the PDF file
+        page_indices: Zero-based indices of the pages to OCR
+        batch_size: Number of pages sent to the docTR predictor at once
+        progress_callback: Optional callback receiving the number of pages OCRed so far
+    
+    Returns:
+        Dict mapping page index to OCR text
+    """
+    # pypdfium2 is the renderer docTR itself uses; render with the same scale/RGB settings
+    import pypdfium2 as pdfium
+
+    ocr_text = {}
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        for start in range(0, len(page_indices), batch_size):
+            batch_indices = page_indices[start:start + batch_size]
+            images = [
+                pdf[index].render(scale=2, rev_byteorder=True).to_numpy()
+                for index in batch_indices
+            ]
+            with get_ocr_pool().acquire() as model:
+                result = model(images)
+            for index, page in zip(batch_indices, result.pages):
+                ocr_text[index] = _ocr_page_text(page)
+            if progress_callback:
+                progress_callback(len(ocr_text))
+    finally:
+        pdf.close()
+
+    return ocr_text
+
+
+def extract_text_by_pages(
+    file_path: str,
+    progress_callback: Optional[Callable[[int, int], None]] = None
+) -> Tuple[List[str], int]:
     """
     Extract text from PDF preserving page boundaries.
     
+    Pages with little or no native text (scanned pages, image appendices) are
+    OCRed individually and merged back by page number, so mixed documents keep
+    full coverage without re-rendering the pages that already have text.
+    
     Args:
         file_path: Path to the PDF file
+        progress_callback: Optional callback receiving (pages extracted, total pages)
     
     Returns:
         Tuple of (list of page texts, total page count)
     """
-    reader = PdfReader(file_path)
     pages_text = []
-    needs_ocr = False
-
-    # Attempt native text extraction for each page
-    for page in reader.pages:
-        content = page.extract_text()
-        if content and content.strip():
-            pages_text.append(content)
-        else:
-            needs_ocr = True
-            pages_text.append("")
-
-    # OCR fallback if no text was extracted
-    if needs_ocr and not any(pages_text):
-        print("[INFO] No native text detected. Initiating OCR with docTR...")
-        model = ocr_predictor(pretrained=True)
-        doc = DocumentFile.from_pdf(file_path)
-        result = model(doc)
-        
-        # Extract text from each page in OCR result
-        pages_text = []
-        for page in result.pages:
-            page_text = " ".join([
-                " ".join([word.value for word in line.words])
-                for block in page.blocks
-                for line in block.lines
-            ])
-            pages_text.append(page_text)
-        
+    min_page_chars = int(os.getenv("OCR_MIN_PAGE_CHARS", "20"))
+
+    # Attempt native text extraction for each page (OCR is timed separately)
+    with time_stage("extract"):
+        reader = PdfReader(file_path)
+        for page in reader.pages:
+            content = page.extract_text()
+            pages_text.append(content if content and content.strip() else "")
+
+    # OCR only the empty or low-text pages
+    ocr_candidates = [
+        index for index, page_text in enumerate(pages_text)
+        if len(page_text.strip()) < min_page_chars
+    ]
+    run_ocr = bool(ocr_candidates) and os.getenv("ENABLE_OCR", "true").lower() == "true"
+    native_pages = len(pages_text) - len(ocr_candidates) if run_ocr else len(pages_text)
+    if progress_callback:
+        progress_callback(native_pages, len(pages_text))
+
+    if run_ocr:
+        print(f"[INFO] {len(ocr_candidates)}/{len(pages_text)} pages without native text. Initiating OCR with docTR...")
+        ocr_text = ocr_pages(
+            file_path,
+            ocr_candidates,
+            batch_size=int(os.getenv("OCR_BATCH_PAGES", "8")),
+            progress_callback=(
+                (lambda done: progress_callback(native_pages + done, len(pages_text)))
+                if progress_callback else None
+            )
+        )
+        for index, page_text in ocr_text.items():
+            if len(page_text.strip()) > len(pages_text[index].strip()):
+                pages_text[index] = page_text
         print("[INFO] OCR extraction completed successfully")
 
     return pages_text, len(pages_text)
@@ -92,7 +214,7 @@ def compute_file_hash(file_path: str) -> str:
     """
     sha256_hash = hashlib.sha256()
     with open(file_path, "rb") as f:
-        # Read in chunks for memory efficiency
-        for byte_block in iter(lambda: f.read(4096), b""):
+        # Read in large chunks for memory efficiency with few syscalls
+        for byte_block in iter(lambda: f.read(1024 * 1024), b""):
             sha256_hash.update(byte_block)
     return sha256_hash.hexdigest()
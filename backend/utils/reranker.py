@@ -0,0 +1,119 @@
+"""
+Cross-encoder reranking of retrieved chunks.
+Retrieval over-fetches candidates; a small cross-encoder scores every
+(question, chunk) pair in one batch and only the best few reach the LLM,
+which cuts prompt tokens and generation latency while raising precision.
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+
+class CrossEncoderReranker:
+    """
+    Thread-safe reranker around a sentence-transformers CrossEncoder, with latency statistics.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1",
+        device: Optional[str] = "cpu",
+        batch_size: int = 32,
+        max_length: int = 512
+    ):
+        """
+        Initialize the reranker. The model is loaded on first use (or by load).
+
+        Args:
+            model_name: Cross-encoder model (the default is multilingual, including Romanian)
+            device: Device for inference, None to auto-detect
+            batch_size: Pairs scored per forward pass
+            max_length: Maximum tokens per (question, chunk) pair
+        """
+        self.model_name = model_name
+        self.device = device
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'calls': 0,
+            'pairs_scored': 0,
+            'total_ms': 0.0,
+            'last_ms': 0.0,
+            'max_ms': 0.0
+        }
+
+    @property
+    def model(self):
+        """Cross-encoder model, loaded on first access."""
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name, device=self.device, max_length=self.max_length)
+        return self._model
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self):
+        """Load the model now instead of on the first question."""
+        return self.model
+
+    def rerank(
+        self,
+        question: str,
+        documents: List[Dict[str, Any]],
+        top_k: int,
+        min_score: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Reorder retrieved chunks by cross-encoder relevance.
+
+        Args:
+            question: The user's question
+            documents: Retrieved chunks (dicts with a 'text' key)
+            top_k: Maximum number of chunks to keep
+            min_score: Drop chunks scoring below this threshold
+
+        Returns:
+            The best chunks, most relevant first, each with an added 'rerank_score'
+        """
+        if not documents:
+            return []
+
+        start = time.perf_counter()
+        scores = self.model.predict(
+            [(question, doc['text']) for doc in documents],
+            batch_size=self.batch_size,
+            show_progress_bar=False
+        )
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        with self._stats_lock:
+            self._stats['calls'] += 1
+            self._stats['pairs_scored'] += len(documents)
+            self._stats['total_ms'] += elapsed_ms
+            self._stats['last_ms'] = elapsed_ms
+            self._stats['max_ms'] = max(self._stats['max_ms'], elapsed_ms)
+
+        ranked = sorted(
+            ({**doc, 'rerank_score': float(score)} for doc, score in zip(documents, scores)),
+            key=lambda doc: -doc['rerank_score']
+        )
+        if min_score is not None:
+            ranked = [doc for doc in ranked if doc['rerank_score'] >= min_score]
+        return ranked[:top_k]
+
+    def stats(self) -> Dict[str, Any]:
+        """Get rerank call counts and latency."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['avg_ms'] = stats['total_ms'] / stats['calls'] if stats['calls'] else 0.0
+        stats['model'] = self.model_name
+        stats['loaded'] = self.is_loaded
+        return stats
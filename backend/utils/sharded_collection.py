@@ -0,0 +1,220 @@
+"""
+Sharded vector collections.
+A logical collection is split into N physical collections by a hash of one
+metadata field (the filename by default, so all chunks of a document share a
+shard; or e.g. a tenant id). Writes go to the owning shard, queries fan out to
+the relevant shards concurrently and their top-k lists are merged, so each
+shard index stays small and searches run in parallel across cores.
+"""
+
+import hashlib
+import re
+from concurrent.futures import Executor
+from typing import Any, Dict, List, Optional, Set
+
+SHARD_SUFFIX_PATTERN = re.compile(r"_shard\d+of\d+$")
+
+
+def shard_collection_names(name: str, shard_count: int) -> List[str]:
+    """
+    Physical collection names of a sharded collection.
+    The shard count is part of the name, so changing it never mixes layouts.
+
+    Args:
+        name: Logical collection name
+        shard_count: Number of shards
+
+    Returns:
+        Names such as 'documents_v20250115103000_shard0of4'
+    """
+    return [f"{name}_shard{i}of{shard_count}" for i in range(shard_count)]
+
+
+def base_collection_name(name: str) -> str:
+    """Logical collection name of a physical shard (the name itself if it is not a shard)."""
+    return SHARD_SUFFIX_PATTERN.sub("", name)
+
+
+def shard_index(value: Any, shard_count: int) -> int:
+    """
+    Shard owning a shard key value (stable across processes and restarts).
+
+    Args:
+        value: Shard key value, e.g. a filename
+        shard_count: Number of shards
+
+    Returns:
+        Shard index in [0, shard_count)
+    """
+    digest = hashlib.sha256(str(value).encode("utf-8")).hexdigest()
+    return int(digest[:8], 16) % shard_count
+
+
+class ShardedCollection:
+    """
+    Collection facade over N shard collections, mirroring the ChromaDB collection
+    API used by RAGEngine (add, upsert, get, delete, query, count).
+    """
+
+    def __init__(self, name: str, shards: List[Any], shard_key: str, executor: Executor):
+        """
+        Args:
+            name: Logical collection name
+            shards: Shard collections, in shard index order
+            shard_key: Metadata field that decides the shard of a chunk
+            executor: Executor running the per-shard calls concurrently
+        """
+        self.name = name
+        self.shards = shards
+        self.shard_key = shard_key
+        self.executor = executor
+
+    def _map(self, indexes, func) -> List[Any]:
+        """Run func(shard) on several shards concurrently, returning results in order."""
+        indexes = list(indexes)
+        if len(indexes) == 1:
+            return [func(self.shards[indexes[0]])]
+        futures = [self.executor.submit(func, self.shards[i]) for i in indexes]
+        return [future.result() for future in futures]
+
+    def _route(self, where: Optional[Dict[str, Any]]) -> List[int]:
+        """Shards that can hold chunks matching a filter (all shards unless it pins the shard key)."""
+        values = self._shard_key_values(where) if where else None
+        if values is None:
+            return list(range(len(self.shards)))
+        return sorted({shard_index(value, len(self.shards)) for value in values})
+
+    def _shard_key_values(self, where: Dict[str, Any]) -> Optional[Set[Any]]:
+        """Shard key values a filter restricts to, or None if it does not restrict them."""
+        values = None
+        for key, condition in where.items():
+            if key == "$and":
+                for clause in condition:
+                    clause_values = self._shard_key_values(clause)
+                    if clause_values is not None:
+                        values = clause_values if values is None else values & clause_values
+            elif key == self.shard_key:
+                if not isinstance(condition, dict):
+                    condition = {"$eq": condition}
+                if "$eq" in condition:
+                    clause_values = {condition["$eq"]}
+                elif "$in" in condition:
+                    clause_values = set(condition["$in"])
+                else:
+                    continue
+                values = clause_values if values is None else values & clause_values
+        return values
+
+    def count(self) -> int:
+        """Number of chunks across all shards."""
+        return sum(self._map(range(len(self.shards)), lambda shard: shard.count()))
+
+    def add(self, ids, documents=None, embeddings=None, metadatas=None):
+        """Insert chunks into their shards."""
+        self._write("add", ids, documents, embeddings, metadatas)
+
+    def upsert(self, ids, documents=None, embeddings=None, metadatas=None):
+        """Insert or replace chunks in their shards."""
+        self._write("upsert", ids, documents, embeddings, metadatas)
+
+    def _write(self, method: str, ids, documents, embeddings, metadatas):
+        groups: Dict[int, List[int]] = {}
+        for position, metadata in enumerate(metadatas or [{}] * len(ids)):
+            groups.setdefault(shard_index((metadata or {}).get(self.shard_key), len(self.shards)), []).append(position)
+
+        def write(shard, positions):
+            getattr(shard, method)(
+                ids=[ids[p] for p in positions],
+                documents=[documents[p] for p in positions] if documents is not None else None,
+                embeddings=[embeddings[p] for p in positions] if embeddings is not None else None,
+                metadatas=[metadatas[p] for p in positions] if metadatas is not None else None
+            )
+
+        futures = [self.executor.submit(write, self.shards[i], positions) for i, positions in groups.items()]
+        for future in futures:
+            future.result()
+
+    def delete(self, ids=None, where=None):
+        """Delete chunks by id (from every shard) and/or filter (from the matching shards)."""
+        indexes = range(len(self.shards)) if ids else self._route(where)
+        self._map(indexes, lambda shard: shard.delete(ids=ids, where=where))
+
+    def get(self, ids=None, where=None, include=("documents", "metadatas"), limit=None, offset=None):
+        """
+        Fetch chunks from the relevant shards. With limit/offset, shards are paged
+        through in order, as if they were one collection.
+        """
+        indexes = self._route(where)
+        paged = limit is not None or bool(offset)
+        if paged and where is None and ids is None:
+            # Unfiltered paging: skip whole shards by their counts
+            results = []
+            skip, remaining = offset or 0, limit
+            for i in indexes:
+                if remaining is not None and remaining <= 0:
+                    break
+                size = self.shards[i].count()
+                if skip >= size:
+                    skip -= size
+                    continue
+                result = self.shards[i].get(include=include, limit=remaining, offset=skip)
+                results.append(result)
+                skip = 0
+                if remaining is not None:
+                    remaining -= len(result['ids'])
+            paged = False
+        else:
+            results = self._map(indexes, lambda shard: shard.get(ids=ids, where=where, include=include))
+
+        merged = {'ids': []}
+        for key in ("documents", "metadatas", "embeddings"):
+            merged[key] = [] if key in include else None
+        for result in results:
+            merged['ids'].extend(result['ids'])
+            for key in ("documents", "metadatas", "embeddings"):
+                if merged[key] is not None and result.get(key) is not None:
+                    merged[key].extend(list(result[key]))
+
+        if paged:
+            start = offset or 0
+            stop = start + limit if limit is not None else None
+            for key in ("ids", "documents", "metadatas", "embeddings"):
+                if merged[key] is not None:
+                    merged[key] = merged[key][start:stop]
+        return merged
+
+    def query(self, query_embeddings, n_results=10, where=None, include=("documents", "metadatas", "distances")):
+        """
+        Query the relevant shards concurrently and merge their results by distance.
+        """
+        shard_include = list(dict.fromkeys(list(include) + ["distances"]))
+        results = self._map(
+            self._route(where),
+            lambda shard: shard.query(
+                query_embeddings=query_embeddings,
+                n_results=n_results,
+                where=where,
+                include=shard_include
+            )
+        )
+
+        merged = {'ids': [], 'documents': [], 'metadatas': [], 'distances': []}
+        for q in range(len(query_embeddings)):
+            hits = []
+            for result in results:
+                if not result['ids'] or q >= len(result['ids']):
+                    continue
+                for position, distance in enumerate(result['distances'][q]):
+                    hits.append((distance, result, position))
+            hits.sort(key=lambda hit: hit[0])
+            hits = hits[:n_results]
+
+            merged['ids'].append([result['ids'][q][p] for _, result, p in hits])
+            merged['distances'].append([distance for distance, _, _ in hits])
+            for key in ("documents", "metadatas"):
+                merged[key].append([result[key][q][p] if result.get(key) else None for _, result, p in hits])
+
+        for key in ("documents", "metadatas", "distances"):
+            if key not in include:
+                merged[key] = None
+        return merged
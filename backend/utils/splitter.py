@@ -1,4 +1,6 @@
+import hashlib
 from typing import List, Dict
+from utils.metrics import time_stage
 
 def split_text(text: str, chunk_size=800, overlap=100, metadata: Dict = None):
     """
@@ -42,6 +44,7 @@ def split_text(text: str, chunk_size=800, overlap=100, metadata: Dict = None):
     return chunks
 
 
+@time_stage("split")
 def split_text_by_pages(pages_text: List[str], chunk_size=800, overlap=100, base_metadata: Dict = None):
     """
     Split text from multiple pages while preserving page numbers.
@@ -70,3 +73,42 @@ def split_text_by_pages(pages_text: List[str], chunk_size=800, overlap=100, base
         all_chunks.extend(page_chunks)
     
     return all_chunks
+
+
+def chunk_content_hash(text: str) -> str:
+    """
+    Hash the text of a chunk, used to detect unchanged chunks on reindex.
+    
+    Args:
+        text: Chunk text
+    
+    Returns:
+        SHA-256 hex digest
+    """
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def build_chunk_documents(chunks: List[Dict], filename: str) -> List[Dict]:
+    """
+    Turn split chunks into documents ready for indexing.
+    
+    Args:
+        chunks: Chunks returned by split_text_by_pages
+        filename: Source filename, used in the chunk ids
+    
+    Returns:
+        List of dictionaries with 'text', 'doc_id' and 'metadata' keys;
+        the metadata also carries the chunk's 'content_hash'
+    """
+    documents = []
+    for i, chunk_data in enumerate(chunks):
+        doc_id = f"{filename}::{chunk_data['metadata'].get('page_number', 0)}::{i}"
+        documents.append({
+            'text': chunk_data['text'],
+            'doc_id': doc_id,
+            'metadata': {
+                **chunk_data['metadata'],
+                'content_hash': chunk_content_hash(chunk_data['text'])
+            }
+        })
+    return documents
@@ -1,6 +1,7 @@
 import streamlit as st
 import requests
-import os
+import json
+import time
 
 BACKEND_URL = "http://127.0.0.1:8000"
 
@@ -13,16 +14,94 @@ st.caption("RAG Demo – ISM (Innovative Software & Models SRL)")
 st.subheader("📄 Încarcă un document PDF")
 uploaded_file = st.file_uploader("Alege fișierul PDF", type=["pdf"])
 
+
+def wait_for_job(job_id):
+    """Urmărește progresul unui job de procesare până la final."""
+    progress_bar = st.progress(0.0, text="În așteptare...")
+    while True:
+        job = requests.get(f"{BACKEND_URL}/jobs/{job_id}").json()
+        if job['status'] in ("succeeded", "skipped", "failed"):
+            progress_bar.empty()
+            return job
+
+        # Extragerea ocupă prima jumătate a barei, indexarea a doua
+        progress = job.get('progress', {})
+        if progress.get('stage') == "embedding" and progress.get('chunks_total'):
+            fraction = 0.5 + 0.5 * progress.get('chunks_embedded', 0) / progress['chunks_total']
+            text = f"Indexare: {progress.get('chunks_embedded', 0)}/{progress['chunks_total']} bucăți"
+        elif progress.get('total_pages'):
+            fraction = 0.5 * progress.get('pages_extracted', 0) / progress['total_pages']
+            text = f"Extragere text: {progress.get('pages_extracted', 0)}/{progress['total_pages']} pagini"
+        elif job['status'] == "running":
+            fraction, text = 0.0, "Extragere text..."
+        else:
+            fraction, text = 0.0, "În așteptare..."
+        progress_bar.progress(min(fraction, 1.0), text=text)
+        time.sleep(1)
+
+
 if uploaded_file:
-    st.info(f"Se încarcă fișierul **{uploaded_file.name}** în backend...")
-    files = {"file": (uploaded_file.name, uploaded_file, "application/pdf")}
-    response = requests.post(f"{BACKEND_URL}/upload", files=files)
+    # Streamlit re-rulează scriptul la fiecare interacțiune: încarcă fiecare fișier o singură dată
+    upload_key = f"{uploaded_file.name}:{uploaded_file.size}"
+    if st.session_state.get("last_upload") != upload_key:
+        st.info(f"Se încarcă fișierul **{uploaded_file.name}** în backend...")
+        files = {"file": (uploaded_file.name, uploaded_file, "application/pdf")}
+        response = requests.post(f"{BACKEND_URL}/upload", files=files)
+
+        if response.status_code == 200:
+            st.session_state["last_upload"] = upload_key
+            data = response.json()
+            if data.get('status') == "queued":
+                job = wait_for_job(data['job_id'])
+                result = job.get('result') or {}
+                if job['status'] == "failed":
+                    st.error(f"Eroare la procesare: {job.get('error')}")
+                elif job['status'] == "skipped":
+                    st.info(f"ℹ️ Fișierul era deja indexat ({result.get('chunks', 0)} bucăți).")
+                else:
+                    st.success(f"✅ PDF procesat cu succes! {result.get('chunks', 0)} bucăți de text au fost indexate.")
+            else:
+                st.info(f"ℹ️ Fișierul era deja indexat ({data.get('chunks', 0)} bucăți).")
+        else:
+            st.error(f"Eroare la upload: {response.text}")
+
+
+def render_sources(sources):
+    """Afișează sursele unui răspuns."""
+    with st.expander(f"📚 Surse ({len(sources)} documente)"):
+        for source in sources:
+            st.markdown(f"### 📄 {source.get('filename', 'Unknown')}")
+            
+            # Display pages
+            if source.get('pages'):
+                pages_str = ", ".join(map(str, source['pages']))
+                st.markdown(f"- **Pagini:** {pages_str}")
+            
+            # Display number of relevant chunks
+            if source.get('num_chunks'):
+                st.markdown(f"- **Secțiuni relevante:** {source['num_chunks']}")
+            
+            # Display relevance
+            if source.get('relevance') is not None:
+                relevance_pct = source['relevance'] * 100
+                st.markdown(f"- **Relevanță:** {relevance_pct:.1f}%")
+            
+            st.markdown("---")
+
+
+def iter_sse_events(response):
+    """Parse a Server-Sent Events response into (event, data) pairs."""
+    event_type, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if data_lines:
+                yield event_type, json.loads("\n".join(data_lines))
+            event_type, data_lines = "message", []
+        elif line.startswith("event:"):
+            event_type = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
 
-    if response.status_code == 200:
-        data = response.json()
-        st.success(f"✅ PDF procesat cu succes! {data.get('chunks', 0)} bucăți de text au fost indexate.")
-    else:
-        st.error(f"Eroare la upload: {response.text}")
 
 # 2️⃣ Întrebare către sistem
 st.subheader("💬 Adresează o întrebare despre document")
@@ -32,32 +111,21 @@ if st.button("🔍 Obține răspuns"):
     if not question:
         st.warning("Te rog să introduci o întrebare.")
     else:
-        with st.spinner("Se caută răspuns..."):
-            response = requests.post(f"{BACKEND_URL}/ask", data={"question": question})
-            if response.status_code == 200:
-                data = response.json()
-                st.markdown(f"### ✅ Răspuns: \n> {data['answer']}")
-                
-                # Display sources if available
-                if data.get("sources"):
-                    with st.expander(f"📚 Surse ({len(data['sources'])} documente)"):
-                        for source in data["sources"]:
-                            st.markdown(f"### 📄 {source.get('filename', 'Unknown')}")
-                            
-                            # Display pages
-                            if source.get('pages'):
-                                pages_str = ", ".join(map(str, source['pages']))
-                                st.markdown(f"- **Pagini:** {pages_str}")
-                            
-                            # Display number of relevant chunks
-                            if source.get('num_chunks'):
-                                st.markdown(f"- **Secțiuni relevante:** {source['num_chunks']}")
-                            
-                            # Display relevance
-                            if source.get('relevance') is not None:
-                                relevance_pct = source['relevance'] * 100
-                                st.markdown(f"- **Relevanță:** {relevance_pct:.1f}%")
-                            
-                            st.markdown("---")
-            else:
-                st.error(f"Eroare: {response.text}")
+        answer_placeholder = st.empty()
+        answer_placeholder.info("Se caută răspuns...")
+        response = requests.post(f"{BACKEND_URL}/ask/stream", data={"question": question}, stream=True)
+        if response.status_code == 200:
+            response.encoding = "utf-8"
+            answer = ""
+            for event_type, data in iter_sse_events(response):
+                if event_type == "sources" and data.get("sources"):
+                    render_sources(data["sources"])
+                elif event_type == "token":
+                    answer += data["content"]
+                    answer_placeholder.markdown(f"### ✅ Răspuns: \n> {answer}▌")
+                elif event_type == "done":
+                    answer_placeholder.markdown(f"### ✅ Răspuns: \n> {data['answer']}")
+                elif event_type == "error":
+                    answer_placeholder.error(data["message"])
+        else:
+            answer_placeholder.error(f"Eroare: {response.text}")